@@ -0,0 +1,442 @@
+import gc
+import os
+import re
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+import ex1
+import sketch
+import quantized_lm
+
+
+def synthetic_corpus(size, vocabulary_size=10000, seed=0):
+    """
+    Generates a reproducible synthetic corpus of Zipf distributed words, with a sentence boundary every ~20 words.
+    The words are drawn a million at a time, so large corpora take little memory beyond their own.
+        Args:
+            size (int): the approximate size of the corpus, in characters.
+            vocabulary_size (int): the number of distinct words. Defaults to 10000.
+            seed (int): the random seed. Defaults to 0.
+        Return:
+            (str): the corpus.
+    """
+    rng = random.Random(seed)
+    words = ["w%d" % i for i in range(vocabulary_size)] + ["."]
+    weights = [1 / (i + 1) for i in range(vocabulary_size)]
+    weights.append(0.05 * sum(weights))
+    average_length = sum(weight * (len(word) + 1) for word, weight in zip(words, weights)) / sum(weights)
+    remaining = max(int(size / average_length), 1)
+    chunks = []
+    while remaining > 0:
+        chunks.append(" ".join(rng.choices(words, weights, k=min(remaining, 1 << 20))))
+        remaining -= 1 << 20
+    return " ".join(chunks)
+
+
+def timed(function, *args, **kwargs):
+    """
+    Calls a function and measures its wall time
+        Return:
+            (tuple): the function's result and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmark_parallel_build(text, n=3, chars=False, workers_list=None):
+    """
+    Measures build_model_parallel() against a serial build_model()
+        Args:
+            text (str): the corpus.
+            n (int): the n of the n-gram. Defaults to 3.
+            chars (bool): True for a character level model. Defaults to False.
+            workers_list (list): the numbers of workers to measure. Defaults to 1, 2, 4, ... up to the CPU count.
+        Return:
+            (dict): the serial time, and the time and speedup for each number of workers.
+    """
+    cpus = os.cpu_count() or 1
+    workers_list = workers_list or sorted({2 ** i for i in range(cpus.bit_length())} | {cpus})
+
+    serial = ex1.Ngram_Language_Model(n=n, chars=chars)
+    _, serial_time = timed(serial.build_model, text)
+    results = {"n": n, "chars": chars, "characters": len(text), "cpus": cpus, "serial_seconds": serial_time,
+               "parallel": []}
+    for workers in workers_list:
+        parallel = ex1.Ngram_Language_Model(n=n, chars=chars)
+        _, parallel_time = timed(parallel.build_model_parallel, text, workers)
+        if parallel.get_model_dictionary() != serial.get_model_dictionary():
+            raise AssertionError("the parallel build with %d workers differs from the serial one" % workers)
+        results["parallel"].append({"workers": workers, "seconds": parallel_time,
+                                    "speedup": serial_time / parallel_time})
+    return results
+
+
+def held_out_texts(size, length=20, vocabulary_size=10000, seed=1):
+    """
+    Generates texts to evaluate, from a synthetic corpus other than the one a model is built from
+        Args:
+            size (int): the approximate total size of the texts, in characters.
+            length (int): the number of words in each text. Defaults to 20.
+            vocabulary_size (int): the number of distinct words. Defaults to 10000.
+            seed (int): the random seed. Defaults to 1.
+        Return:
+            (list): the texts.
+    """
+    words = synthetic_corpus(size, vocabulary_size, seed).split(" ")
+    return [" ".join(words[i:i + length]) for i in range(0, len(words) - length + 1, length)]
+
+
+def compare_models(reference_memory, reference_scores, lm, texts):
+    """
+    Compares the memory and the evaluate() scores of a model with those of a reference model, e.g. of a pruned or
+    an approximate model with the exact one
+        Args:
+            reference_memory (int): the memory usage of the reference model.
+            reference_scores (list): the reference model's score of each text.
+            lm (Ngram_Language_Model): the compared model.
+            texts (list): the evaluated texts.
+        Return:
+            (dict): the memory saved, the mean and the maximal absolute change of the scores, and the number of
+                    texts the compared model could not score (as their leading tokens were dropped).
+    """
+    changes = []
+    for text, reference_score in zip(texts, reference_scores):
+        try:
+            changes.append(abs(lm.evaluate(text) - reference_score))
+        except ValueError:
+            pass
+    memory = lm.memory_usage()
+    return {"memory": memory, "memory_saved": reference_memory - memory,
+            "memory_ratio": memory / reference_memory,
+            "mean_score_change": sum(changes) / len(changes) if changes else None,
+            "max_score_change": max(changes, default=None), "unscored": len(texts) - len(changes)}
+
+
+def benchmark_approximation(text, texts, n=3, chars=False, min_counts_list=(2, 3), top_k_list=(4, 16),
+                            widths=(1 << 16, 1 << 18, 1 << 20), bits_list=(8, 16)):
+    """
+    Measures the memory saved by pruning, by approximate (sketch) counting and by quantized export, and the change
+    of evaluate() scores
+        Args:
+            text (str): the corpus.
+            texts (list): the texts to evaluate. Texts the exact model cannot score are skipped.
+            n (int): the n of the n-gram. Defaults to 3.
+            chars (bool): True for a character level model. Defaults to False.
+            min_counts_list (list): the minimal counts to prune with. Defaults to 2 and 3.
+            top_k_list (list): the numbers of tokens per context to prune to. Defaults to 4 and 16.
+            widths (list): the widths of the sketches to count with. Defaults to 64K, 256K and 1M.
+            bits_list (list): the bits to quantize the exported log probabilities to. Defaults to 8 and 16.
+        Return:
+            (dict): the exact model's memory, and the comparison of each pruned and approximate model with it.
+    """
+    exact = ex1.Ngram_Language_Model(n=n, chars=chars)
+    exact.build_model(text)
+    scores = []
+    for evaluated in texts:
+        try:
+            scores.append((evaluated, exact.evaluate(evaluated)))
+        except ValueError:
+            pass
+    texts, scores = [evaluated for evaluated, _ in scores], [score for _, score in scores]
+    memory = exact.memory_usage()
+    results = {"n": n, "chars": chars, "characters": len(text), "texts": len(texts), "memory": memory,
+               "pruned": [], "sketch": [], "quantized": []}
+
+    for min_counts, top_k in [(min_counts, None) for min_counts in min_counts_list] + \
+                             [(None, top_k) for top_k in top_k_list]:
+        pruned = copy.deepcopy(exact)
+        dropped = pruned.prune(min_counts=min_counts, top_k=top_k)
+        results["pruned"].append(dict(min_counts=min_counts, top_k=top_k, dropped=dropped,
+                                      **compare_models(memory, scores, pruned, texts)))
+    for width in widths:
+        approximate = sketch.Sketch_Scoring_Model(n=n, chars=chars, width=width)
+        _, build_time = timed(approximate.build_model, text)
+        results["sketch"].append(dict(width=width, depth=approximate.ngram_sketch.depth, build_seconds=build_time,
+                                      **compare_models(memory, scores, approximate, texts)))
+    for bits in bits_list:
+        quantized, export_time = timed(quantized_lm.Quantized_Scoring_Model.from_model, exact, bits)
+        results["quantized"].append(dict(bits=bits, export_seconds=export_time,
+                                         log_prob_error_bound=quantized.log_prob_error_bound(),
+                                         max_score_error_bound=max(map(quantized.score_error_bound, texts),
+                                                                   default=None),
+                                         **compare_models(memory, scores, quantized, texts)))
+    return results
+
+
+def synthetic_prose(size, seed=0):
+    """
+    Generates a reproducible text to normalize: capitalized sentences of words, contractions and punctuation,
+    one sentence per line
+        Args:
+            size (int): the approximate size of the text, in characters.
+            seed (int): the random seed. Defaults to 0.
+        Return:
+            (str): the text.
+    """
+    rng = random.Random(seed)
+    words = synthetic_corpus(size, seed=seed).replace(" .", "").split(" ")
+    contractions = list(ex1.CONTRACTIONS.keys())
+    sentences, length = [], 0
+    for start in range(0, len(words), 12):
+        sentence = [rng.choice(contractions) if rng.random() < 0.1 else word for word in words[start:start + 12]]
+        sentence = " ".join(word + rng.choice([",", ";", "--", ""]) if rng.random() < 0.1 else word
+                            for word in sentence)
+        sentences.append(sentence.capitalize() + rng.choice([".", "!", "?", "..."]))
+        length += len(sentences[-1]) + 1
+        if length >= size:
+            break
+    return "\n".join(sentences)
+
+
+def legacy_normalize_text(text):
+    """
+    Normalizes a text as normalize_text() did before Text_Normalizer, compiling the contractions' pattern on every
+    call and looking for contractions throughout the text
+        Args:
+            text (str): the text to normalize
+        Return:
+            (str): the normalized text.
+    """
+    contractions_re = re.compile('(%s)' % '|'.join(ex1.CONTRACTIONS.keys()))
+    extended_txt = contractions_re.sub(lambda match: ex1.CONTRACTIONS[match.group(0)], text.lower())
+    return re.sub(ex1.CHARACTERS_TO_PAD, r"\1 ", extended_txt).rstrip()
+
+
+def benchmark_normalization(text, workers_list=None):
+    """
+    Measures the throughput of Text_Normalizer against the legacy normalization, on the whole text and line by
+    line, and of normalize_stream() with several workers
+        Args:
+            text (str): the text to normalize, with one sentence per line.
+            workers_list (list): the numbers of workers to measure normalize_stream() with. Defaults to 1, 2, 4, ...
+                                 up to the CPU count.
+        Return:
+            (dict): the megabytes per second of each way of normalizing, and the speedup of each over the legacy one.
+    """
+    cpus = os.cpu_count() or 1
+    workers_list = workers_list or sorted({2 ** i for i in range(cpus.bit_length())} | {cpus})
+    megabytes = len(text.encode("utf-8")) / 2 ** 20
+    lines = text.split("\n")
+
+    legacy_text, legacy_text_time = timed(legacy_normalize_text, text)
+    legacy_lines, legacy_lines_time = timed(lambda: [legacy_normalize_text(line) for line in lines])
+    results = {"megabytes": megabytes, "lines": len(lines), "cpus": cpus,
+               "legacy_text_mb_per_second": megabytes / legacy_text_time,
+               "legacy_lines_mb_per_second": megabytes / legacy_lines_time}
+
+    normalizer = ex1.Text_Normalizer()
+    normalized, text_time = timed(normalizer.normalize, text)
+    if normalized != legacy_text:
+        raise AssertionError("the normalized text differs from the legacy normalization")
+    results.update(text_mb_per_second=megabytes / text_time, text_speedup=legacy_text_time / text_time)
+
+    results["stream"] = []
+    for workers in workers_list:
+        normalized, stream_time = timed(lambda: list(ex1.Text_Normalizer().normalize_stream(lines, workers)))
+        if normalized != legacy_lines:
+            raise AssertionError("the stream normalized by %d workers differs from the legacy normalization"
+                                 % workers)
+        results["stream"].append({"workers": workers, "mb_per_second": megabytes / stream_time,
+                                  "speedup": legacy_lines_time / stream_time})
+    return results
+
+
+def benchmark_model(text, texts, n=3, chars=False, generated=1000, memory=True, seed=0):
+    """
+    Measures a model's build time and peak memory, its generation speed and its evaluation speed
+        Args:
+            text (str): the corpus.
+            texts (list): the texts to evaluate. Texts the model cannot score (as their leading tokens are unseen)
+                          are counted but not timed.
+            n (int): the n of the n-gram. Defaults to 3.
+            chars (bool): True for a character level model. Defaults to False.
+            generated (int): the number of tokens to generate. Defaults to 1000.
+            memory (bool): True to measure the peak memory of the build, by building the model a second time while
+                           tracing the allocations. Defaults to True.
+            seed (int): the random seed of the generation. Defaults to 0.
+        Return:
+            (dict): the measurements.
+    """
+    lm = ex1.Ngram_Language_Model(n=n, chars=chars)
+    _, build_time = timed(lm.build_model, text)
+    results = {"n": n, "chars": chars, "characters": len(text), "ngrams": len(lm.get_model_dictionary()),
+               "build_seconds": build_time, "model_memory": lm.memory_usage()}
+
+    random.seed(seed)
+    tokens, generate_time = 0, 0.0
+    while tokens < generated:
+        output, seconds = timed(lm.generate, n=min(generated - tokens, 100))
+        tokens, generate_time = tokens + len(lm.split_to_unigrams(output)), generate_time + seconds
+    results.update(generated_tokens=tokens, generate_tokens_per_second=tokens / generate_time)
+
+    scored, evaluate_time = 0, 0.0
+    for evaluated in texts:
+        try:
+            _, seconds = timed(lm.evaluate, evaluated)
+        except ValueError:
+            continue
+        scored, evaluate_time = scored + 1, evaluate_time + seconds
+    results.update(evaluated_texts=scored, unscored_texts=len(texts) - scored,
+                   evaluate_texts_per_second=scored / evaluate_time if evaluate_time else None)
+
+    if memory:
+        del lm
+        gc.collect()
+        tracemalloc.start()
+        try:
+            ex1.Ngram_Language_Model(n=n, chars=chars).build_model(text)
+            results["build_peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def get_environment():
+    """
+    Returns the environment the benchmarks run in, to tell apart results that are not comparable
+        Return:
+            (dict): the Python version, the platform, the CPU count and the git commit, if known.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "commit": commit}
+
+
+def benchmark_suite(sizes=(10 ** 6, 10 ** 7, 10 ** 8, 10 ** 9), ns=(2, 3, 4, 5), levels=(False, True),
+                    texts_size=10 ** 5, generated=1000, memory=True, log=None):
+    """
+    Runs benchmark_model() on reproducible synthetic corpora of every size, at the word and the character level
+    and for every n. A configuration that runs out of memory is recorded with its error, and the larger corpora
+    of its level and n are skipped.
+        Args:
+            sizes (list): the corpus sizes, in characters. Defaults to 1MB to 1GB.
+            ns (list): the n of the n-grams. Defaults to 2 to 5.
+            levels (list): the levels, False for words and True for characters. Defaults to both.
+            texts_size (int): the total size of the evaluated texts, in characters. Defaults to 100K.
+            generated (int): the number of tokens to generate with each model. Defaults to 1000.
+            memory (bool): True to measure the peak memory of each build. Defaults to True.
+            log (file): a file to report the progress to, e.g. sys.stderr. Defaults to None.
+        Return:
+            (dict): the environment and the results of each configuration.
+    """
+    texts = held_out_texts(texts_size)
+    results = []
+    failed = set()  # the (chars, n) configurations that ran out of memory
+    for size in sorted(sizes):
+        text = synthetic_corpus(size)
+        for chars in levels:
+            for n in ns:
+                if (chars, n) in failed:
+                    continue
+                if log is not None:
+                    print("size=%d chars=%s n=%d" % (size, chars, n), file=log, flush=True)
+                try:
+                    results.append(dict(size=size, **benchmark_model(text, texts, n=n, chars=chars,
+                                                                     generated=generated, memory=memory)))
+                except MemoryError:
+                    failed.add((chars, n))
+                    results.append({"size": size, "n": n, "chars": chars, "error": "MemoryError"})
+                gc.collect()
+        del text
+    return {"environment": get_environment(), "results": results}
+
+
+def compare_suites(baseline, current):
+    """
+    Compares the results of two runs of benchmark_suite(), e.g. of two commits
+        Args:
+            baseline (dict): the earlier results.
+            current (dict): the later results.
+        Return:
+            (list): for each configuration in both, the ratio of each measurement, current to baseline. Times
+                    and memory are lower, and speeds are higher, when the current run is better.
+    """
+    measurements = ("build_seconds", "build_peak_memory", "model_memory", "generate_tokens_per_second",
+                    "evaluate_texts_per_second")
+
+    def key(result):
+        return result["size"], result["chars"], result["n"]
+
+    earlier = {key(result): result for result in baseline["results"] if "error" not in result}
+    comparison = []
+    for result in current["results"]:
+        before = earlier.get(key(result))
+        if before is None or "error" in result:
+            continue
+        ratios = {measurement: result[measurement] / before[measurement] for measurement in measurements
+                  if result.get(measurement) and before.get(measurement)}
+        comparison.append(dict(size=result["size"], chars=result["chars"], n=result["n"], **ratios))
+    return comparison
+
+
+def write_results(results, path=None):
+    """
+    Writes results as JSON
+        Args:
+            results (dict): the results.
+            path (str): the file to write to. Defaults to the standard output.
+    """
+    if path is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the n-gram language model.")
+    parser.add_argument("--size", type=int, default=10 ** 7, help="corpus size in characters")
+    parser.add_argument("--n", type=int, default=3, help="the n of the n-gram")
+    parser.add_argument("--chars", action="store_true", help="benchmark a character level model")
+    parser.add_argument("--workers", type=int, nargs="*", help="numbers of workers to measure")
+    parser.add_argument("--approximation", action="store_true",
+                        help="measure pruning, approximate counting and quantized export rather than the "
+                             "parallel build")
+    parser.add_argument("--normalization", action="store_true",
+                        help="measure the text normalization rather than the parallel build")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the benchmark suite over corpora of every size, level and n")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10 ** 6, 10 ** 7, 10 ** 8, 10 ** 9],
+                        help="corpus sizes of the suite, in characters")
+    parser.add_argument("--ns", type=int, nargs="*", default=[2, 3, 4, 5], help="the n of the suite's n-grams")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the suite's peak memory")
+    parser.add_argument("--output", help="a file to write the results to, rather than the standard output")
+    parser.add_argument("--compare", help="a file of earlier suite results to compare the suite's results with")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        results = benchmark_suite(args.sizes, args.ns, memory=not args.no_memory, log=sys.stderr)
+        if args.compare:
+            with open(args.compare) as baseline:
+                results["comparison"] = compare_suites(json.load(baseline), results)
+        write_results(results, args.output)
+        return
+
+    if args.normalization:
+        write_results(benchmark_normalization(synthetic_prose(args.size), workers_list=args.workers), args.output)
+        return
+
+    text = synthetic_corpus(args.size)
+    if args.approximation:
+        results = benchmark_approximation(text, held_out_texts(max(args.size // 100, 1000)), n=args.n,
+                                          chars=args.chars)
+    else:
+        results = benchmark_parallel_build(text, n=args.n, chars=args.chars, workers_list=args.workers)
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
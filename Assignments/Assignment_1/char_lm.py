@@ -0,0 +1,418 @@
+import math
+import random
+
+import numpy as np
+
+from ex1 import Ngram_Language_Model
+
+MAX_CELLS = 1 << 26  # the largest count tensor allowed, in cells (512MB of 64 bit counts)
+
+
+class Dense_Char_Language_Model(Ngram_Language_Model):
+    """A character level Markov Language Model that stores its counts in a dense tensor instead of dictionaries.
+        Characters are interned to ids in their order of appearance, and the count of an n-gram is the cell of the
+        tensor indexed by the ids of its characters, so the tensor has V^n cells for an alphabet of V characters.
+        Texts are counted with vectorized sliding windows over their encoded codepoints, and an n-gram's context
+        is the row of its first n-1 characters.
+
+        The model supports the same API as Ngram_Language_Model with chars=True, with the following differences:
+            * get_model_dictionary() materializes a new dictionary on every call.
+            * Texts shorter than n only contribute their unigrams.
+            * The alphabet size and n are limited by V^n <= MAX_CELLS.
+    """
+
+    def __init__(self, n=3):
+        """Initializing a dense character language model object.
+        Args:
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+        """
+        if n < 1:
+            raise ValueError("a dense model requires n >= 1, got %d" % n)
+        super().__init__(n=n, chars=True)
+        # the counts are held by the arrays below
+        self.model_dict = self.unigram_dict = self.context_dict = self.context_totals = None
+        self.alphabet = []  # the characters, in the order of their ids
+        self.char_to_id = {}  # the id of each character
+        self.code_to_id = np.full(0, -1, dtype=np.int64)  # the id of each codepoint, or -1 if it is not interned
+        self.counts = np.zeros((0,) * n, dtype=np.int64)  # the count of each n-gram, indexed by its ids
+        self.unigram_counts = np.zeros(0, dtype=np.int64)  # the count of each character id
+        self.prefix_counts = None  # the total count of the ngrams starting with each 0 to n characters, built lazily
+        self.log_probs = None  # the log probability of each flattened ngram, built lazily
+        self.cumulative_counts = None  # the cumulative counts of the flattened tensor, built lazily
+
+    def on_model_change(self, contexts=None):
+        """
+        Invalidates the tables derived from the counts, so they are rebuilt lazily. Called whenever the counts change.
+            Args:
+                contexts (iterable): ignored, all the tables are invalidated.
+        """
+        super().on_model_change()
+        self.prefix_counts = None
+        self.log_probs = None
+        self.cumulative_counts = None
+
+    def encode(self, text):
+        """
+        Returns the ids of the characters of a text
+            Args:
+                text (str): the text.
+            Return:
+                (np.array): the id of each character, -1 for the characters that are not interned.
+        """
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        known = codes < len(self.code_to_id)
+        return np.where(known, self.code_to_id[np.where(known, codes, 0)] if len(self.code_to_id) else -1, -1)
+
+    def get_ids(self, text):
+        """
+        Returns the ids of the characters of a short string
+            Args:
+                text (str): the string.
+            Return:
+                (tuple): the id of each character, or None if a character is not interned.
+        """
+        ids = tuple(self.char_to_id.get(char, -1) for char in text)
+        return None if -1 in ids else ids
+
+    def get_prefix_counts(self, ids):
+        """
+        Returns the total count of the ngrams starting with the given ids
+            Args:
+                ids (tuple): the ids of 0 to n characters.
+            Return:
+                (int): the total count.
+        """
+        if self.prefix_counts is None:
+            self.prefix_counts = [self.counts]
+            for _ in range(self.n):
+                self.prefix_counts.insert(0, self.prefix_counts[0].sum(axis=-1))
+        return int(self.prefix_counts[len(ids)][ids])
+
+    def intern(self, text):
+        """
+        Adds the new characters of a text to the alphabet, growing the tensor. The existing ids do not change.
+            Args:
+                text (str): the text.
+        """
+        new_codes = np.unique(np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64))
+        new_codes = new_codes[self.encode("".join(map(chr, new_codes.tolist()))) < 0]
+        if len(new_codes) == 0:
+            return
+        size = len(self.alphabet) + len(new_codes)
+        if size ** self.n > MAX_CELLS:
+            raise ValueError("%d-grams over an alphabet of %d characters do not fit in %d cells" %
+                             (self.n, size, MAX_CELLS))
+        if new_codes[-1] >= len(self.code_to_id):
+            code_to_id = np.full(int(new_codes[-1]) + 1, -1, dtype=np.int64)
+            code_to_id[:len(self.code_to_id)] = self.code_to_id
+            self.code_to_id = code_to_id
+        self.code_to_id[new_codes] = np.arange(len(self.alphabet), size)
+        self.alphabet.extend(map(chr, new_codes.tolist()))
+        self.char_to_id = {char: i for i, char in enumerate(self.alphabet)}
+
+        # the arrays are replaced rather than grown in place
+        counts = np.zeros((size,) * self.n, dtype=np.int64)
+        counts[(slice(0, len(self.unigram_counts)),) * self.n] = self.counts
+        unigram_counts = np.zeros(size, dtype=np.int64)
+        unigram_counts[:len(self.unigram_counts)] = self.unigram_counts
+        self.counts, self.unigram_counts = counts, unigram_counts
+
+    def window_indices(self, ids):
+        """
+        Returns the flat index in the tensor of every n consecutive ids
+            Args:
+                ids (np.array): the character ids of a text, all interned.
+            Return:
+                (np.array): the flat index of each n-gram of the text, in order.
+        """
+        windows = len(ids) - self.n + 1
+        indices = np.zeros(max(windows, 0), dtype=np.int64)
+        for i in range(self.n if windows > 0 else 0):
+            indices = indices * len(self.alphabet) + ids[i:i + windows]
+        return indices
+
+    def build_model(self, text):
+        """populates the tensor with the counts of the text.
+
+            Args:
+                text (str): the text to construct the model from.
+        """
+        self.count_tokens(text)
+
+    def count_tokens(self, tokens, history=()):
+        """
+        Counts the given characters and the n-grams ending in them into the tensor
+            Args:
+                tokens (str or list): the characters to count.
+                history (list): the last n-1 characters preceding the given ones, if any. Defaults to none.
+            Return:
+                (list): the last n-1 characters, to be passed as the history of the characters that follow.
+        """
+        sequence = "".join(history) + "".join(tokens)
+        self.add_counts(sequence, len(sequence) - len(history), 1)
+        return list(sequence[len(sequence) - self.n + 1:])
+
+    def add_counts(self, sequence, tokens_num, sign):
+        """
+        Adds (or subtracts) the counts of the n-grams of a sequence, and of its last characters, to the tensor
+            Args:
+                sequence (str): the characters.
+                tokens_num (int): the number of last characters whose unigrams are counted.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        self.on_model_change()
+        self.intern(sequence)
+        ids = self.encode(sequence)
+        # only the cells of the sequence's ngrams are updated, in place, rather than adding a tensor of their counts
+        np.add.at(self.unigram_counts, ids[len(ids) - tokens_num:], sign)
+        indices = self.window_indices(ids)
+        np.add.at(self.counts.reshape(-1), indices, sign)
+        self.ngram_total += sign * len(indices)
+        self.unigram_total += sign * tokens_num
+
+    def merge_counts(self, model_dict, unigram_dict):
+        """
+        Adds partial counts, collected over the same n, into the tensor. Entries shorter than n are skipped.
+            Args:
+                model_dict (dict): n-gram counts of the form {ngram:count}. Counts may be negative.
+                unigram_dict (dict): unigram counts of the form {unigram:count}. Counts may be negative.
+        """
+        self.on_model_change()
+        self.intern("".join(unigram_dict.keys()))
+        np.add.at(self.unigram_counts, self.encode("".join(unigram_dict.keys())), list(unigram_dict.values()))
+        self.unigram_total += sum(unigram_dict.values())
+
+        n_grams = {n_gram: count for n_gram, count in model_dict.items() if len(n_gram) == self.n}
+        self.intern("".join(n_grams.keys()))
+        indices = self.window_indices(self.encode("".join(n_grams.keys())))[::self.n]
+        np.add.at(self.counts.reshape(-1), indices, list(n_grams.values()))
+        self.ngram_total += sum(n_grams.values())
+
+    def apply_delta(self, text, sign):
+        """
+        Adds (or subtracts) the counts of a text to the tensor
+            Args:
+                text (str): the text.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        if sign < 0:
+            ids = self.encode(text)
+            if not (ids >= 0).all():
+                raise ValueError("the text cannot be retracted, as it was not counted into the model")
+            # only the cells of the text's unigrams and ngrams are compared
+            unigrams, unigram_counts = np.unique(ids, return_counts=True)
+            indices, counts = np.unique(self.window_indices(ids), return_counts=True)
+            if ((unigram_counts > self.unigram_counts[unigrams]).any() or
+                    (counts > self.counts.reshape(-1)[indices]).any()):
+                raise ValueError("the text cannot be retracted, as it was not counted into the model")
+        self.add_counts(text, len(text), sign)
+
+    def prune(self, min_counts=None, top_k=None):
+        """Drops rare entries from the tensor, as Ngram_Language_Model.prune() does. The tensor keeps its size, so
+        pruning does not reduce the model's memory. As the context counts are derived from the tensor, the totals
+        are recomputed from the remaining counts, so the probabilities of the remaining ngrams are those of a model
+        holding only them.
+        Text containing dropped entries can no longer be retracted.
+
+            Args:
+                min_counts (int or dict): the minimal count of the entries to keep, either for all orders or in the
+                                          form {order:min count}. The unigrams are of order 1 and the model's ngrams
+                                          of order n. Defaults to None, keeping all counts.
+                top_k (int): the number of the most frequent characters to keep following each context.
+                             Defaults to None, keeping all characters.
+            Return:
+                (int): the number of entries dropped.
+        """
+
+        def min_count(order):
+            return min_counts.get(order, 0) if isinstance(min_counts, dict) else min_counts or 0
+
+        self.on_model_change()
+        # each row holds the counts of the characters following a context
+        rows = self.counts.reshape(-1, max(len(self.alphabet), 1))
+        keep = rows >= min_count(self.n)
+        if top_k is not None:
+            ranks = np.argsort(-rows, axis=1, kind="stable")
+            np.put_along_axis(keep, ranks[:, top_k:], False, axis=1)
+        dropped = (rows > 0) & ~keep
+        rows[dropped] = 0
+        rare = (self.unigram_counts > 0) & (self.unigram_counts < min_count(1))
+        self.unigram_counts[rare] = 0
+        self.ngram_total = int(self.counts.sum())
+        self.unigram_total = int(self.unigram_counts.sum())
+        return int(dropped.sum() + rare.sum())
+
+    def get_model_dictionary(self):
+        """Returns a dictionary of the form {ngram:count}, materialized from the tensor
+        """
+        indices = np.flatnonzero(self.counts)
+        ids = np.unravel_index(indices, self.counts.shape)
+        return {"".join(self.alphabet[i] for i in n_gram): count
+                for n_gram, count in zip(zip(*(column.tolist() for column in ids)), self.counts.ravel()[indices].tolist())}
+
+    def memory_usage(self):
+        """
+        Returns the memory held by the model's tables, in bytes
+            Return:
+                (int): the size of the arrays.
+        """
+        return self.counts.nbytes + self.unigram_counts.nbytes + self.code_to_id.nbytes
+
+    def get_ngram_count(self, ngram):
+        """
+        Returns the count of the given ngram
+            Args:
+                ngram (str): the ngram to count
+            Return:
+                (int): the ngram's count, or None if the ngram is not in the model.
+        """
+        ids = self.get_ids(ngram)
+        if ids is None or len(ids) != self.n:
+            return None
+        count = int(self.counts[ids])
+        return count if count > 0 else None
+
+    def count_occure(self, word):
+        """
+        Returns the number of word occurrences in the model, i.e. the total count of the ngrams starting with it.
+            Args:
+                (str) ngram or a part of it
+            Return:
+                (int) num of occurrences
+        """
+        ids = self.get_ids(word)
+        if ids is None or len(ids) > self.n:
+            return 0
+        return self.get_prefix_counts(ids)
+
+    def get_context_count(self, context):
+        """
+        Returns the total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the number of times the context was followed by a token in the model
+        """
+        if self.is_context_size(context):
+            return self.count_occure(context)
+        return sum(self.get_markov_n_minus_dict(context).values())
+
+    def get_markov_n_minus_dict(self, ngram):
+        """
+        finds all the ngram's matching keys in the model
+            Args:
+                ngram (str): the ngram to find
+            Return:
+                (dict): all options found in the model, in the form {token:count}. For a string shorter than the
+                        context, the counts of each last character are summed.
+
+        """
+        ids = self.get_ids(ngram)
+        if ids is None or len(ids) >= self.n:
+            return {}
+        options = self.counts[ids]
+        options = options.reshape(-1, len(self.alphabet)).sum(axis=0) if options.ndim > 1 else options
+        return {self.alphabet[i]: int(options[i]) for i in np.flatnonzero(options).tolist()}
+
+    def sample_context(self):
+        """
+        Samples a new context from the model's distribution
+            Return:
+                (str): a sampled context
+        """
+        if self.cumulative_counts is None:
+            self.cumulative_counts = np.cumsum(self.counts.ravel())
+        i = int(np.searchsorted(self.cumulative_counts, random.random() * self.ngram_total, side="right"))
+        return "".join(self.alphabet[j] for j in np.unravel_index(i, self.counts.shape))
+
+    def is_exhausted_context(self, context):
+        """
+        Checks if the context is exhausted or not
+            Args:
+                (str): the context
+            Return:
+                (bool): True if the context is exhausted, False otherwise.
+        """
+        table = self.sampling_tables.get(context)  # a context that was sampled from has its tokens tabulated
+        if table is not None:
+            return len(table[0]) == 0
+        return self.get_context_count(context) == 0
+
+    def build_log_probs(self):
+        """
+        Computes the log probability of every ngram given its context, or the log of the smoothed probability for
+        the ngrams that are not in the model. The logs are taken by math.log, as in evaluate() of the dictionary
+        based model, so the scores are identical.
+        """
+        flat_counts = self.counts.ravel()
+        seen = np.flatnonzero(flat_counts)
+        self.log_probs = np.full(len(flat_counts), math.log(self.smooth("")))
+        self.get_prefix_counts(())
+        probs = flat_counts[seen] / self.prefix_counts[self.n - 1].ravel()[seen // len(self.alphabet)]
+        self.log_probs[seen] = list(map(math.log, probs.tolist()))
+
+    def get_window_log_probs(self, ids):
+        """
+        Returns the log probability of every n consecutive ids, gathered from the log probabilities table
+            Args:
+                ids (np.array): the character ids of a text, -1 for the characters that are not interned.
+            Return:
+                (np.array): the log probability of each n-gram of the text, in order.
+        """
+        if self.log_probs is None:
+            self.build_log_probs()
+        known = np.ones(max(len(ids) - self.n + 1, 0), dtype=bool)
+        for i in range(self.n):
+            known &= ids[i:i + len(known)] >= 0
+        return np.where(known, self.log_probs[self.window_indices(np.where(ids < 0, 0, ids))],
+                        math.log(self.smooth("")))
+
+    def evaluate(self, text):
+        """Returns the log-likelihood of the specified text to be a product of the model.
+           Laplace smoothing is applied to the n-grams that are not in the model.
+           The n-grams' log probabilities are gathered from a table with fancy indexing, and the scores of whole
+           texts are cached like those of the dictionary based model, if the text cache is enabled (set_cache()).
+
+           Args:
+               text (str): Text to evaluate.
+
+           Returns:
+               Float. The float should reflect the (log) probability.
+        """
+        if len(text) < self.n:
+            return super().evaluate(text)
+        if self.text_cache is not None:
+            score = self.text_cache.get(text)
+            if score is not None:
+                return score
+
+        probs = self.evaluate_leading(text[:self.n])
+        probs.extend(self.get_window_log_probs(self.encode(text)).tolist())
+        score = sum(probs)
+
+        if self.text_cache is not None:
+            self.text_cache.put(text, score)
+        return score
+
+    def evaluate_many(self, texts):
+        """Returns the log-likelihood of each of the specified texts, as evaluate() does. The texts are encoded
+        and their log probabilities gathered at once, so many short texts are scored faster than one at a time.
+
+           Args:
+               texts (list): the texts to evaluate.
+
+           Returns:
+               np.array. The (log) probability of each text.
+        """
+        log_probs = self.get_window_log_probs(self.encode("".join(texts))).tolist()
+        scores = []
+        start = 0
+        for text in texts:
+            if len(text) < self.n:
+                scores.append(super().evaluate(text))
+            else:
+                probs = self.evaluate_leading(text[:self.n])
+                probs.extend(log_probs[start:start + len(text) - self.n + 1])
+                scores.append(sum(probs))
+            start += len(text)
+        return np.array(scores)
@@ -0,0 +1,639 @@
+import os
+import sys
+import json
+import heapq
+import bisect
+import random
+import struct
+import operator
+import contextlib
+import itertools
+import collections
+
+from ex1 import Ngram_Language_Model, LRU_Cache
+
+# the ngrams are kept in a file of records sorted by their utf-8 encoded keys, whose byte order is the order of the
+# strings. Each record is a header followed by the key. The index file holds a record for the first key of every
+# block of records, and the model file holds the model's parameters and totals as JSON.
+DATA_FILE = "ngrams.bin"
+INDEX_FILE = "index.bin"
+MODEL_FILE = "model.json"
+FORMAT_VERSION = 1
+
+RECORD_HEADER = struct.Struct("<Iq")  # key length, count
+INDEX_HEADER = struct.Struct("<Iqq")  # key length, the block's offset, the total count of the keys preceding it
+KEY_BOUND = b"\xff"  # never occurs in utf-8, so every key starting with a prefix is below the prefix and the bound
+READ_SIZE = 1 << 20  # the buffer size of the files read and written sequentially
+MAX_FAN_IN = 64  # the largest number of files merged at a time, bounding the open files and their buffers
+
+
+class Disk_Ngram_Language_Model(Ngram_Language_Model):
+    """A language model whose ngram counts are kept in a sorted file on disk, with a sparse index of its blocks in
+    memory and a cache of the recently read blocks, so models larger than the memory are built and used with
+    bounded memory.
+    The counts are collected in memory up to a limit, then spilled to sorted run files. Every fan_in runs of a level
+    are merged into a run of the next level, and the runs are merged with the counts already on disk into the
+    sorted file when a build ends, so no more than fan_in files are merged at a time.
+    Merging rewrites the sorted file, so each build, update() or retract() costs I/O in the model's size, however
+    small the text. Many small changes are made at the cost of a single merge within deferred_merge().
+    The total count of the keys below any string
+    is found in a single block, so counting the ngrams starting with a prefix and sampling by count take two block
+    reads at most. The model is saved as it is built, and is reopened by open().
+    Only the full ngrams are kept, so the model does not count all the orders, and prune() drops ngrams only.
+    """
+
+    def __init__(self, path, n=3, chars=False, max_entries=1 << 20, block_size=256, cache_blocks=1024,
+                 fan_in=MAX_FAN_IN):
+        """Initializing an empty disk based language model, in a directory that is created if needed.
+        Args:
+            path (str): the model's directory.
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+                          Defaults to False.
+            max_entries (int): the number of distinct ngrams counted in memory before they are spilled to a run
+                               file. Defaults to 1M.
+            block_size (int): the number of records in a block of the sorted file. Defaults to 256.
+            cache_blocks (int): the number of blocks cached in memory. Defaults to 1024.
+            fan_in (int): the largest number of files merged at a time, at least 2. Defaults to MAX_FAN_IN.
+        """
+        if n < 1:
+            raise ValueError("a disk model requires n >= 1, got %d" % n)
+        if fan_in < 2:
+            raise ValueError("merging requires a fan in of at least 2, got %d" % fan_in)
+        super().__init__(n=n, chars=chars)
+        self.model_dict = self.unigram_dict = self.context_dict = self.context_totals = None
+        self.path = path
+        self.max_entries = max_entries
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.block_cache = LRU_Cache(cache_blocks)  # a cache of the form {block:(keys, counts, cumulative counts)}
+        self.fan_in = fan_in
+        self.pending = collections.Counter()  # the counts not yet spilled, of the form {ngram:count}
+        self.runs = []  # the run files not yet merged into the sorted file, a list of the run files of each level
+        self.runs_written = 0  # the number of run files written, numbering their names
+        self.merge_deferred = False  # True within deferred_merge()
+        self.index_keys = []  # the first key of each block
+        self.index_offsets = []  # the offset of each block in the sorted file
+        self.index_cumulative = []  # the total count of the keys preceding each block
+        self.data_size = 0
+        self.data_file = None
+        os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def open(cls, path, cache_blocks=1024):
+        """
+        Opens a model saved in a directory by a build
+            Args:
+                path (str): the model's directory.
+                cache_blocks (int): the number of blocks cached in memory. Defaults to 1024.
+            Return:
+                (Disk_Ngram_Language_Model): the model.
+        """
+        with open(os.path.join(path, MODEL_FILE)) as f:
+            parameters = json.load(f)
+        if parameters.get("version") != FORMAT_VERSION:
+            raise ValueError("%s does not hold a version %d disk language model" % (path, FORMAT_VERSION))
+        lm = cls(path, n=parameters["n"], chars=parameters["chars"], max_entries=parameters["max_entries"],
+                 block_size=parameters["block_size"], cache_blocks=cache_blocks,
+                 fan_in=parameters.get("fan_in", MAX_FAN_IN))
+        lm.ngram_total, lm.unigram_total = parameters["ngram_total"], parameters["unigram_total"]
+        for key, offset, cumulative in iter_records(os.path.join(path, INDEX_FILE), INDEX_HEADER):
+            lm.index_keys.append(key)
+            lm.index_offsets.append(offset)
+            lm.index_cumulative.append(cumulative)
+        lm.open_data()
+        return lm
+
+    def __reduce__(self):
+        # the model is reopened from its directory, e.g. by a worker process, rather than copied
+        return type(self).open, (self.path, self.cache_blocks)
+
+    def open_data(self):
+        """
+        (Re)opens the sorted file for reading, dropping the cached blocks
+        """
+        if self.data_file is not None:
+            self.data_file.close()
+        self.block_cache = LRU_Cache(self.cache_blocks)
+        data_path = os.path.join(self.path, DATA_FILE)
+        self.data_size = os.path.getsize(data_path)
+        self.data_file = open(data_path, "rb")
+
+    def close(self):
+        """
+        Closes the sorted file. The model is reopened by open().
+        """
+        if self.data_file is not None:
+            self.data_file.close()
+            self.data_file = None
+
+    def build_model(self, text):
+        """populates the sorted file with the counts of the text, merging them with the counts already in it.
+
+            Args:
+                text (str): the text to construct the model from.
+        """
+        unigrams = self.split_to_unigrams(text)
+
+        # texts shorter than n are split to unigrams, as in the dictionary based model
+        if len(unigrams) < self.n:
+            self.add_pending(collections.Counter(self.split_to_n_grams(text)))
+            self.ngram_total += len(unigrams)
+
+        self.count_tokens(unigrams)
+        self.end_build()
+
+    def build_model_from_stream(self, source, chunk_size=1 << 20):
+        """populates the sorted file from a text that is read in chunks, as build_model_from_stream() of the
+        dictionary based model does.
+
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks (e.g. lines).
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+        """
+        super().build_model_from_stream(source, chunk_size)
+        self.end_build()
+
+    def build_model_parallel(self, text, workers=None):
+        """populates the sorted file, counting shards of the text in parallel processes, as
+        build_model_parallel() of the dictionary based model does.
+
+            Args:
+                text (str): the text to construct the model from.
+                workers (int): the number of processes. Defaults to the number of CPUs.
+        """
+        super().build_model_parallel(text, workers)
+        self.end_build()
+
+    def count_tokens(self, tokens, history=()):
+        """
+        Counts the given tokens and the n-grams ending in them, spilling the counts to run files as they grow
+            Args:
+                tokens (list): the tokens to count.
+                history (list): the last n-1 tokens preceding the given ones, if any. Defaults to none.
+            Return:
+                (list): the last n-1 tokens, to be passed as the history of the tokens that follow.
+        """
+        sequence = list(history) + tokens
+        n_grams_num = max(len(sequence) - self.n + 1, 0)
+        for start in range(0, n_grams_num, self.max_entries):
+            self.add_pending(collections.Counter(self.split_by.join(sequence[i:i + self.n])
+                                                 for i in range(start, min(start + self.max_entries, n_grams_num))))
+        self.ngram_total += n_grams_num
+        self.unigram_total += len(tokens)
+        return sequence[len(sequence) - self.n + 1:] if self.n > 1 else []
+
+    def merge_counts(self, model_dict, unigram_dict):
+        """
+        Adds partial counts, collected over the same n, to the pending counts
+            Args:
+                model_dict (dict): n-gram counts of the form {ngram:count}. Counts may be negative.
+                unigram_dict (dict): unigram counts of the form {unigram:count}. Counts may be negative.
+        """
+        model_dict = {n_gram: count for n_gram, count in model_dict.items()
+                      if len(self.split_to_unigrams(n_gram)) == self.n}
+        self.add_pending(model_dict)
+        self.ngram_total += sum(model_dict.values())
+        self.unigram_total += sum(unigram_dict.values())
+
+    def apply_delta(self, text, sign):
+        """
+        Adds (or subtracts) the counts of a text to the sorted file. Within deferred_merge() a retracted text is
+        checked against the counts merged before it.
+            Args:
+                text (str): the text.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        delta = Ngram_Language_Model(n=self.n, chars=self.chars)
+        delta.build_model(text)
+        if sign < 0 and any((self.get_ngram_count(n_gram) or 0) < count for n_gram, count in delta.model_dict.items()):
+            raise ValueError("the text cannot be retracted, as it was not counted into the model")
+        self.add_pending({n_gram: sign * count for n_gram, count in delta.model_dict.items()})
+        self.ngram_total += sign * delta.ngram_total
+        self.unigram_total += sign * delta.unigram_total
+        self.end_build()
+
+    def end_build(self):
+        """
+        Merges the counts of a build or a change into the sorted file, unless merging is deferred
+        """
+        if not self.merge_deferred:
+            self.merge_runs()
+
+    @contextlib.contextmanager
+    def deferred_merge(self):
+        """Defers the merges of the builds and changes made within a with block to its end, so they rewrite the
+        sorted file once. Until then the model's lookups see the counts merged before the block.
+        """
+        if self.merge_deferred:
+            yield
+            return
+        self.merge_deferred = True
+        try:
+            yield
+        finally:
+            self.merge_deferred = False
+            self.merge_runs()
+
+    def add_pending(self, counts):
+        """
+        Adds counts to the pending counts, spilling them to a run file once there are too many
+            Args:
+                counts (dict): counts of the form {ngram:count}.
+        """
+        self.pending.update(counts)
+        if len(self.pending) >= self.max_entries:
+            self.spill()
+
+    def spill(self):
+        """
+        Writes the pending counts to a new run file of the first level, sorted by key, merging the runs of each
+        level that has fan_in runs into a run of the next level
+        """
+        if not self.pending:
+            return
+        run_path = self.new_run_path()
+        write_records(run_path, RECORD_HEADER,
+                      sorted((n_gram.encode("utf-8"), count) for n_gram, count in self.pending.items()))
+        self.pending = collections.Counter()
+        level = 0
+        while True:
+            if level == len(self.runs):
+                self.runs.append([])
+            self.runs[level].append(run_path)
+            if len(self.runs[level]) < self.fan_in:
+                return
+            run_path = self.new_run_path()
+            merge_files(self.runs[level], run_path)
+            self.runs[level] = []
+            level += 1
+
+    def new_run_path(self):
+        """
+        Returns the path of a new run file
+            Return:
+                (str): the path.
+        """
+        self.runs_written += 1
+        return os.path.join(self.path, "run-%d.bin" % self.runs_written)
+
+    def merge_runs(self):
+        """
+        Merges the run files and the sorted file into a new sorted file, summing the counts of equal keys and
+        dropping the keys whose counts sum to 0, and rebuilds the sparse index and the model file.
+        The smallest runs are merged first until no more than fan_in files are left to merge.
+        """
+        self.spill()
+        self.on_model_change()
+        data_path = os.path.join(self.path, DATA_FILE)
+        runs = [run_path for level in self.runs for run_path in level]
+        while len(runs) + os.path.exists(data_path) > self.fan_in:
+            run_path = self.new_run_path()
+            merge_files(runs[:self.fan_in], run_path)
+            runs = runs[self.fan_in:] + [run_path]
+        sources = runs + [data_path] if os.path.exists(data_path) else runs
+
+        _, keys = self.write_sorted_file(sum_equal_keys(heapq.merge(*(iter_records(source, RECORD_HEADER)
+                                                                      for source in sources))))
+        for run_path in runs:
+            os.remove(run_path)
+        self.runs = []
+        self.save_parameters(keys)
+        self.open_data()
+
+    def write_sorted_file(self, records):
+        """
+        Writes records to a new sorted file, that replaces the sorted file, and rebuilds the sparse index
+            Args:
+                records (iterable): the keys and their counts, sorted by key.
+            Return:
+                (tuple): the total count and the number of the records written.
+        """
+        data_path = os.path.join(self.path, DATA_FILE)
+        written_path = data_path + ".merging"
+        self.index_keys, self.index_offsets, self.index_cumulative = [], [], []
+        with open(written_path, "wb", buffering=READ_SIZE) as f:
+            offset, cumulative, written = 0, 0, 0
+            for key, count in records:
+                if written % self.block_size == 0:
+                    self.index_keys.append(key)
+                    self.index_offsets.append(offset)
+                    self.index_cumulative.append(cumulative)
+                record = RECORD_HEADER.pack(len(key), count) + key
+                f.write(record)
+                offset += len(record)
+                cumulative += count
+                written += 1
+
+        self.close()
+        os.replace(written_path, data_path)
+        write_records(os.path.join(self.path, INDEX_FILE), INDEX_HEADER,
+                      zip(self.index_keys, self.index_offsets, self.index_cumulative))
+        return cumulative, written
+
+    def save_parameters(self, keys):
+        """
+        Writes the model file, from which open() reopens the model
+            Args:
+                keys (int): the number of keys in the sorted file.
+        """
+        with open(os.path.join(self.path, MODEL_FILE), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "n": self.n, "chars": self.chars, "max_entries": self.max_entries,
+                       "block_size": self.block_size, "fan_in": self.fan_in, "ngram_total": self.ngram_total,
+                       "unigram_total": self.unigram_total, "keys": keys}, f)
+
+    def read_block(self, block):
+        """
+        Returns the records of a block of the sorted file, from the cache if it was read recently
+            Args:
+                block (int): the block's number.
+            Return:
+                (tuple): the block's keys, their counts, and their cumulative counts starting with the total count
+                         of the keys preceding the block.
+        """
+        records = self.block_cache.get(block)
+        if records is None:
+            start = self.index_offsets[block]
+            end = self.index_offsets[block + 1] if block + 1 < len(self.index_offsets) else self.data_size
+            self.data_file.seek(start)
+            buffer = self.data_file.read(end - start)
+            keys, counts = [], []
+            offset = 0
+            while offset < len(buffer):
+                key_length, count = RECORD_HEADER.unpack_from(buffer, offset)
+                offset += RECORD_HEADER.size
+                keys.append(buffer[offset:offset + key_length])
+                counts.append(count)
+                offset += key_length
+            cumulative = [self.index_cumulative[block]]
+            for count in counts:
+                cumulative.append(cumulative[-1] + count)
+            records = keys, counts, cumulative
+            self.block_cache.put(block, records)
+        return records
+
+    def count_below(self, key):
+        """
+        Returns the total count of the keys below a key
+            Args:
+                key (bytes): the utf-8 encoded key.
+            Return:
+                (int): the total count.
+        """
+        block = bisect.bisect_right(self.index_keys, key) - 1
+        if block < 0:
+            return 0
+        keys, _, cumulative = self.read_block(block)
+        return cumulative[bisect.bisect_left(keys, key)]
+
+    def find_cumulative(self, target):
+        """
+        Returns the key whose range of cumulative counts holds a target count, e.g. to sample keys by their counts
+            Args:
+                target (float): the target, at least 0 and below the total count.
+            Return:
+                (bytes): the key.
+        """
+        block = bisect.bisect_right(self.index_cumulative, target) - 1
+        keys, _, cumulative = self.read_block(block)
+        return keys[min(bisect.bisect_right(cumulative, target) - 1, len(keys) - 1)]
+
+    def iter_range(self, start, end):
+        """
+        Yields the records whose keys are in a range, in order
+            Args:
+                start (bytes): the lowest key of the range.
+                end (bytes): one past the highest key of the range.
+            Return:
+                Generator. The keys and their counts.
+        """
+        block = max(bisect.bisect_right(self.index_keys, start) - 1, 0)
+        while block < len(self.index_keys) and self.index_keys[block] < end:
+            keys, counts, _ = self.read_block(block)
+            for i in range(bisect.bisect_left(keys, start), len(keys)):
+                if keys[i] >= end:
+                    return
+                yield keys[i], counts[i]
+            block += 1
+
+    def get_model_dictionary(self):
+        """Returns a dictionary of the form {ngram:count}, materialized from the sorted file, so it should only be
+        called on models that fit in memory
+        """
+        return {key.decode("utf-8"): count for key, count in self.iter_range(b"", KEY_BOUND)}
+
+    def get_ngram_count(self, ngram):
+        """
+        Returns the count of the given ngram
+            Args:
+                ngram (str): the ngram to count
+            Return:
+                (int): the ngram's count, or None if the ngram is not in the model.
+        """
+        key = ngram.encode("utf-8")
+        block = bisect.bisect_right(self.index_keys, key) - 1
+        if block < 0:
+            return None
+        keys, counts, _ = self.read_block(block)
+        i = bisect.bisect_left(keys, key)
+        return counts[i] if i < len(keys) and keys[i] == key else None
+
+    def memory_usage(self):
+        """
+        Returns an estimate of the memory held by the model's index and cache, in bytes
+            Return:
+                (int): the estimated size of the sparse index, of the cached blocks and of the pending counts.
+        """
+        index = (sys.getsizeof(self.index_keys) + sys.getsizeof(self.index_offsets) +
+                 sys.getsizeof(self.index_cumulative) + sum(map(sys.getsizeof, self.index_keys)) +
+                 sum(map(sys.getsizeof, self.index_offsets)) + sum(map(sys.getsizeof, self.index_cumulative)))
+        cache = sum(sys.getsizeof(keys) + sum(map(sys.getsizeof, keys)) + 2 * sys.getsizeof(counts) +
+                    sum(map(sys.getsizeof, counts)) + sum(map(sys.getsizeof, cumulative))
+                    for keys, counts, cumulative in self.block_cache.entries.values())
+        pending = sys.getsizeof(self.pending) + sum(sys.getsizeof(key) + sys.getsizeof(count)
+                                                    for key, count in self.pending.items())
+        return index + cache + pending
+
+    def count_occure(self, word):
+        """
+        Returns the number of word occurrences in the model, i.e. the total count of the ngrams starting with it
+            Args:
+                (str) ngram or a part of it
+            Return:
+                (int) num of occurrences
+        """
+        if word == "":
+            return self.ngram_total
+        prefix = word.encode("utf-8")
+        return self.count_below(prefix + KEY_BOUND) - self.count_below(prefix)
+
+    def get_context_count(self, context):
+        """
+        Returns the total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the number of times the context was followed by a token in the model
+        """
+        # the ngrams following a full context start with the context and a separator
+        if self.n > 1 and self.is_context_size(context):
+            return self.count_occure(context + self.split_by)
+        return self.count_occure(context)
+
+    def get_markov_n_minus_dict(self, ngram):
+        """
+        finds all the ngram's matching keys in the model, reading their range of the sorted file
+            Args:
+                ngram (str): the ngram to find
+            Return:
+                (dict): all options found in the model, in the form {token:count}.
+        """
+        if self.n > 1 and self.is_context_size(ngram):
+            ngram += self.split_by
+        prefix = ngram.encode("utf-8")
+        markov_options = {}
+        for key, count in self.iter_range(prefix, prefix + KEY_BOUND):
+            tokens = self.split_to_unigrams(key.decode("utf-8"))
+            if len(tokens) >= self.n:
+                markov_options[tokens[self.n - 1]] = count
+        return markov_options
+
+    def is_exhausted_context(self, context):
+        """
+        Checks if the context is exhausted or not
+            Args:
+                (str): the context
+            Return:
+                (bool): True if the context is exhausted, False otherwise.
+        """
+        return self.get_context_count(context) == 0
+
+    def sample_context(self):
+        """
+        Samples a new context from the model's distribution
+            Return:
+                (str): a sampled context
+        """
+        return self.find_cumulative(random.random() * self.ngram_total).decode("utf-8")
+
+    def sample_token(self, context):
+        """
+        Samples the token following the given context from the model's distribution, by the cumulative counts of
+        the context's range of the sorted file
+            Args:
+                context (str): the context, which must not be exhausted.
+            Return:
+                (str): a sampled token
+        """
+        prefix = (context + self.split_by if self.n > 1 else context).encode("utf-8")
+        first, last = self.count_below(prefix), self.count_below(prefix + KEY_BOUND)
+        key = self.find_cumulative(first + random.random() * (last - first))
+        return self.split_to_unigrams(key.decode("utf-8"))[-1]
+
+    def prune(self, min_counts=None, top_k=None):
+        """Drops rare ngrams from the sorted file, as Ngram_Language_Model.prune() does, rewriting it in a single
+        pass. The unigrams are not kept, so their minimal count does not apply. As the context counts are derived
+        from the sorted file, the ngrams' total is recomputed from the remaining counts, so the probabilities of the
+        remaining ngrams are those of a model holding only them.
+        Text containing dropped entries can no longer be retracted.
+
+            Args:
+                min_counts (int or dict): the minimal count of the entries to keep, either for all orders or in the
+                                          form {order:min count}. The model's ngrams are of order n, and the
+                                          entries of the texts shorter than n of their number of tokens.
+                                          Defaults to None, keeping all counts.
+                top_k (int): the number of the most frequent tokens to keep following each context.
+                             Defaults to None, keeping all tokens.
+            Return:
+                (int): the number of entries dropped.
+        """
+
+        def min_count(order):
+            return min_counts.get(order, 0) if isinstance(min_counts, dict) else min_counts or 0
+
+        def group_key(record):
+            # the ngrams following a context are contiguous in the sorted file, while each shorter entry is kept
+            # or dropped by itself
+            tokens = self.split_to_unigrams(record[0].decode("utf-8"))
+            return self.split_by.join(tokens[:-1]) if len(tokens) == self.n else record[0]
+
+        def kept_records():
+            nonlocal records
+            for _, group in itertools.groupby(iter_records(os.path.join(self.path, DATA_FILE), RECORD_HEADER),
+                                              key=group_key):
+                group = list(group)
+                records += len(group)
+                order = len(self.split_to_unigrams(group[0][0].decode("utf-8")))
+                kept = [record for record in group if record[1] >= min_count(order)]
+                if top_k is not None and order == self.n and len(kept) > top_k:
+                    kept = sorted(sorted(kept, key=lambda record: -record[1])[:top_k])
+                yield from kept
+
+        if self.pending or self.runs:
+            self.merge_runs()
+        if not os.path.exists(os.path.join(self.path, DATA_FILE)):
+            return 0
+        self.on_model_change()
+        records = 0
+        self.ngram_total, kept = self.write_sorted_file(kept_records())
+        self.save_parameters(kept)
+        self.open_data()
+        return records - kept
+
+def iter_records(path, header):
+    """
+    Yields the records of a file of keys, each following its header
+        Args:
+            path (str): the file's path.
+            header (struct.Struct): the records' header, starting with the key's length.
+        Return:
+            Generator. The key and the header's other fields of each record.
+    """
+    with open(path, "rb", buffering=READ_SIZE) as f:
+        while True:
+            fields = f.read(header.size)
+            if not fields:
+                return
+            key_length, *values = header.unpack(fields)
+            yield (f.read(key_length), *values)
+
+
+def write_records(path, header, records):
+    """
+    Writes records to a file of keys, each following its header
+        Args:
+            path (str): the file's path.
+            header (struct.Struct): the records' header, starting with the key's length.
+            records (iterable): the key and the header's other fields of each record.
+    """
+    with open(path, "wb", buffering=READ_SIZE) as f:
+        for key, *values in records:
+            f.write(header.pack(len(key), *values) + key)
+
+
+def merge_files(sources, path):
+    """
+    Merges sorted files of counts into a sorted file, summing the counts of equal keys and dropping the keys whose
+    counts sum to 0, and removes the merged files
+        Args:
+            sources (list): the paths of the merged files.
+            path (str): the path of the merged file.
+    """
+    write_records(path, RECORD_HEADER, sum_equal_keys(heapq.merge(*(iter_records(source, RECORD_HEADER)
+                                                                    for source in sources))))
+    for source in sources:
+        os.remove(source)
+
+
+def sum_equal_keys(records):
+    """
+    Sums the counts of consecutive records with equal keys, dropping the keys whose counts sum to 0
+        Args:
+            records (iterable): the keys and counts, sorted by key.
+        Return:
+            Generator. The keys and their summed counts.
+    """
+    for key, group in itertools.groupby(records, key=operator.itemgetter(0)):
+        count = sum(count for _, count in group)
+        if count != 0:
+            yield key, count
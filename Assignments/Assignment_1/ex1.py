@@ -1,8 +1,24 @@
 import re
+import os
 import sys
 import random
 import math
+import bisect
+import heapq
+import time
+import functools
+import itertools
+import contextlib
 import collections
+import concurrent.futures
+
+SENTENCE_ENDS = {".", "!", "?"}  # the tokens (or characters) ending a sentence, for per-sentence scores
+INSTRUMENTED_METHODS = ("build_model", "build_model_parallel", "build_model_from_stream", "update", "retract",
+                        "prune", "finalize", "generate", "generate_many", "beam_search", "evaluate", "evaluate_many",
+                        "evaluate_stream")  # the public methods timed by the instrumentation
+LOOKUP_METHODS = ("get_ngram_count", "get_order_count", "get_context_count", "get_markov_n_minus_dict",
+                  "count_occure", "get_backoff_log_prob")  # the lookups counted by the instrumentation
+TEMPERED_WEIGHTS_SIZE = 1024  # the number of cumulative weights kept for temperatures other than 1
 
 
 class Ngram_Language_Model:
@@ -12,18 +28,46 @@ class Ngram_Language_Model:
         The class can be applied on both word level and character level.
     """
 
-    def __init__(self, n=3, chars=False):
+    def __init__(self, n=3, chars=False, all_orders=False):
         """Initializing a language model object.
         Args:
             n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
             chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
                           Defaults to False.
+            all_orders (bool): True to count the ngrams of every order from 1 to n while building the model, so
+                               lower order counts are looked up directly. Defaults to False.
         """
         self.n = n
         self.model_dict = collections.defaultdict(
             int)  # a dictionary of the form {ngram:count}, holding counts of all ngrams in the specified text.
         self.chars = chars
         self.unigram_dict = collections.defaultdict(int)
+        self.order_dicts = None  # a dictionary of the form {order:{ngram:count}} if all orders are counted
+        if all_orders and n >= 1:
+            self.order_dicts = {order: collections.defaultdict(int) for order in range(2, n)}
+            self.order_dicts.update({1: self.unigram_dict, n: self.model_dict})
+        self.sorted_keys = None  # the model's keys in sorted order, None until the prefix index is (re)built.
+        self.cumulative_counts = None  # cumulative counts of the sorted keys, starting with 0.
+        self.prefix_deltas = {}  # a dictionary of the form {ngram:count change}, since the prefix index was built
+        self.sorted_delta_keys = None  # the changed keys in sorted order, None until (re)built.
+        self.cumulative_deltas = None  # cumulative count changes of the sorted changed keys, starting with 0.
+        self.context_dict = collections.defaultdict(
+            dict)  # a dictionary of the form {context:{token:count}}, indexing the ngrams by their n-1 first tokens.
+        self.context_totals = collections.defaultdict(int)  # a dictionary of the form {context:count}
+        self.ngram_total = 0  # running total of the ngram counts
+        self.unigram_total = 0  # running total of the unigram counts
+        self.sampling_tables = {}  # a dictionary of the form {context:(tokens, cumulative counts)}, built lazily
+        self.context_sampling_table = None  # the ngrams and their cumulative counts, built lazily
+        self.continuations = {}  # the tokens following each context sorted by count, built by finalize() or lazily
+        self.tempered_weights = LRU_Cache(TEMPERED_WEIGHTS_SIZE)  # cumulative weights by (context, temperature)
+        self.smoothing = None  # the smoothing method and its parameters, set by finalize()
+        self.backoff_log_probs = None  # a dictionary of the form {order:{ngram:log prob}}, built lazily
+        self.backoff_weights = None  # a dictionary of the form {order:{context:log weight}}, built lazily
+        self.backoff_default = 0.0  # the log weight of a context missing from backoff_weights
+        self.unknown_log_prob = None  # the log probability of an unknown token, before the unigrams' backoff weight
+        self.ngram_cache = None  # the cached log probabilities of ngrams, if caching is enabled
+        self.text_cache = None  # the cached scores of texts, if caching is enabled
+        self.instrumentation = None  # the counters of the model's calls, if instrumentation is enabled
         self.split_by = "" if self.chars else " "
 
     def split_to_unigrams(self, text):
@@ -54,30 +98,483 @@ class Ngram_Language_Model:
             n_grams.append(n_gram)
         return n_grams
 
+    def on_model_change(self, contexts=None):
+        """
+        Invalidates the tables derived from the counts, so they are rebuilt lazily. Called whenever the counts change.
+            Args:
+                contexts (iterable): the contexts whose counts have changed, if only a few of them did and the
+                                     changed keys were recorded in prefix_deltas. Defaults to None, invalidating
+                                     all the tables.
+        """
+        if contexts is None or self.n < 2:
+            self.sorted_keys = None
+            self.prefix_deltas = {}
+            self.sampling_tables = {}
+            self.continuations = {}
+        else:
+            for context in contexts:
+                self.sampling_tables.pop(context, None)
+                self.continuations.pop(context, None)
+        self.tempered_weights.clear()
+        self.sorted_delta_keys = None
+        self.context_sampling_table = None
+        self.backoff_log_probs = None
+        self.clear_caches()
+
+    def set_cache(self, ngrams=1 << 16, texts=0):
+        """
+        Enables (or disables) caching the log probabilities of ngrams, and the scores of whole texts, for
+        repeated scoring. The caches are cleared whenever the model changes.
+            Args:
+                ngrams (int): the number of ngrams to cache, 0 to disable. Defaults to 64K.
+                texts (int): the number of texts to cache, 0 to disable. Defaults to 0.
+        """
+        self.ngram_cache = LRU_Cache(ngrams) if ngrams > 0 else None
+        self.text_cache = LRU_Cache(texts) if texts > 0 else None
+
+    def clear_caches(self):
+        """
+        Clears the cached log probabilities and scores, keeping their counters
+        """
+        for cache in (self.ngram_cache, self.text_cache):
+            if cache is not None:
+                cache.clear()
+
+    def get_cache_stats(self):
+        """
+        Returns the counters of the caches, to size them by
+            Return:
+                (dict): the statistics of each enabled cache, of the form {"ngrams":stats, "texts":stats}.
+        """
+        return {name: cache.get_stats() for name, cache in (("ngrams", self.ngram_cache), ("texts", self.text_cache))
+                if cache is not None}
+
+    def enable_instrumentation(self):
+        """
+        Starts counting the calls, the wall time, the lookups, the scans and the cache hits of the model's public
+        methods. The methods are wrapped on this model only, so a model that is not instrumented runs unchanged.
+        The instrumentation is not copied when the model is copied or pickled.
+            Return:
+                (Model_Instrumentation): the instrumentation's counters.
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Model_Instrumentation(self)
+            for name in INSTRUMENTED_METHODS + LOOKUP_METHODS:
+                if hasattr(self, name):
+                    setattr(self, name, self.instrumentation.wrap(name, getattr(self, name), name in LOOKUP_METHODS))
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """
+        Stops the instrumentation, unwrapping the model's methods
+            Return:
+                (dict): the final snapshot of the counters, or None if the model was not instrumented.
+        """
+        if self.instrumentation is None:
+            return None
+        snapshot = self.instrumentation.snapshot()
+        for name in self.instrumentation.wrapped:
+            delattr(self, name)
+        self.instrumentation = None
+        return snapshot
+
+    def get_instrumentation_stats(self):
+        """
+        Returns a snapshot of the instrumentation's counters
+            Return:
+                (dict): the counters of each called method, of the form {method:counters}, or None if the model is
+                        not instrumented.
+        """
+        return None if self.instrumentation is None else self.instrumentation.snapshot()
+
+    @contextlib.contextmanager
+    def instrumented(self):
+        """
+        Instruments the model within a with block, counting only the calls made in the block. A model that was not
+        instrumented before the block is not instrumented after it.
+            Return:
+                (dict): the counters of each method called in the block, of the form {method:counters}, filled when
+                        the block exits.
+        """
+        enabled = self.instrumentation is not None
+        instrumentation = self.enable_instrumentation()
+        scope = instrumentation.open_scope()
+        stats = {}
+        try:
+            yield stats
+        finally:
+            stats.update(instrumentation.close_scope(scope))
+            if not enabled:
+                self.disable_instrumentation()
+
+    def __getstate__(self):
+        """
+        Returns the model's attributes to copy or pickle, without the instrumentation's wrappers
+        """
+        state = self.__dict__.copy()
+        if self.instrumentation is not None:
+            for name in self.instrumentation.wrapped:
+                state.pop(name)
+            state["instrumentation"] = None
+        return state
+
+    def split_context(self, n_gram):
+        """
+        Splits an n-gram into its context (the n-1 first tokens) and its last token
+            Args:
+                n_gram (str): the n-gram to split.
+            Return:
+                (tuple): the context and the last token of the n-gram.
+        """
+        if self.chars:
+            return n_gram[:self.n - 1], n_gram[self.n - 1:]
+        context, _, token = n_gram.rpartition(self.split_by)
+        return context, token
+
+    def is_context_size(self, ngram):
+        """
+        Checks if the given string holds exactly n-1 tokens, i.e. it is a full context of the model
+            Args:
+                ngram (str): the string to check
+            Return:
+                (bool): True if the string is a full context, False otherwise.
+        """
+        return len(self.split_to_unigrams(ngram)) == self.n - 1
+
     def build_model(self, text):
         """populates the instance variable model_dict.
 
             Args:
                 text (str): the text to construct the model from.
         """
-        n_grams_list = self.split_to_n_grams(text)
         unigrams = self.split_to_unigrams(text)
 
-        # build the n-gram dictionary
-        for n_gram in n_grams_list:
+        # texts shorter than n are split to unigrams, which have no context to be indexed by
+        if self.n < 1 or len(unigrams) < self.n:
+            self.on_model_change()
+            n_grams_list = self.split_to_n_grams(text)
+            for n_gram in n_grams_list:
+                occur_num = self.model_dict.setdefault(n_gram, 0)
+                self.model_dict.update({n_gram: occur_num + 1})
+            self.ngram_total += len(n_grams_list)
+
+        self.count_tokens(unigrams)
+
+    def count_tokens(self, tokens, history=()):
+        """
+        Counts the given tokens and the n-grams ending in them into the model
+            Args:
+                tokens (list): the tokens to count.
+                history (list): the last n-1 tokens preceding the given ones, if any. Defaults to none.
+            Return:
+                (list): the last n-1 tokens, to be passed as the history of the tokens that follow.
+        """
+        self.on_model_change()
+        sequence = list(history) + tokens
+
+        # build the n-gram dictionary and the context index
+        n_grams_num = max(len(sequence) - self.n + 1, 0) if self.n >= 1 else 0
+        for i in range(n_grams_num):
+            n_gram = self.split_by.join(sequence[i:i + self.n])
             occur_num = self.model_dict.setdefault(n_gram, 0)
             self.model_dict.update({n_gram: occur_num + 1})
+            context, token = self.split_context(n_gram)
+            self.context_dict[context][token] = occur_num + 1
+            self.context_totals[context] += 1
+        self.ngram_total += n_grams_num
 
         # build the unigram dictionary
-        for unigram in unigrams:
+        for unigram in tokens:
             occur_num = self.unigram_dict.setdefault(unigram, 0)
             self.unigram_dict.update({unigram: occur_num + 1})
+        self.unigram_total += len(tokens)
+
+        # build the dictionaries of the orders between 1 and n, counting the ngrams ending in the given tokens
+        if self.order_dicts is not None:
+            for end in range(len(sequence) - len(tokens) + 1, len(sequence) + 1):
+                for order in range(2, min(self.n, end + 1)):
+                    self.order_dicts[order][self.split_by.join(sequence[end - order:end])] += 1
+
+        return sequence[len(sequence) - self.n + 1:] if self.n > 1 else []
+
+    def build_model_parallel(self, text, workers=None):
+        """populates the instance variable model_dict, counting shards of the text in parallel processes.
+        Every shard is counted along with the n-1 tokens preceding it, so the n-grams crossing the shards'
+        boundaries are counted exactly once, and the partial counts are merged in the shards' order.
+        The model is identical to the one built by build_model().
+
+            Args:
+                text (str): the text to construct the model from.
+                workers (int): the number of processes. Defaults to the number of CPUs.
+        """
+        workers = workers or os.cpu_count() or 1
+        boundaries = self.split_to_shards(text, workers)
+        tokens_num = len(text) if self.chars else text.count(self.split_by) + 1
+        if len(boundaries) < 1 or self.n < 1 or tokens_num < self.n:
+            self.build_model(text)
+            return
+
+        starts = [0] + [end + len(self.split_by) for end in boundaries]
+        ends = boundaries + [len(text)]
+        shards = [text[start:end] for start, end in zip(starts, ends)]
+        histories = [[]] + [self.get_history(text, end) for end in boundaries]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            partial_counts = executor.map(count_shard, [self.n] * len(shards), [self.chars] * len(shards), shards,
+                                          histories, [self.order_dicts is not None] * len(shards))
+            for model_dict, unigram_dict, order_dicts in partial_counts:
+                self.merge_counts(model_dict, unigram_dict)
+                self.merge_order_counts(order_dicts)
+
+    def split_to_shards(self, text, shards):
+        """
+        Finds the positions to split a text at into shards of about the same size, without splitting tokens
+            Args:
+                text (str): the text to split.
+                shards (int): the number of shards.
+            Return:
+                (list): the increasing positions the shards end at, excluding the last one. For word models
+                        these are positions of separating spaces.
+        """
+        boundaries = []
+        for i in range(1, shards):
+            position = len(text) * i // shards
+            if not self.chars:
+                position = text.find(self.split_by, position)
+            if position > (boundaries[-1] if boundaries else 0):
+                boundaries.append(position)
+        return boundaries
+
+    def get_history(self, text, end):
+        """
+        Returns the (up to) n-1 tokens of the text that precede the given position
+            Args:
+                text (str): the text.
+                end (int): the position. For word models, the position of a separating space.
+            Return:
+                (list): the tokens preceding the position.
+        """
+        if self.n < 2:
+            return []
+        if self.chars:
+            return list(text[max(end - self.n + 1, 0):end])
+        start = end
+        for _ in range(self.n - 1):
+            start = text.rfind(self.split_by, 0, start)
+            if start < 0:
+                break
+        return self.split_to_unigrams(text[start + 1:end])
+
+    def merge_counts(self, model_dict, unigram_dict):
+        """
+        Adds partial counts, collected over the same n, into the model
+            Args:
+                model_dict (dict): n-gram counts of the form {ngram:count}.
+                unigram_dict (dict): unigram counts of the form {unigram:count}.
+        """
+        self.on_model_change()
+        for n_gram, count in model_dict.items():
+            occur_num = self.model_dict.setdefault(n_gram, 0) + count
+            self.model_dict.update({n_gram: occur_num})
+            context, token = self.split_context(n_gram)
+            self.context_dict[context][token] = occur_num
+            self.context_totals[context] += count
+            self.ngram_total += count
+
+        for unigram, count in unigram_dict.items():
+            self.unigram_dict[unigram] += count
+            self.unigram_total += count
+
+    def merge_order_counts(self, order_dicts):
+        """
+        Adds partial counts of the orders between 1 and n, collected over the same n, into the model
+            Args:
+                order_dicts (dict): counts of the form {order:{ngram:count}}.
+        """
+        for order, counts in order_dicts.items():
+            for n_gram, count in counts.items():
+                update_count(self.order_dicts[order], n_gram, count)
+
+    def update(self, text):
+        """Adds the counts of the text to the model, like build_model(), adjusting the derived tables incrementally
+        so the update takes time proportional to the text rather than to the model.
+
+            Args:
+                text (str): the text to add.
+        """
+        self.apply_delta(text, 1)
+
+    def retract(self, text):
+        """Removes the counts of a text previously added by build_model() or update(), dropping the entries
+        whose count reaches zero. The derived tables are adjusted incrementally.
+
+            Args:
+                text (str): the text to remove.
+        """
+        self.apply_delta(text, -1)
+
+    def apply_delta(self, text, sign):
+        """
+        Adds (or subtracts) the counts of a text to the model and to the derived tables
+            Args:
+                text (str): the text.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        delta = Ngram_Language_Model(n=self.n, chars=self.chars, all_orders=self.order_dicts is not None)
+        delta.build_model(text)
+        if sign < 0 and (any(self.model_dict.get(n_gram, 0) < count for n_gram, count in delta.model_dict.items()) or
+                         any(self.unigram_dict.get(unigram, 0) < count
+                             for unigram, count in delta.unigram_dict.items())):
+            raise ValueError("the text cannot be retracted, as it was not counted into the model")
+        if self.order_dicts is not None:
+            self.merge_order_counts({order: {n_gram: sign * count for n_gram, count in counts.items()}
+                                     for order, counts in delta.order_dicts.items() if 1 < order < self.n})
+
+        record_prefixes = self.sorted_keys is not None
+        for n_gram, count in delta.model_dict.items():
+            update_count(self.model_dict, n_gram, sign * count)
+            if record_prefixes:
+                update_count(self.prefix_deltas, n_gram, sign * count)
+        for context, options in delta.context_dict.items():
+            markov_options = self.context_dict[context]
+            for token, count in options.items():
+                update_count(markov_options, token, sign * count)
+            if not markov_options:
+                del self.context_dict[context]
+            update_count(self.context_totals, context, sign * delta.context_totals[context])
+        for unigram, count in delta.unigram_dict.items():
+            update_count(self.unigram_dict, unigram, sign * count)
+        self.ngram_total += sign * delta.ngram_total
+        self.unigram_total += sign * delta.unigram_total
+        self.on_model_change(delta.context_dict.keys() if record_prefixes else None)
+
+    def prune(self, min_counts=None, top_k=None):
+        """Drops rare entries from the model to reduce its memory. The totals are kept, so the probabilities of
+        the remaining ngrams do not change and the dropped ngrams are smoothed like unseen ones.
+        Text containing dropped entries can no longer be retracted.
+
+            Args:
+                min_counts (int or dict): the minimal count of the entries to keep, either for all orders or in the
+                                          form {order:min count}. The unigrams are of order 1 and the model's ngrams
+                                          of order n. Defaults to None, keeping all counts.
+                top_k (int): the number of the most frequent tokens to keep following each context.
+                             Defaults to None, keeping all tokens.
+            Return:
+                (int): the number of entries dropped.
+        """
+
+        def min_count(order):
+            return min_counts.get(order, 0) if isinstance(min_counts, dict) else min_counts or 0
+
+        dropped = 0
+        for context, markov_options in list(self.context_dict.items()):
+            kept = sorted(markov_options.items(), key=lambda option: -option[1])[:top_k] if top_k is not None \
+                else markov_options.items()
+            kept = {token: count for token, count in kept if count >= min_count(self.n)}
+            for token in markov_options.keys() - kept.keys():
+                del self.model_dict[self.split_by.join((context, token)) if self.n > 1 else token]
+            dropped += len(markov_options) - len(kept)
+            if kept:
+                self.context_dict[context] = kept
+            else:
+                del self.context_dict[context]
+
+        # texts shorter than n add shorter entries, which are not indexed by a context
+        if len(self.model_dict) > sum(map(len, self.context_dict.values())):
+            short = [n_gram for n_gram, count in self.model_dict.items()
+                     if len(self.split_to_unigrams(n_gram)) < self.n and
+                     count < min_count(len(self.split_to_unigrams(n_gram)))]
+            for n_gram in short:
+                del self.model_dict[n_gram]
+            dropped += len(short)
+
+        for order, counts in (self.order_dicts or {}).items():
+            if 1 < order < self.n:
+                rare = [n_gram for n_gram, count in counts.items() if count < min_count(order)]
+                for n_gram in rare:
+                    del counts[n_gram]
+                dropped += len(rare)
+
+        rare = [unigram for unigram, count in self.unigram_dict.items() if count < min_count(1)]
+        for unigram in rare:
+            del self.unigram_dict[unigram]
+        self.on_model_change()
+        return dropped + len(rare)
+
+    def build_model_from_stream(self, source, chunk_size=1 << 20):
+        """populates the instance variable model_dict from a text that is read in chunks.
+        The model is identical to the one built by build_model() on the whole text, while the memory used
+        is bounded by the size of the model and of a single chunk.
+
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks (e.g. lines).
+                                          The chunks are concatenated as is.
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+        """
+        if self.n < 1:
+            raise ValueError("streaming requires n >= 1, got %d" % self.n)
+
+        # tokens are buffered until the first n-gram is complete, as shorter texts are counted differently
+        buffered = []
+        history = None
+        for tokens in self.iter_stream_tokens(source, chunk_size):
+            if history is None:
+                buffered.extend(tokens)
+                if len(buffered) < self.n:
+                    continue
+                tokens, history = buffered, []
+            history = self.count_tokens(tokens, history)
+        if history is None:
+            self.build_model(self.split_by.join(buffered))
+
+    def iter_stream_tokens(self, source, chunk_size=1 << 20):
+        """
+        Splits a text that is read in chunks into tokens. A word split between two chunks is carried
+        over to the next chunk.
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks.
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+            Return:
+                (generator): lists of complete tokens, in order.
+        """
+        carry = ""
+        for chunk in iter_text_chunks(source, chunk_size):
+            tokens = self.split_to_unigrams(carry + chunk)
+            carry = "" if self.chars else tokens.pop()
+            if tokens:
+                yield tokens
+        if not self.chars:
+            yield [carry]
 
     def get_model_dictionary(self):
         """Returns the dictionary class object
         """
         return self.model_dict
 
+    def get_ngram_count(self, ngram):
+        """
+        Returns the count of the given ngram
+            Args:
+                ngram (str): the ngram to count
+            Return:
+                (int): the ngram's count, or None if the ngram is not in the model.
+        """
+        return self.model_dict.get(ngram)
+
+    def memory_usage(self):
+        """
+        Returns an estimate of the memory held by the model's tables, in bytes
+            Return:
+                (int): the estimated size of the dictionaries, their keys and their values.
+        """
+
+        def dict_size(d):
+            return sys.getsizeof(d) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in d.items())
+
+        return (dict_size(self.model_dict) + dict_size(self.unigram_dict) + dict_size(self.context_totals) +
+                sys.getsizeof(self.context_dict) + sum(sys.getsizeof(context) + dict_size(options)
+                                                       for context, options in self.context_dict.items()) +
+                sum(dict_size(counts) for order, counts in (self.order_dicts or {}).items() if 1 < order < self.n))
+
     def get_model_window_size(self):
         """Returning the size of the context window (the n in "n-gram")
         """
@@ -85,13 +582,24 @@ class Ngram_Language_Model:
 
     def get_markov_n_minus_dict(self, ngram):
         """
-        finds all the ngram's matching keys in the model
+        finds all the ngram's matching keys in the model.
+        A full context (n-1 tokens) is answered directly from the context index, any other string
+        is matched against the prefixes of the model's keys.
             Args:
                 ngram (str): the ngram to find
             Return:
-                (defaultdict): all options found in the model
+                (dict): all options found in the model, in the form {token:count}.
+                        Should not be modified by the caller.
 
         """
+        markov_options = self.context_dict.get(ngram)
+        if markov_options is not None:
+            return markov_options
+        if self.is_context_size(ngram):
+            return {}
+
+        if self.instrumentation is not None:
+            self.instrumentation.count_scan("get_markov_n_minus_dict")
         markov_options = {}
         for key in self.model_dict.keys():
             if key.startswith(ngram):
@@ -99,13 +607,58 @@ class Ngram_Language_Model:
                 markov_options[mo_key] = self.model_dict.get(key)
         return markov_options
 
+    def get_order_count(self, ngram):
+        """
+        Returns the count of the given ngram among the ngrams of its order. Requires all the orders to be counted.
+            Args:
+                ngram (str): the ngram, of 1 to n tokens.
+            Return:
+                (int): the number of times the ngram occurs in the text.
+        """
+        return self.order_dicts[len(self.split_to_unigrams(ngram))].get(ngram, 0)
+
+    def get_context_count(self, context):
+        """
+        Returns the total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the number of times the context was followed by a token in the model
+        """
+        if context in self.context_totals:
+            return self.context_totals[context]
+        return sum(self.get_markov_n_minus_dict(context).values())
+
     def sample_context(self):
         """
         Samples a new context from the model's distribution
             Return:
                 (str): a sampled context
         """
-        return random.choices(list(self.model_dict.keys()), weights=list(self.model_dict.values()))[0]
+        if self.context_sampling_table is None:
+            if self.instrumentation is not None:
+                self.instrumentation.count_scan("sample_context")
+            self.context_sampling_table = (list(self.model_dict.keys()),
+                                           list(itertools.accumulate(self.model_dict.values())))
+        n_grams, cumulative_counts = self.context_sampling_table
+        return random.choices(n_grams, cum_weights=cumulative_counts)[0]
+
+    def sample_token(self, context):
+        """
+        Samples the token following the given context from the model's distribution.
+        The context's tokens and cumulative counts are tabulated on the first call, so each sample is a binary search.
+            Args:
+                context (str): the context, which must not be exhausted.
+            Return:
+                (str): a sampled token
+        """
+        table = self.sampling_tables.get(context)
+        if table is None:
+            markov_options = self.get_markov_n_minus_dict(context)
+            table = list(markov_options.keys()), list(itertools.accumulate(markov_options.values()))
+            self.sampling_tables[context] = table
+        tokens, cumulative_counts = table
+        return random.choices(tokens, cum_weights=cumulative_counts)[0]
 
     def is_exhausted_context(self, context):
         """
@@ -117,7 +670,68 @@ class Ngram_Language_Model:
         """
         return len(self.get_markov_n_minus_dict(context)) == 0
 
-    def generate(self, context=None, n=20):
+    def get_continuations(self, context, temperature=1.0):
+        """
+        Returns the tokens following a context, sorted by their counts (the most frequent first, ties by token),
+        and the cumulative weights of the sorted tokens at a temperature, the weight of a token being its count to
+        the power of 1/temperature (scaled by the largest count). The sorted tokens and their cumulative counts are
+        kept once per context, while the cumulative weights at other temperatures are kept for the
+        TEMPERED_WEIGHTS_SIZE most recently used contexts and temperatures, as the temperatures are unbounded.
+            Args:
+                context (str): the context.
+                temperature (float): the temperature, above 0. Defaults to 1, weighting the tokens by their counts.
+            Return:
+                (tuple): the sorted tokens, their counts and their cumulative weights. Should not be modified by the
+                         caller.
+        """
+        entry = self.continuations.get(context)
+        if entry is None:
+            markov_options = self.get_markov_n_minus_dict(context)
+            tokens = sorted(markov_options, key=lambda token: (-markov_options[token], token))
+            counts = [markov_options[token] for token in tokens]
+            entry = self.continuations[context] = (tokens, counts, list(itertools.accumulate(counts)))
+        tokens, counts, cumulative = entry
+        if temperature != 1.0:
+            tempered = self.tempered_weights.get((context, temperature))
+            if tempered is None:
+                tempered = list(itertools.accumulate((count / counts[0]) ** (1 / temperature) for count in counts))
+                self.tempered_weights.put((context, temperature), tempered)
+            cumulative = tempered
+        return tokens, counts, cumulative
+
+    def build_continuations(self):
+        """
+        Lists the sorted tokens following every context of the model at once, rather than on their first use
+        """
+        self.continuations = {}
+        for context in self.context_dict or {}:
+            self.get_continuations(context)
+
+    def sample_truncated(self, context, top_k=None, top_p=None, temperature=1.0):
+        """
+        Samples the token following the given context among its most frequent tokens. Only the sorted tokens kept
+        are searched, so each sample is a binary search.
+            Args:
+                context (str): the context, which must not be exhausted.
+                top_k (int): the number of most frequent tokens to sample from. Defaults to None, keeping all.
+                top_p (float): the smallest probability mass of the most frequent tokens to sample from, between 0
+                               and 1. Defaults to None, keeping all.
+                temperature (float): the temperature of the distribution, 0 to take the most frequent token.
+                                     Defaults to 1.
+            Return:
+                (str): a sampled token
+        """
+        if temperature == 0:
+            return self.get_continuations(context)[0][0]
+        tokens, _, cumulative = self.get_continuations(context, temperature)
+        kept = len(tokens)
+        if top_k is not None:
+            kept = min(kept, top_k)
+        if top_p is not None:
+            kept = min(kept, bisect.bisect_left(cumulative, top_p * cumulative[-1]) + 1)
+        return tokens[bisect.bisect_right(cumulative, random.random() * cumulative[kept - 1], 0, kept - 1)]
+
+    def generate(self, context=None, n=20, top_k=None, top_p=None, temperature=1.0):
         """Returns a string of the specified length, generated by applying the language model
         to the specified seed context.
 
@@ -131,14 +745,45 @@ class Ngram_Language_Model:
         Generation stops before the n'th word for the following cases:
             * The contexts are exhausted.
             * Preliminary context is not in the vocabulary.
+        The tokens are sampled from the model's distribution, unless they are sampled among the most frequent
+        tokens (top_k, top_p) or at another temperature.
             Args:
                 context (str): a seed context to start the generated string from. Defaults to None
                 n (int): the length of the string to be generated.
+                top_k (int): the number of most frequent tokens to sample each token from. Defaults to None.
+                top_p (float): the smallest probability mass of the most frequent tokens to sample each token from.
+                               Defaults to None.
+                temperature (float): the temperature of the distribution, 0 to take the most frequent tokens.
+                                     Defaults to 1.
 
             Return:
                 String. The generated text.
         """
-        chain = []
+        return self.split_by.join(self.iter_generate(context, n, top_k, top_p, temperature))
+
+    def iter_generate(self, context=None, n=20, top_k=None, top_p=None, temperature=1.0):
+        """Yields the tokens of the string generate() returns, one at a time as they are sampled.
+        Only the last n-1 tokens are kept, so very long strings are generated in constant memory.
+        A seed context shorter than n-1 is yielded as a single element.
+            Args:
+                context (str): a seed context to start the generated string from. Defaults to None
+                n (int): the length of the string to be generated.
+                top_k (int): the number of most frequent tokens to sample each token from. Defaults to None.
+                top_p (float): the smallest probability mass of the most frequent tokens to sample each token from.
+                               Defaults to None.
+                temperature (float): the temperature of the distribution, 0 to take the most frequent tokens.
+                                     Defaults to 1.
+
+            Return:
+                Generator. The generated tokens.
+        """
+        if top_k is not None and top_k < 1 or top_p is not None and not 0 < top_p <= 1 or temperature < 0:
+            raise ValueError("top_k must be positive, top_p between 0 and 1 and temperature non negative")
+        truncated = top_k is not None or top_p is not None or temperature != 1.0
+
+        # the context is the last n-1 tokens (the models' quirks for n < 2 need the whole chain)
+        chain = collections.deque(maxlen=self.n - 1) if self.n > 1 else []
+        chain_len = 0
 
         # If no context is specified the context should be sampled from the models' contexts distribution.
         if context is None:
@@ -149,52 +794,146 @@ class Ngram_Language_Model:
 
         # context is shorter than n-1
         if len(self.split_to_unigrams(context)) < self.n - 1:
+            yield context
             chain.append(context)
+            chain_len += 1
             if self.is_exhausted_context(context):
-                return self.split_by.join(chain)
+                return
             else:
                 context = self.sample_context()
 
         # concat context to the output word chain
-        chain.extend(self.split_to_unigrams(context))
-        chain_len = len(chain)
+        for token in self.split_to_unigrams(context):
+            yield token
+            chain.append(token)
+            chain_len += 1
 
         # context is longer then the output text length
         if chain_len >= n:
-            return self.split_by.join(chain)
+            return
 
         while True:
-            context = self.split_by.join(chain[-self.n + 1:])
+            context = self.split_by.join(chain if self.n > 1 else chain[-self.n + 1:])
             if self.is_exhausted_context(context):
                 break
 
             # If generated text reached the n'th word
-            if len(chain) == n:
+            if chain_len == n:
                 break
 
             else:
-                markov_options = self.get_markov_n_minus_dict(context)
-                chosen_key = random.choices(list(markov_options.keys()), weights=list(markov_options.values()))[0]
-                chain.append(chosen_key)
-        return self.split_by.join(chain)
+                token = self.sample_truncated(context, top_k, top_p, temperature) if truncated else \
+                    self.sample_token(context)
+                yield token
+                chain.append(token)
+                chain_len += 1
+
+    def generate_many(self, count, context=None, n=20, top_k=None, top_p=None, temperature=1.0):
+        """Returns a list of strings generated by generate(), sharing the model's sampling tables.
+            Args:
+                count (int): the number of strings to generate.
+                context (str): a seed context to start the generated strings from. Defaults to None, in which
+                               case a context is sampled for each string.
+                n (int): the length of each string to be generated.
+                top_k (int): the number of most frequent tokens to sample each token from. Defaults to None.
+                top_p (float): the smallest probability mass of the most frequent tokens to sample each token from.
+                               Defaults to None.
+                temperature (float): the temperature of the distribution. Defaults to 1.
+
+            Return:
+                List. The generated texts.
+        """
+        return [self.generate(context, n, top_k, top_p, temperature) for _ in range(count)]
+
+    def beam_search(self, context=None, n=20, beam_width=4):
+        """Returns the most likely string of the specified length starting with the seed context, by a beam search
+        over the most frequent tokens following each context, which is deterministic.
+        The seed context is handled as generate() handles it, the most frequent ngram of the model replacing a
+        sampled context. A string that reaches an exhausted context ends early, and is compared with the others by
+        its probability so far.
+            Args:
+                context (str): a seed context to start the string from. Defaults to None, starting with the most
+                               frequent ngram.
+                n (int): the length of the string.
+                beam_width (int): the number of most likely strings extended at each step. Defaults to 4.
+
+            Return:
+                String. The most likely string found.
+        """
+        if beam_width < 1:
+            raise ValueError("beam_width must be positive, got %d" % beam_width)
+        if context is None:
+            context = self.get_most_frequent_ngram()
+        context = normalize_text(context)
+        chain = []
+        if len(self.split_to_unigrams(context)) < self.n - 1:
+            chain.append(context)
+            if self.is_exhausted_context(context):
+                return context
+            context = self.get_most_frequent_ngram()
+        chain.extend(self.split_to_unigrams(context))
+
+        beams = [(0.0, chain)]  # the log probability of each string's continuation of the seed, and the string
+        while True:
+            candidates, extended = [], False
+            for log_prob, tokens in beams:
+                context = self.split_by.join(tokens[len(tokens) - self.n + 1:] if self.n > 1 else tokens[1 - self.n:])
+                if len(tokens) >= n or self.is_exhausted_context(context):
+                    candidates.append((log_prob, tokens))
+                    continue
+                continuation, counts, cumulative = self.get_continuations(context)
+                for token, count in zip(continuation[:beam_width], counts):
+                    candidates.append((log_prob + math.log(count / cumulative[-1]), tokens + [token]))
+                extended = True
+            beams = heapq.nlargest(beam_width, candidates, key=lambda candidate: candidate[0])
+            if not extended:
+                return self.split_by.join(beams[0][1])
+
+    def get_most_frequent_ngram(self):
+        """
+        Returns the model's most frequent ngram, the smallest one if several are
+            Return:
+                (str): the ngram.
+        """
+        return min(self.get_model_dictionary().items(), key=lambda item: (-item[1], item[0]))[0]
 
     def count_occure(self, word):
         """
-        Returns the number of word occurrences in the model
+        Returns the number of word occurrences in the model, i.e. the total count of the ngrams starting with it.
+        The prefix index is (re)built lazily after the model changes.
             Args:
                 (str) ngram or a part of it
             Return:
                 (int) num of occurrences
         """
-        counter = 0
-        for key in self.model_dict.keys():
-            if key.startswith(word):
-                counter += self.model_dict.get(key, 0)
-        return counter
+        if self.sorted_keys is None or len(self.prefix_deltas) > max(len(self.sorted_keys) // 16, 1024):
+            self.build_prefix_index()
+        count = count_prefix(self.sorted_keys, self.cumulative_counts, word)
+        if self.prefix_deltas:
+            if self.sorted_delta_keys is None:
+                self.sorted_delta_keys = sorted(self.prefix_deltas.keys())
+                self.cumulative_deltas = list(itertools.accumulate(
+                    (self.prefix_deltas[key] for key in self.sorted_delta_keys), initial=0))
+            count += count_prefix(self.sorted_delta_keys, self.cumulative_deltas, word)
+        return count
+
+    def build_prefix_index(self):
+        """
+        Sorts the model's keys and accumulates their counts, so the keys starting with a prefix form a
+        contiguous range and their total count is the difference of two cumulative counts.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.count_scan("build_prefix_index")
+        self.prefix_deltas = {}
+        self.sorted_delta_keys = None
+        self.sorted_keys = sorted(self.model_dict.keys())
+        self.cumulative_counts = list(itertools.accumulate((self.model_dict[key] for key in self.sorted_keys),
+                                                           initial=0))
 
     def evaluate(self, text):
         """Returns the log-likelihood of the specified text to be a product of the model.
-           Laplace smoothing should be applied if necessary.
+           Laplace smoothing should be applied if necessary, unless the model was finalized with another
+           smoothing method.
 
            Args:
                text (str): Text to evaluate.
@@ -202,34 +941,297 @@ class Ngram_Language_Model:
            Returns:
                Float. The float should reflect the (log) probability.
         """
-        probs = []
-        n_grams_list = self.split_to_n_grams(text)
-        unigrams_size = sum(self.unigram_dict.values())  # number of unigrams in total
-        ngram_size = sum(self.model_dict.values())
+        if self.text_cache is not None:
+            score = self.text_cache.get(text)
+            if score is not None:
+                return score
+
+        if self.smoothing is not None:
+            score = self.evaluate_backoff(text)
+        else:
+            n_grams_list = self.split_to_n_grams(text)
+            probs = self.evaluate_leading(n_grams_list[0])
+
+            for ngram in n_grams_list:
+                probs.append(self.get_ngram_log_prob(ngram))
+            score = sum(probs)
 
-        first_ngram = n_grams_list[0]
+        if self.text_cache is not None:
+            self.text_cache.put(text, score)
+        return score
+
+    def get_ngram_log_prob(self, ngram):
+        """
+        Returns the log probability of the last token of an ngram given its context, as evaluate() scores it
+            Args:
+                ngram (str): the ngram.
+            Return:
+                (float): the log probability, Laplace smoothed if the ngram is not in the model.
+        """
+        if self.ngram_cache is not None:
+            log_prob = self.ngram_cache.get(ngram)
+            if log_prob is not None:
+                return log_prob
+
+        n_gram_count = self.get_ngram_count(ngram)
+        ngram_prob = self.smooth(ngram) if n_gram_count is None else n_gram_count / self.get_context_count(
+            self.split_context(ngram)[0])
+        log_prob = math.log(ngram_prob)
+
+        if self.ngram_cache is not None:
+            self.ngram_cache.put(ngram, log_prob)
+        return log_prob
+
+    def evaluate_stream(self, source, chunk_size=1 << 20):
+        """Returns the log-likelihood of a text that is read in chunks, as evaluate() scores the whole text.
+        The last n-1 tokens are carried across the chunks, so the memory used does not depend on the text's size.
+
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks (e.g. lines).
+                                          The chunks are concatenated as is.
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+
+            Returns:
+                Dict. The log-likelihood, the number of tokens and the perplexity (per token).
+        """
+        log_likelihood = 0
+        tokens_num = 0
+        for _, log_prob in self.iter_token_log_probs(source, chunk_size):
+            log_likelihood += log_prob
+            tokens_num += 1
+        return {"log_likelihood": log_likelihood, "tokens": tokens_num,
+                "perplexity": math.exp(-log_likelihood / tokens_num) if tokens_num else math.inf}
+
+    def iter_sentence_scores(self, source, chunk_size=1 << 20):
+        """Yields the log-likelihood of each sentence of a text that is read in chunks. The tokens are scored as
+        evaluate_stream() scores them, so a sentence's tokens are scored given the end of the previous sentence,
+        and the scores sum to the text's log-likelihood.
+
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks (e.g. lines).
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+
+            Returns:
+                Generator. Tuples of a sentence, ending with a token of SENTENCE_ENDS (but the last one),
+                its log-likelihood and its number of tokens.
+        """
+        sentence = []
+        log_likelihood = 0
+        for token, log_prob in self.iter_token_log_probs(source, chunk_size):
+            sentence.append(token)
+            log_likelihood += log_prob
+            if token in SENTENCE_ENDS:
+                yield self.split_by.join(sentence), log_likelihood, len(sentence)
+                sentence = []
+                log_likelihood = 0
+        if sentence:
+            yield self.split_by.join(sentence), log_likelihood, len(sentence)
+
+    def iter_token_log_probs(self, source, chunk_size=1 << 20):
+        """
+        Yields the log probability of each token of a text that is read in chunks, given the n-1 tokens
+        preceding it. The leading tokens are scored by evaluate_leading(), as evaluate() scores them.
+        A text shorter than n is scored as a whole, its score yielded with its last token.
+            Args:
+                source (str or iterable): a path of a text file, or an iterable of text chunks.
+                chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+            Return:
+                (generator): tuples of a token and its log probability, in order.
+        """
+        if self.n < 1:
+            raise ValueError("streaming requires n >= 1, got %d" % self.n)
+        if self.smoothing is not None and self.backoff_log_probs is None:
+            self.build_backoff_tables()
+
+        history = collections.deque(maxlen=self.n - 1)
+        buffered = [] if self.smoothing is None else None  # the tokens of the first ngram, until it is complete
+        for tokens in self.iter_stream_tokens(source, chunk_size):
+            for token in tokens:
+                if self.smoothing is not None:
+                    yield token, self.get_cached_tokens_log_prob(list(history) + [token])
+                elif buffered is None:
+                    yield token, self.get_ngram_log_prob(self.split_by.join(itertools.chain(history, (token,))))
+                else:
+                    buffered.append(token)
+                    if len(buffered) == self.n:
+                        first_ngram = self.split_by.join(buffered)
+                        yield from zip(buffered, self.evaluate_leading(first_ngram) +
+                                       [self.get_ngram_log_prob(first_ngram)])
+                        buffered = None
+                history.append(token)
+        if buffered:
+            yield from ((token, 0.0) for token in buffered[:-1])
+            yield buffered[-1], self.evaluate(self.split_by.join(buffered))
+
+    def evaluate_leading(self, first_ngram):
+        """
+        Returns the log probabilities of the leading parts of the text's first ngram (its first token, its first
+        two tokens and so on), that precede the first full context.
+        If all the orders are counted, the leading parts' counts are looked up among the ngrams of their order.
+        Otherwise they are the counts of the model's ngrams starting with the leading parts' strings.
+            Args:
+                first_ngram (str): the first ngram of the evaluated text.
+            Return:
+                (list): the log probabilities, in order.
+        """
+        probs = []
         first_unigrams = [self.split_by.join(self.split_to_unigrams(first_ngram)[0:i]) for i in range(1, self.n)]
 
         for i, ngram in enumerate(first_unigrams):
-            sum_occurences = 0
-            ngram_prob = 0
-            _ngram = ""
-
-            _occur = self.count_occure(ngram)
-            ngram_split = ngram.split(self.split_by)
-            denominator = ngram_size if len(ngram_split) == 1 else self.count_occure(self.split_by.join(ngram_split[:i]))
+            ngram_split = self.split_to_unigrams(ngram)
+            if self.order_dicts is not None:
+                _occur = self.get_order_count(ngram)
+                denominator = self.unigram_total if len(ngram_split) == 1 else self.get_order_count(
+                    self.split_by.join(ngram_split[:-1]))
+            else:
+                _occur = self.count_occure(ngram)
+                denominator = self.ngram_total if len(ngram_split) == 1 else self.count_occure(
+                    self.split_by.join(ngram_split[:i]))
             _prob = _occur / denominator
             log_prob = math.log(_prob)
             probs.append(log_prob)
+        return probs
 
-        for ngram in n_grams_list:
-            n_gram_count = self.model_dict.get(ngram)
-            partition = ngram[:self.n - 1] if self.chars else ngram.rpartition(self.split_by)[0]
-            n_minus_count = sum(self.get_markov_n_minus_dict(partition).values())
-            ngram_prob = self.smooth(ngram) if n_gram_count is None else n_gram_count / n_minus_count
-            log_prob = math.log(ngram_prob)
-            probs.append(log_prob)
-        return sum(probs)
+    def finalize(self, method="kneser_ney", discount=None, alpha=0.4):
+        """Sets the smoothing method of evaluate() and precomputes its tables, so any ngram, seen or unseen,
+        is scored in at most 2n lookups, and lists the sorted tokens following each context for the decoding
+        strategies of generate() and beam_search(). The tables are rebuilt lazily after the model changes.
+        Requires all the orders to be counted (all_orders=True).
+
+            Args:
+                method (str): "kneser_ney" for interpolated Kneser-Ney smoothing, or "stupid_backoff".
+                              Defaults to "kneser_ney".
+                discount (float): the Kneser-Ney discount, between 0 and 1. Defaults to None, estimating the
+                                  discount of each order from its counts of counts.
+                alpha (float): the stupid backoff weight. Defaults to 0.4.
+        """
+        if self.order_dicts is None:
+            raise ValueError("finalize requires all the orders to be counted, build the model with all_orders=True")
+        if method not in ("kneser_ney", "stupid_backoff"):
+            raise ValueError("unknown smoothing method %r" % method)
+        self.smoothing = (method, discount, alpha)
+        self.clear_caches()
+        self.build_backoff_tables()
+        self.build_continuations()
+
+    def build_backoff_tables(self):
+        """
+        Computes the log probability of every ngram of every order, and the log backoff weight of every context,
+        such that the probability of an unseen ngram is the weight of its context times the probability of the
+        ngram without its first token.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.count_scan("build_backoff_tables")
+        method, discount, alpha = self.smoothing
+        self.backoff_log_probs = {}
+        self.backoff_weights = {}
+        if method == "stupid_backoff":
+            self.backoff_default = math.log(alpha)
+            self.unknown_log_prob = math.log(self.smooth(""))
+            for order in range(1, self.n + 1):
+                self.backoff_weights[order] = {}
+                self.backoff_log_probs[order] = {
+                    n_gram: math.log(count / (self.unigram_total if order == 1 else self.order_dicts[order - 1][
+                        self.split_by.join(self.split_to_unigrams(n_gram)[:-1])]))
+                    for n_gram, count in self.order_dicts[order].items()
+                    if len(self.split_to_unigrams(n_gram)) == order}
+            return
+
+        # the lower orders count the distinct tokens preceding an ngram rather than its occurrences
+        self.backoff_default = 0.0
+        self.unknown_log_prob = -math.log(len(self.unigram_dict) + 1)  # the unigrams back off to a uniform
+        for order in range(1, self.n + 1):
+            if order == self.n:
+                counts = {n_gram: count for n_gram, count in self.order_dicts[order].items()
+                          if len(self.split_to_unigrams(n_gram)) == order}
+            else:
+                counts = collections.defaultdict(int)
+                for n_gram in self.order_dicts[order + 1].keys():
+                    tokens = self.split_to_unigrams(n_gram)
+                    if len(tokens) == order + 1:
+                        counts[self.split_by.join(tokens[1:])] += 1
+            order_discount = discount
+            if order_discount is None:
+                singletons = sum(1 for count in counts.values() if count == 1)
+                doubletons = sum(1 for count in counts.values() if count == 2)
+                order_discount = singletons / (singletons + 2 * doubletons) if singletons else 0.75
+
+            totals = collections.defaultdict(int)
+            types = collections.defaultdict(int)
+            for n_gram, count in counts.items():
+                context = self.split_by.join(self.split_to_unigrams(n_gram)[:-1])
+                totals[context] += count
+                types[context] += 1
+            weights = {context: order_discount * types[context] / totals[context] for context in totals}
+
+            log_probs = {}
+            for n_gram, count in counts.items():
+                tokens = self.split_to_unigrams(n_gram)
+                context = self.split_by.join(tokens[:-1])
+                lower = math.exp(self.unknown_log_prob if order == 1 else self.get_tokens_log_prob(tokens[1:]))
+                log_probs[n_gram] = math.log(max(count - order_discount, 0) / totals[context] +
+                                             weights[context] * lower)
+            self.backoff_log_probs[order] = log_probs
+            self.backoff_weights[order] = {context: math.log(weight) for context, weight in weights.items()
+                                           if weight > 0}
+
+    def get_backoff_log_prob(self, ngram):
+        """
+        Returns the smoothed log probability of the last token of an ngram given the tokens preceding it, backing
+        off to shorter ngrams until a seen one is found
+            Args:
+                ngram (str): the ngram, of 1 to n tokens.
+            Return:
+                (float): the log probability.
+        """
+        return self.get_tokens_log_prob(self.split_to_unigrams(ngram))
+
+    def get_tokens_log_prob(self, tokens):
+        """
+        Returns the smoothed log probability of the last of the given tokens given the tokens preceding it
+            Args:
+                tokens (list): the tokens of an ngram, 1 to n of them.
+            Return:
+                (float): the log probability.
+        """
+        weight = 0.0
+        for order in range(len(tokens), 0, -1):
+            log_prob = self.backoff_log_probs[order].get(self.split_by.join(tokens[-order:]))
+            if log_prob is not None:
+                return weight + log_prob
+            weight += self.backoff_weights[order].get(self.split_by.join(tokens[-order:-1]), self.backoff_default)
+        return weight + self.unknown_log_prob
+
+    def evaluate_backoff(self, text):
+        """
+        Returns the log-likelihood of the specified text, scoring every token given the (up to) n-1 tokens
+        preceding it with the tables computed by finalize()
+            Args:
+                text (str): Text to evaluate.
+            Return:
+                (float): the log probability.
+        """
+        if self.backoff_log_probs is None:
+            self.build_backoff_tables()
+        tokens = self.split_to_unigrams(text)
+        return sum(self.get_cached_tokens_log_prob(tokens[max(i - self.n + 1, 0):i + 1]) for i in range(len(tokens)))
+
+    def get_cached_tokens_log_prob(self, tokens):
+        """
+        Returns get_tokens_log_prob() of the given tokens, through the ngram cache if it is enabled
+            Args:
+                tokens (list): the tokens of an ngram, 1 to n of them.
+            Return:
+                (float): the log probability.
+        """
+        if self.ngram_cache is None:
+            return self.get_tokens_log_prob(tokens)
+        key = tuple(tokens)
+        log_prob = self.ngram_cache.get(key)
+        if log_prob is None:
+            log_prob = self.get_tokens_log_prob(tokens)
+            self.ngram_cache.put(key, log_prob)
+        return log_prob
 
     def smooth(self, ngram):
         """Returns the smoothed (Laplace) probability of the specified ngram.
@@ -239,10 +1241,538 @@ class Ngram_Language_Model:
             Returns:
                 float. The smoothed probability.
         """
+        return 1 / (self.ngram_total + self.unigram_total)
 
-        n_grams_size = sum(self.model_dict.values())  # total num of tokens in the dictionary
-        v = sum(self.unigram_dict.values())  # all words in corpus
-        return 1 / (n_grams_size + v)
+
+class LRU_Cache:
+    """A dictionary of a bounded size that evicts its least recently used entries, counting its hits and misses.
+    """
+
+    def __init__(self, size):
+        """Initializing an empty cache.
+        Args:
+            size (int): the maximal number of entries.
+        """
+        self.size = size
+        self.entries = collections.OrderedDict()  # the entries, from the least to the most recently used
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.clears = 0
+
+    def get(self, key):
+        """
+        Returns the value of a key, marking it as the most recently used
+            Args:
+                key (hashable): the key.
+            Return:
+                the key's value, or None if the key is not cached.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Caches the value of a key, evicting the least recently used entry if the cache is full
+            Args:
+                key (hashable): the key.
+                value: the key's value, which must not be None.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all the entries, keeping the counters
+        """
+        if self.entries:
+            self.entries.clear()
+            self.clears += 1
+
+    def get_stats(self):
+        """
+        Returns the cache's counters
+            Return:
+                (dict): the size, the number of entries, the hits, the misses, the hit rate, the evictions and the
+                        number of times the cache was cleared.
+        """
+        lookups = self.hits + self.misses
+        return {"size": self.size, "entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "evictions": self.evictions,
+                "clears": self.clears}
+
+
+class Model_Instrumentation:
+    """The counters of a model's calls: for each method, the number of calls and, for the public methods, the
+    cumulative wall time, the lookups and the scans of the model's tables, and the hits and misses of its caches.
+    Lookups and scans are counted for the innermost public method running, while the time and the cache counters
+    of a public method include those of the public methods it calls.
+    """
+
+    def __init__(self, lm):
+        """Initializing the counters of a model.
+        Args:
+            lm (Ngram_Language_Model): the instrumented model.
+        """
+        self.lm = lm
+        self.wrapped = []  # the names of the wrapped methods
+        self.active = None  # the name of the innermost public method running
+        self.methods = {}  # a dictionary of the form {method:counters}
+        self.scopes = [self.methods]  # the counters being recorded: the instrumentation's and each open block's
+
+    def wrap(self, name, method, lookup):
+        """
+        Returns a wrapper of a method that records its calls
+            Args:
+                name (str): the method's name.
+                method (callable): the bound method.
+                lookup (bool): True if the method is a lookup, which is only counted, rather than a public method,
+                               which is also timed.
+            Return:
+                (callable): the wrapper.
+        """
+        self.wrapped.append(name)
+
+        if lookup:
+            def counted(*args, **kwargs):
+                self.add(name, "calls")
+                self.add(self.active or name, "lookups")
+                return method(*args, **kwargs)
+
+            return functools.wraps(method)(counted)
+
+        def timed(*args, **kwargs):
+            outer, self.active = self.active, name
+            hits, misses = self.get_cache_counters()
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                self.active = outer
+                end_hits, end_misses = self.get_cache_counters()
+                self.add(name, "calls")
+                self.add(name, "seconds", seconds)
+                self.add(name, "cache_hits", end_hits - hits)
+                self.add(name, "cache_misses", end_misses - misses)
+
+        return functools.wraps(method)(timed)
+
+    def add(self, name, counter, amount=1):
+        """
+        Adds to a counter of a method, in every scope being recorded
+            Args:
+                name (str): the method's name.
+                counter (str): the counter.
+                amount (int): the amount to add. Defaults to 1.
+        """
+        for methods in self.scopes:
+            counters = methods.get(name)
+            if counters is None:
+                counters = methods[name] = {"calls": 0, "seconds": 0.0, "lookups": 0, "scans": 0, "cache_hits": 0,
+                                            "cache_misses": 0}
+            counters[counter] += amount
+
+    def count_scan(self, name):
+        """
+        Counts a scan of the model's tables
+            Args:
+                name (str): the scanning method, to count the scan for if no public method is running.
+        """
+        self.add(self.active or name, "scans")
+
+    def get_cache_counters(self):
+        """
+        Returns the total hits and misses of the model's caches
+            Return:
+                (tuple): the hits and the misses.
+        """
+        caches = [cache for cache in (self.lm.ngram_cache, self.lm.text_cache) if cache is not None]
+        return sum(cache.hits for cache in caches), sum(cache.misses for cache in caches)
+
+    def open_scope(self):
+        """
+        Starts recording the counters of a block into counters of its own
+            Return:
+                (dict): the block's counters, to pass to close_scope().
+        """
+        methods = {}
+        self.scopes.append(methods)
+        return methods
+
+    def close_scope(self, methods):
+        """
+        Stops recording the counters of a block
+            Args:
+                methods (dict): the block's counters, returned by open_scope().
+            Return:
+                (dict): a snapshot of the block's counters.
+        """
+        self.scopes.remove(methods)
+        return self.snapshot(methods)
+
+    def snapshot(self, methods=None):
+        """
+        Returns a copy of the counters, with the cache hit rate of each method
+            Args:
+                methods (dict): the counters to copy. Defaults to all the counters since the instrumentation started.
+            Return:
+                (dict): the counters of each called method, of the form {method:counters}.
+        """
+        snapshot = {}
+        for name, counters in (self.methods if methods is None else methods).items():
+            cache_lookups = counters["cache_hits"] + counters["cache_misses"]
+            snapshot[name] = dict(counters, cache_hit_rate=counters["cache_hits"] / cache_lookups
+                                  if cache_lookups else 0.0)
+        return snapshot
+
+
+def count_shard(n, chars, text, history, all_orders=False):
+    """
+    Counts a shard of a text in a separate language model (this is not a class method, so it can be sent to
+    a worker process)
+        Args:
+            n (int): the n of the n-gram.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+            text (str): the shard to count.
+            history (list): the n-1 tokens preceding the shard.
+            all_orders (bool): True to count the ngrams of the orders between 1 and n too. Defaults to False.
+        Return:
+            (tuple): the shard's n-gram counts, unigram counts and counts of the orders between 1 and n, of the form
+                     {order:{ngram:count}}.
+    """
+    lm = Ngram_Language_Model(n=n, chars=chars, all_orders=all_orders)
+    lm.count_tokens(lm.split_to_unigrams(text), history)
+    return dict(lm.model_dict), dict(lm.unigram_dict), {order: dict(counts) for order, counts in
+                                                        (lm.order_dicts or {}).items() if 1 < order < n}
+
+
+def iter_text_chunks(source, chunk_size=1 << 20):
+    """
+    Yields the text of a file in chunks, or the chunks of an iterable of strings as they are
+        Args:
+            source (str or iterable): a path of a text file, or an iterable of text chunks.
+            chunk_size (int): the number of characters to read from a file at a time. Defaults to 1M.
+        Return:
+            (generator): the text chunks.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as f:
+            yield from iter(lambda: f.read(chunk_size), "")
+    else:
+        yield from source
+
+
+def update_count(counts, key, change):
+    """
+    Changes a count in a dictionary of counts, dropping the key if its count reaches zero
+        Args:
+            counts (dict): the counts.
+            key (str): the key to change.
+            change (int): the change of the key's count.
+    """
+    count = counts.get(key, 0) + change
+    if count == 0:
+        counts.pop(key, None)
+    else:
+        counts[key] = count
+
+
+def count_prefix(sorted_keys, cumulative_counts, prefix):
+    """
+    Returns the total count of the keys starting with the given prefix
+        Args:
+            sorted_keys (list): keys in sorted order.
+            cumulative_counts (list): the cumulative counts of the keys, starting with 0.
+            prefix (str): the prefix.
+        Return:
+            (int): the total count.
+    """
+    start = bisect.bisect_left(sorted_keys, prefix)
+    successor = prefix_successor(prefix)
+    end = len(sorted_keys) if successor is None else bisect.bisect_left(sorted_keys, successor, start)
+    return cumulative_counts[end] - cumulative_counts[start]
+
+
+def prefix_successor(prefix):
+    """
+    Returns the smallest string that is greater than all the strings starting with the given prefix
+        Args:
+            prefix (str): the prefix
+        Return:
+            (str): the successor of the prefix, or None if there is no such string.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if prefix == "":
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+CONTRACTIONS = {
+        "ain't": "am not",
+        "aren't": "are not",
+        "can't": "cannot",
+        "can't've": "cannot have",
+        "'cause": "because",
+        "could've": "could have",
+        "couldn't": "could not",
+        "couldn't've": "could not have",
+        "didn't": "did not",
+        "doesn't": "does not",
+        "don't": "do not",
+        "hadn't": "had not",
+        "hadn't've": "had not have",
+        "hasn't": "has not",
+        "haven't": "have not",
+        "he'd": "he would",
+        "he'd've": "he would have",
+        "he'll": "he will",
+        "he'll've": "he will have",
+        "he's": "he is",
+        "how'd": "how did",
+        "how'd'y": "how do you",
+        "how'll": "how will",
+        "how's": "how is",
+        "I'd": "I would",
+        "I'd've": "I would have",
+        "I'll": "I will",
+        "I'll've": "I will have",
+        "I'm": "I am",
+        "I've": "I have",
+        "isn't": "is not",
+        "it'd": "it had",
+        "it'd've": "it would have",
+        "it'll": "it will",
+        "it'll've": "it will have",
+        "it's": "it is",
+        "let's": "let us",
+        "ma'am": "madam",
+        "mayn't": "may not",
+        "might've": "might have",
+        "mightn't": "might not",
+        "mightn't've": "might not have",
+        "must've": "must have",
+        "mustn't": "must not",
+        "mustn't've": "must not have",
+        "needn't": "need not",
+        "needn't've": "need not have",
+        "o'clock": "of the clock",
+        "oughtn't": "ought not",
+        "oughtn't've": "ought not have",
+        "shan't": "shall not",
+        "sha'n't": "shall not",
+        "shan't've": "shall not have",
+        "she'd": "she would",
+        "she'd've": "she would have",
+        "she'll": "she will",
+        "she'll've": "she will have",
+        "she's": "she is",
+        "should've": "should have",
+        "shouldn't": "should not",
+        "shouldn't've": "should not have",
+        "so've": "so have",
+        "so's": "so is",
+        "that'd": "that would",
+        "that'd've": "that would have",
+        "that's": "that is",
+        "there'd": "there had",
+        "there'd've": "there would have",
+        "there's": "there is",
+        "they'd": "they would",
+        "they'd've": "they would have",
+        "they'll": "they will",
+        "they'll've": "they will have",
+        "they're": "they are",
+        "they've": "they have",
+        "to've": "to have",
+        "wasn't": "was not",
+        "we'd": "we had",
+        "we'd've": "we would have",
+        "we'll": "we will",
+        "we'll've": "we will have",
+        "we're": "we are",
+        "we've": "we have",
+        "weren't": "were not",
+        "what'll": "what will",
+        "what'll've": "what will have",
+        "what're": "what are",
+        "what's": "what is",
+        "what've": "what have",
+        "when's": "when is",
+        "when've": "when have",
+        "where'd": "where did",
+        "where's": "where is",
+        "where've": "where have",
+        "who'll": "who will",
+        "who'll've": "who will have",
+        "who's": "who is",
+        "who've": "who have",
+        "why's": "why is",
+        "why've": "why have",
+        "will've": "will have",
+        "won't": "will not",
+        "won't've": "will not have",
+        "would've": "would have",
+        "wouldn't": "would not",
+        "wouldn't've": "would not have",
+        "y'all": "you all",
+        "y'alls": "you alls",
+        "y'all'd": "you all would",
+        "y'all'd've": "you all would have",
+        "y'all're": "you all are",
+        "y'all've": "you all have",
+        "you'd": "you had",
+        "you'd've": "you would have",
+        "you'll": "you you will",
+        "you'll've": "you you will have",
+        "you're": "you are",
+        "you've": "you have"
+}  # the contractions and their expansions. The first listed contraction matching at a position is expanded.
+
+CHARACTERS_TO_PAD = r"([\w/'+$\s-]+|[^\w/'+$\s-]+)\s*"  # runs of (non) word characters, padded with a space
+
+
+class Text_Normalizer:
+    """Normalizes texts as normalize_text() does, with its patterns compiled once.
+        Contractions contain an apostrophe, so they are only looked for in the runs of the contractions' characters
+        that contain one, and the expansion of each such run is memoized.
+    """
+
+    def __init__(self, contractions=None, memo_size=1 << 16):
+        """Initializing a normalizer.
+        Args:
+            contractions (dict): the contractions and their expansions. Defaults to CONTRACTIONS.
+            memo_size (int): the number of expanded runs to memoize. Defaults to 64K.
+        """
+        self.contractions = CONTRACTIONS if contractions is None else contractions
+        self.contractions_re = re.compile('(%s)' % '|'.join(self.contractions.keys()))
+        self.padding_re = re.compile(CHARACTERS_TO_PAD)
+        self.runs_re = None  # the runs of the contractions' characters containing an apostrophe
+        if all("'" in contraction for contraction in self.contractions.keys()):
+            characters = "".join(sorted(set("".join(self.contractions.keys()))))
+            # a run is matched from its start only, as a match attempted within a run would scan the rest of the
+            # run for an apostrophe again, taking quadratic time on a long run with none
+            self.runs_re = re.compile("(?<![{0}])[{0}]*'[{0}]*".format(re.escape(characters)))
+        self.memo_size = memo_size
+        self.memo = {}  # a dictionary of the form {run:expanded run}
+
+    def normalize(self, text):
+        """Returns a normalized version of the specified string, identical to the one normalize_text() returns.
+
+          Args:
+            text (str): the text to normalize
+
+          Returns:
+            string. the normalized text.
+        """
+        lower_case_txt = text.lower()
+        if self.runs_re is None:
+            extended_txt = self.contractions_re.sub(self.replace_contraction, lower_case_txt)
+        elif "'" in lower_case_txt:
+            extended_txt = self.runs_re.sub(self.expand_run, lower_case_txt)
+        else:
+            extended_txt = lower_case_txt
+        return self.padding_re.sub(pad_run, extended_txt).rstrip()
+
+    def replace_contraction(self, match):
+        """
+        Returns the expansion of a matched contraction
+            Args:
+                match (re.Match): the match of the contractions' pattern.
+            Return:
+                (str): the expansion.
+        """
+        return self.contractions[match.group(0)]
+
+    def expand_run(self, match):
+        """
+        Returns a matched run with its contractions expanded. No contraction crosses the run's bounds, so the
+        run is expanded as it is within the whole text.
+            Args:
+                match (re.Match): the match of a run of the contractions' characters.
+            Return:
+                (str): the expanded run.
+        """
+        run = match.group(0)
+        expanded = self.memo.get(run)
+        if expanded is None:
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            expanded = self.memo[run] = self.contractions_re.sub(self.replace_contraction, run)
+        return expanded
+
+    def normalize_stream(self, lines, workers=None, batch_size=4096):
+        """Yields the normalized lines of a text, in order. Each line is normalized on its own.
+        With more than one worker, batches of lines are normalized in parallel processes, and at most two
+        batches per worker are pending at a time, so the memory used does not depend on the text's size.
+
+            Args:
+                lines (iterable): the lines (e.g. an open file).
+                workers (int): the number of processes. Defaults to 1, normalizing in this process.
+                batch_size (int): the number of lines sent to a process at a time. Defaults to 4096.
+
+            Returns:
+                Generator. The normalized lines.
+        """
+        if not workers or workers < 2:
+            yield from map(self.normalize, lines)
+            return
+
+        lines = iter(lines)
+        batches = iter(lambda: list(itertools.islice(lines, batch_size)), [])
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_normalizer_worker,
+                                                    initargs=(self,)) as executor:
+            pending = collections.deque()
+            for batch in batches:
+                pending.append(executor.submit(normalize_in_worker, batch))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+TEXT_NORMALIZER = Text_Normalizer()  # the normalizer of normalize_text()
+worker_normalizer = None  # the normalizer of a worker process, set by init_normalizer_worker()
+
+
+def pad_run(match):
+    """
+    Returns a matched run of word characters, or of other characters, followed by a single space
+        Args:
+            match (re.Match): the match of CHARACTERS_TO_PAD.
+        Return:
+            (str): the padded run.
+    """
+    return match.group(1) + " "
+
+
+def init_normalizer_worker(normalizer):
+    """
+    Sets the normalizer of a worker process (this is not a class method, so it can be sent to a worker process)
+        Args:
+            normalizer (Text_Normalizer): the normalizer.
+    """
+    global worker_normalizer
+    worker_normalizer = normalizer
+
+
+def normalize_in_worker(lines):
+    """
+    Normalizes a batch of lines by the normalizer of a worker process
+        Args:
+            lines (list): the lines.
+        Return:
+            (list): the normalized lines.
+    """
+    return list(map(worker_normalizer.normalize, lines))
 
 
 def normalize_text(text):
@@ -258,148 +1788,7 @@ def normalize_text(text):
       Returns:
         string. the normalized text.
     """
-
-    def expand_contractions(s):
-        contractions_dict = {
-            "ain't": "am not",
-            "aren't": "are not",
-            "can't": "cannot",
-            "can't've": "cannot have",
-            "'cause": "because",
-            "could've": "could have",
-            "couldn't": "could not",
-            "couldn't've": "could not have",
-            "didn't": "did not",
-            "doesn't": "does not",
-            "don't": "do not",
-            "hadn't": "had not",
-            "hadn't've": "had not have",
-            "hasn't": "has not",
-            "haven't": "have not",
-            "he'd": "he would",
-            "he'd've": "he would have",
-            "he'll": "he will",
-            "he'll've": "he will have",
-            "he's": "he is",
-            "how'd": "how did",
-            "how'd'y": "how do you",
-            "how'll": "how will",
-            "how's": "how is",
-            "I'd": "I would",
-            "I'd've": "I would have",
-            "I'll": "I will",
-            "I'll've": "I will have",
-            "I'm": "I am",
-            "I've": "I have",
-            "isn't": "is not",
-            "it'd": "it had",
-            "it'd've": "it would have",
-            "it'll": "it will",
-            "it'll've": "it will have",
-            "it's": "it is",
-            "let's": "let us",
-            "ma'am": "madam",
-            "mayn't": "may not",
-            "might've": "might have",
-            "mightn't": "might not",
-            "mightn't've": "might not have",
-            "must've": "must have",
-            "mustn't": "must not",
-            "mustn't've": "must not have",
-            "needn't": "need not",
-            "needn't've": "need not have",
-            "o'clock": "of the clock",
-            "oughtn't": "ought not",
-            "oughtn't've": "ought not have",
-            "shan't": "shall not",
-            "sha'n't": "shall not",
-            "shan't've": "shall not have",
-            "she'd": "she would",
-            "she'd've": "she would have",
-            "she'll": "she will",
-            "she'll've": "she will have",
-            "she's": "she is",
-            "should've": "should have",
-            "shouldn't": "should not",
-            "shouldn't've": "should not have",
-            "so've": "so have",
-            "so's": "so is",
-            "that'd": "that would",
-            "that'd've": "that would have",
-            "that's": "that is",
-            "there'd": "there had",
-            "there'd've": "there would have",
-            "there's": "there is",
-            "they'd": "they would",
-            "they'd've": "they would have",
-            "they'll": "they will",
-            "they'll've": "they will have",
-            "they're": "they are",
-            "they've": "they have",
-            "to've": "to have",
-            "wasn't": "was not",
-            "we'd": "we had",
-            "we'd've": "we would have",
-            "we'll": "we will",
-            "we'll've": "we will have",
-            "we're": "we are",
-            "we've": "we have",
-            "weren't": "were not",
-            "what'll": "what will",
-            "what'll've": "what will have",
-            "what're": "what are",
-            "what's": "what is",
-            "what've": "what have",
-            "when's": "when is",
-            "when've": "when have",
-            "where'd": "where did",
-            "where's": "where is",
-            "where've": "where have",
-            "who'll": "who will",
-            "who'll've": "who will have",
-            "who's": "who is",
-            "who've": "who have",
-            "why's": "why is",
-            "why've": "why have",
-            "will've": "will have",
-            "won't": "will not",
-            "won't've": "will not have",
-            "would've": "would have",
-            "wouldn't": "would not",
-            "wouldn't've": "would not have",
-            "y'all": "you all",
-            "y'alls": "you alls",
-            "y'all'd": "you all would",
-            "y'all'd've": "you all would have",
-            "y'all're": "you all are",
-            "y'all've": "you all have",
-            "you'd": "you had",
-            "you'd've": "you would have",
-            "you'll": "you you will",
-            "you'll've": "you you will have",
-            "you're": "you are",
-            "you've": "you have"
-        }
-        contractions_re = re.compile('(%s)' % '|'.join(contractions_dict.keys()))
-
-        def replace(match):
-            return contractions_dict[match.group(0)]
-
-        return contractions_re.sub(replace, s)
-
-    characters_to_pad = r"([\w/'+$\s-]+|[^\w/'+$\s-]+)\s*"
-
-    # case conversion
-    lower_case_txt = text.lower()
-
-    # extend contractions
-    extended_txt = expand_contractions(lower_case_txt)
-
-    # pad punctuation
-    padded_txt = re.sub(characters_to_pad, r"\1 ", extended_txt)
-    trimmed_padded = padded_txt.rstrip()
-
-    return trimmed_padded
+    return TEXT_NORMALIZER.normalize(text)
 
 
 def who_am_i():  # this is not a class method
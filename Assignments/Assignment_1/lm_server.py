@@ -0,0 +1,715 @@
+import os
+import sys
+import json
+import time
+import math
+import random
+import asyncio
+import argparse
+import collections
+import concurrent.futures
+
+import ex1
+import packed_lm
+
+MAX_BODY_SIZE = 1 << 26  # the largest request body accepted, in bytes
+MAX_GENERATE_LENGTH = 10000  # the largest number of tokens generated by a request
+MAX_BEAM_WIDTH = 64  # the widest beam of a request
+MAX_TEMPERATURE = 100.0  # the highest sampling temperature of a request
+MAX_HEADERS = 100  # the most header lines of a request
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+worker_model = None  # the model of a worker process, set by init_server_worker()
+
+
+class Request_Error(Exception):
+    """A request that cannot be read, answered with its status before the connection is closed.
+    """
+
+    def __init__(self, status, message):
+        """Initializing the error.
+        Args:
+            status (int): the HTTP status of the response.
+            message (str): the error's description.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class Latency_Recorder:
+    """The latencies of the most recent requests to an endpoint, and the percentiles of their distribution.
+    """
+
+    def __init__(self, size=10000):
+        """Initializing an empty recorder.
+        Args:
+            size (int): the number of most recent latencies kept. Defaults to 10000.
+        """
+        self.latencies = collections.deque(maxlen=size)  # the latencies, in seconds
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds, error=False):
+        """
+        Records the latency of a request
+            Args:
+                seconds (float): the latency.
+                error (bool): True if the request failed. Defaults to False.
+        """
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.errors += error
+
+    def get_stats(self, percentiles=(50, 90, 99)):
+        """
+        Returns the number of requests and the percentiles of the recent latencies, by the nearest rank
+            Args:
+                percentiles (list): the percentiles. Defaults to 50, 90 and 99.
+            Return:
+                (dict): the requests, the errors and each percentile (e.g. "p99") and the maximum, in milliseconds.
+        """
+        stats = {"requests": self.requests, "errors": self.errors}
+        latencies = sorted(self.latencies)
+        if latencies:
+            for percentile in percentiles:
+                rank = max(math.ceil(percentile / 100 * len(latencies)), 1)
+                stats["p%g" % percentile] = 1000 * latencies[rank - 1]
+            stats["max"] = 1000 * latencies[-1]
+        return stats
+
+
+class Score_Batcher:
+    """Collects the texts of concurrent scoring requests into batches, each scored by a single call to the worker
+    pool. A batch is sent once it is full or once its first text has waited for the batching delay. At most
+    max_scoring batches are scored at a time, so under load the texts wait in the queue, joining larger batches,
+    rather than piling up in the worker pool.
+    """
+
+    def __init__(self, score, max_batch=256, max_delay=0.002, max_scoring=2):
+        """Initializing a batcher.
+        Args:
+            score (coroutine function): scores a list of texts, returning a [score, error] pair for each.
+            max_batch (int): the largest number of texts in a batch. Defaults to 256.
+            max_delay (float): the longest time a text waits for others to join its batch, in seconds.
+                               Defaults to 2ms.
+            max_scoring (int): the largest number of batches scored at a time. Defaults to 2.
+        """
+        self.score = score
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_scoring = max_scoring
+        self.queue = asyncio.Queue()  # the pending texts and the futures of their results
+        self.batches = 0
+        self.batched_texts = 0
+        self.task = None
+        self.scoring = set()  # the tasks scoring batches, referenced until they are done
+
+    def start(self):
+        """
+        Starts batching, in a task of the running event loop
+        """
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """
+        Stops batching
+        """
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit(self, texts):
+        """
+        Scores texts within the batches
+            Args:
+                texts (list): the texts.
+            Return:
+                (list): a [score, error] pair for each text.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((text, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def run(self):
+        """
+        Collects and scores batches until cancelled. A batch is scored while the next one is collected, and the
+        next batch is collected once fewer than max_scoring batches are being scored.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            while len(self.scoring) >= self.max_scoring:
+                await asyncio.wait(self.scoring, return_when=asyncio.FIRST_COMPLETED)
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            self.batches += 1
+            self.batched_texts += len(batch)
+            task = loop.create_task(self.score_batch(batch))
+            self.scoring.add(task)
+            task.add_done_callback(self.scoring.discard)
+
+    async def score_batch(self, batch):
+        """
+        Scores a batch and sets the results of its futures
+            Args:
+                batch (list): pairs of a text and the future of its result.
+        """
+        try:
+            results = await self.score([text for text, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self):
+        """
+        Returns the batching counters
+            Return:
+                (dict): the number of batches, of the texts in them and the mean batch size.
+        """
+        return {"batches": self.batches, "texts": self.batched_texts,
+                "mean_batch_size": self.batched_texts / self.batches if self.batches else 0.0}
+
+
+class LM_Server:
+    """An asyncio server that loads a language model once and serves generate, evaluate and batch evaluate requests
+    over HTTP/1.1, on a TCP port or a Unix socket. Requests and responses are JSON objects:
+        POST /generate        {"context": str or null, "n": int,   -> {"text": str}
+                               "top_k", "top_p", "temperature", "beam_width" (optional)}
+        POST /evaluate        {"text": str}                        -> {"score": float}
+        POST /evaluate_batch  {"texts": [str]}                     -> {"scores": [float or null], "errors": [...]}
+        GET  /stats                                                -> latency percentiles and batching counters
+        GET  /health                                               -> {"status": "ok"}
+    Scoring requests are batched together, and the model's work runs in a bounded pool of worker processes, each
+    holding a copy of the model (or memory mapping the same saved model), or in a single thread if there are no
+    workers.
+    """
+
+    def __init__(self, lm, workers=1, model_path=None, max_batch=256, max_delay=0.002):
+        """Initializing a server.
+        Args:
+            lm (Ngram_Language_Model): the model.
+            workers (int): the number of worker processes, 0 to run the model in a single thread of this process.
+                           Defaults to 1.
+            model_path (str): the path the model was loaded from by packed_lm.load_model(), so the workers memory
+                              map it rather than receive a copy. Defaults to None.
+            max_batch (int): the largest number of texts scored at a time. Defaults to 256.
+            max_delay (float): the longest time a text waits for others to join its batch, in seconds.
+                               Defaults to 2ms.
+        """
+        self.lm = lm
+        self.workers = workers
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.executor = None
+        self.batcher = None
+        self.server = None
+        self.connections = {}  # a dictionary of the form {handler task:writer} of the open connections
+        self.latencies = collections.defaultdict(Latency_Recorder)  # a dictionary of the form {endpoint:recorder}
+        self.routes = {("POST", "/generate"): self.handle_generate, ("POST", "/evaluate"): self.handle_evaluate,
+                       ("POST", "/evaluate_batch"): self.handle_evaluate_batch,
+                       ("GET", "/stats"): self.handle_stats, ("GET", "/health"): self.handle_health}
+
+    async def start(self, host="127.0.0.1", port=8000, path=None):
+        """
+        Starts the worker pool and listens for connections
+            Args:
+                host (str): the address to listen on. Defaults to the local host.
+                port (int): the TCP port, 0 for any free port. Defaults to 8000.
+                path (str): the path of a Unix socket to listen on rather than a TCP port. Defaults to None.
+        """
+        if self.workers > 0:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_server_worker, initargs=(self.model_path or self.lm,))
+        else:
+            init_server_worker(self.lm)
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # as many batches are scored at a time as the workers can take, and as many wait for them
+        self.batcher = Score_Batcher(self.score, self.max_batch, self.max_delay, 2 * max(self.workers, 1))
+        self.batcher.start()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+
+    def get_address(self):
+        """
+        Returns the address the server listens on
+            Return:
+                (tuple or str): the host and the port, or the Unix socket's path.
+        """
+        address = self.server.sockets[0].getsockname()
+        return address[:2] if isinstance(address, tuple) else address
+
+    async def stop(self):
+        """
+        Stops listening, closes the open connections, and shuts the batcher and the worker pool down
+        """
+        if self.server is not None:
+            self.server.close()
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def serve_forever(self, host="127.0.0.1", port=8000, path=None):
+        """
+        Starts the server and serves until cancelled (e.g. by KeyboardInterrupt)
+            Args:
+                host (str): the address to listen on. Defaults to the local host.
+                port (int): the TCP port. Defaults to 8000.
+                path (str): the path of a Unix socket to listen on rather than a TCP port. Defaults to None.
+        """
+        await self.start(host, port, path)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def run_in_pool(self, function, *args):
+        """
+        Runs a function in the worker pool
+            Return:
+                the function's result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def score(self, texts):
+        """
+        Scores a batch of texts in the worker pool
+            Args:
+                texts (list): the texts.
+            Return:
+                (list): a [score, error] pair for each text.
+        """
+        return await self.run_in_pool(score_in_worker, texts)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves the requests of a connection, until the client closes it or asks to
+            Args:
+                reader (asyncio.StreamReader): the connection's reader.
+                writer (asyncio.StreamWriter): the connection's writer.
+        """
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                status, response = await self.dispatch(method, path, body)
+                self.latencies[path if (method, path) in self.routes else "other"].record(
+                    time.perf_counter() - start, error=status != 200)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except Request_Error as error:
+            self.latencies["other"].record(0.0, error=True)
+            await write_response(writer, error.status, {"error": str(error)}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        """
+        Runs the handler of a request
+            Args:
+                method (str): the HTTP method.
+                path (str): the requested path.
+                body (bytes): the request's body.
+            Return:
+                (tuple): the status and the response's JSON object.
+        """
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return 405, {"error": "%s is not allowed on %s" % (method, path)}
+            return 404, {"error": "%s not found" % path}
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            return 200, await handler(request)
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {"error": str(error) or type(error).__name__}
+        except Exception as error:
+            return 500, {"error": str(error) or type(error).__name__}
+
+    async def handle_generate(self, request):
+        """
+        Generates a text
+            Args:
+                request (dict): the seed "context" (optional), the length "n" (optional, defaults to 20, at most
+                                MAX_GENERATE_LENGTH), and either the decoding strategy of generate() ("top_k",
+                                "top_p", "temperature" up to MAX_TEMPERATURE) or the "beam_width" of beam_search()
+                                (optional, at most MAX_BEAM_WIDTH).
+            Return:
+                (dict): the generated "text".
+        """
+        context, n = request.get("context"), request.get("n", 20)
+        if context is not None and not isinstance(context, str):
+            raise ValueError("context must be a string or null")
+        if not is_integer(n) or not 0 <= n <= MAX_GENERATE_LENGTH:
+            raise ValueError("n must be an integer between 0 and %d" % MAX_GENERATE_LENGTH)
+        decoding = {name: request[name] for name in ("top_k", "top_p", "temperature", "beam_width")
+                    if request.get(name) is not None}
+        if not all(is_integer(decoding[name]) and decoding[name] > 0 for name in ("top_k", "beam_width")
+                   if name in decoding):
+            raise ValueError("top_k and beam_width must be positive integers")
+        if decoding.get("beam_width", 1) > MAX_BEAM_WIDTH:
+            raise ValueError("beam_width must be at most %d" % MAX_BEAM_WIDTH)
+        if not all(is_number(decoding[name]) for name in ("top_p", "temperature") if name in decoding):
+            raise ValueError("top_p and temperature must be finite numbers")
+        if not 0 < decoding.get("top_p", 1) <= 1 or not 0 <= decoding.get("temperature", 1) <= MAX_TEMPERATURE:
+            raise ValueError("top_p must be in (0, 1], and temperature between 0 and %g" % MAX_TEMPERATURE)
+        return {"text": await self.run_in_pool(generate_in_worker, context, n, decoding)}
+
+    async def handle_evaluate(self, request):
+        """
+        Scores a text, batched with the concurrent scoring requests
+            Args:
+                request (dict): the "text".
+            Return:
+                (dict): the text's "score".
+        """
+        text = request["text"]
+        if not isinstance(text, str):
+            raise ValueError("text must be a string")
+        (score, error), = await self.batcher.submit([text])
+        if error is not None:
+            raise ValueError(error)
+        return {"score": score}
+
+    async def handle_evaluate_batch(self, request):
+        """
+        Scores a list of texts, batched with the concurrent scoring requests
+            Args:
+                request (dict): the "texts".
+            Return:
+                (dict): the "scores" of the texts, and the "errors" of those that could not be scored (whose
+                        score is null).
+        """
+        texts = request["texts"]
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise ValueError("texts must be a list of strings")
+        results = await self.batcher.submit(texts)
+        return {"scores": [score for score, _ in results],
+                "errors": [{"index": i, "error": error} for i, (_, error) in enumerate(results) if error is not None]}
+
+    async def handle_stats(self, request):
+        """
+        Returns the server's statistics
+            Return:
+                (dict): the latency percentiles of each endpoint, in milliseconds, and the batching counters.
+        """
+        return {"latency": {endpoint: recorder.get_stats() for endpoint, recorder in self.latencies.items()},
+                "batching": self.batcher.get_stats(), "workers": self.workers}
+
+    async def handle_health(self, request):
+        """
+        Returns the server's status
+        """
+        return {"status": "ok"}
+
+
+class LM_Client:
+    """A minimal client of LM_Server, over a single keep-alive connection, for local testing.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, path=None):
+        """Initializing a client. The connection is opened on the first request.
+        Args:
+            host (str): the server's host. Defaults to the local host.
+            port (int): the server's port. Defaults to 8000.
+            path (str): the path of the server's Unix socket, rather than a TCP address. Defaults to None.
+        """
+        self.host, self.port, self.path = host, port, path
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        """
+        Sends a request and reads its response
+            Args:
+                method (str): the HTTP method.
+                path (str): the requested path.
+                payload (dict): the request's JSON object. Defaults to None.
+            Return:
+                (tuple): the status and the response's JSON object.
+        """
+        if self.writer is None:
+            if self.path is not None:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+            else:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.writer.write(("%s %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+                           % (method, path, self.host, len(body))).encode("latin-1") + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("the server closed the connection")
+        headers = await read_headers(self.reader)
+        length = parse_content_length(headers)
+        status = status_line.split()[1:2]
+        if length is None or not status or not status[0].isdigit():
+            raise ConnectionError("malformed response")
+        response = await self.reader.readexactly(length)
+        return int(status[0]), json.loads(response)
+
+    async def generate(self, context=None, n=20):
+        """Returns a text generated by the server's model"""
+        return (await self.request("POST", "/generate", {"context": context, "n": n}))[1]["text"]
+
+    async def evaluate(self, text):
+        """Returns the server model's score of a text"""
+        status, response = await self.request("POST", "/evaluate", {"text": text})
+        if status != 200:
+            raise ValueError(response["error"])
+        return response["score"]
+
+    async def evaluate_batch(self, texts):
+        """Returns the server model's scores of texts, None for a text it could not score"""
+        return (await self.request("POST", "/evaluate_batch", {"texts": texts}))[1]["scores"]
+
+    async def stats(self):
+        """Returns the server's statistics"""
+        return (await self.request("GET", "/stats"))[1]
+
+    async def close(self):
+        """Closes the connection"""
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.reader = self.writer = None
+
+
+async def read_line(reader):
+    """
+    Reads a line of the head of a request or a response
+        Args:
+            reader (asyncio.StreamReader): the connection's reader.
+        Return:
+            (bytes): the line, with its end of line, or b"" if the connection was closed.
+        Raises:
+            Request_Error: a line longer than the reader's limit, 64KB by default (431).
+    """
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # the reader drops the line's buffered bytes, so the rest of the request cannot be read
+        raise Request_Error(431, "a line of the request's head is too long")
+
+
+async def read_headers(reader):
+    """
+    Reads the headers of a request or a response, up to the empty line ending them
+        Args:
+            reader (asyncio.StreamReader): the connection's reader.
+        Return:
+            (dict): the headers, with lower case names.
+        Raises:
+            Request_Error: a header line that is too long, or more than MAX_HEADERS headers (431).
+    """
+    headers = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await read_line(reader)
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise Request_Error(431, "the request has more than %d headers" % MAX_HEADERS)
+
+
+async def read_request(reader):
+    """
+    Reads an HTTP request
+        Args:
+            reader (asyncio.StreamReader): the connection's reader.
+        Return:
+            (tuple): the method, the path, the headers and the body, or None if the connection was closed.
+        Raises:
+            Request_Error: a malformed request (400), a body larger than MAX_BODY_SIZE (413), or a head with too
+                           long lines or too many headers (431).
+    """
+    request_line = await read_line(reader)
+    if not request_line.strip():
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise Request_Error(400, "malformed request line")
+    method, path, _ = parts
+    headers = await read_headers(reader)
+    length = parse_content_length(headers)
+    if length is None:
+        raise Request_Error(400, "invalid Content-Length")
+    if length > MAX_BODY_SIZE:
+        raise Request_Error(413, "the request body exceeds %d bytes" % MAX_BODY_SIZE)
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?")[0], headers, body
+
+
+def parse_content_length(headers):
+    """
+    Returns the length of the body of a request or a response
+        Args:
+            headers (dict): the headers, with lower case names.
+        Return:
+            (int): the length, 0 if there is no Content-Length header, or None if it is not a non negative integer.
+    """
+    length = headers.get("content-length", "0")
+    return int(length) if length.isascii() and length.isdigit() else None
+
+
+def is_integer(value):
+    """Returns True iff a JSON value is an integer (JSON booleans are parsed as bool, a subclass of int)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_number(value):
+    """Returns True iff a JSON value is a finite number (Python's JSON parser accepts NaN and Infinity)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+async def write_response(writer, status, response, keep_alive=True):
+    """
+    Writes an HTTP response with a JSON body
+        Args:
+            writer (asyncio.StreamWriter): the connection's writer.
+            status (int): the HTTP status.
+            response (dict): the JSON object.
+            keep_alive (bool): False if the connection is closed after the response. Defaults to True.
+    """
+    body = json.dumps(response).encode("utf-8")
+    writer.write(("HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n"
+                  % (status, STATUS_REASONS.get(status, ""), len(body), "keep-alive" if keep_alive else "close")
+                  ).encode("latin-1") + body)
+    await writer.drain()
+
+
+def init_server_worker(lm):
+    """
+    Sets the model of a worker (this is not a class method, so it can be sent to a worker process)
+        Args:
+            lm (Ngram_Language_Model or str): the model, or the path of a saved model to memory map.
+    """
+    global worker_model
+    worker_model = packed_lm.load_model(lm) if isinstance(lm, str) else lm
+    random.seed()
+
+
+def score_in_worker(texts):
+    """
+    Scores texts with the worker's model, all at once if the model scores batches
+        Args:
+            texts (list): the texts.
+        Return:
+            (list): a [score, error] pair for each text, the score None if the text could not be scored.
+    """
+    if hasattr(worker_model, "evaluate_many"):
+        try:
+            return [[float(score), None] for score in worker_model.evaluate_many(texts)]
+        except ValueError:
+            pass  # some text cannot be scored, so each is scored on its own
+    results = []
+    for text in texts:
+        try:
+            results.append([worker_model.evaluate(text), None])
+        except ValueError as error:
+            results.append([None, str(error) or "the text cannot be scored"])
+    return results
+
+
+def generate_in_worker(context, n, decoding=None):
+    """
+    Generates a text with the worker's model
+        Args:
+            context (str): the seed context, or None.
+            n (int): the length of the text.
+            decoding (dict): the keyword arguments of generate(), or the "beam_width" of beam_search().
+                             Defaults to None, sampling from the model's distribution.
+        Return:
+            (str): the generated text.
+    """
+    decoding = decoding or {}
+    if "beam_width" in decoding:
+        return worker_model.beam_search(context, n, decoding["beam_width"])
+    return worker_model.generate(context, n, **decoding)
+
+
+def load_language_model(args):
+    """
+    Loads the model the server's command line specifies
+        Args:
+            args (argparse.Namespace): the parsed command line.
+        Return:
+            (Ngram_Language_Model): the model.
+    """
+    if args.model is not None:
+        return packed_lm.load_model(args.model)
+    lm = ex1.Ngram_Language_Model(n=args.n, chars=args.chars)
+    lm.build_model_from_stream(args.corpus)
+    return lm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves a language model over HTTP.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model", help="a model saved by packed_lm.save_model(), memory mapped by the workers")
+    source.add_argument("--corpus", help="a normalized text file to build the model from")
+    parser.add_argument("--n", type=int, default=3, help="the n of the n-gram, when building from a corpus")
+    parser.add_argument("--chars", action="store_true", help="build a character level model")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="the TCP port to listen on")
+    parser.add_argument("--unix", help="a Unix socket path to listen on, rather than a TCP port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="the number of worker processes, 0 to run the model in a single thread")
+    parser.add_argument("--max-batch", type=int, default=256, help="the largest number of texts scored at a time")
+    parser.add_argument("--max-delay", type=float, default=0.002,
+                        help="the longest time a text waits for a batch, in seconds")
+    args = parser.parse_args(argv)
+
+    server = LM_Server(load_language_model(args), workers=args.workers, model_path=args.model,
+                       max_batch=args.max_batch, max_delay=args.max_delay)
+    print("serving on %s" % (args.unix or "%s:%d" % (args.host, args.port)), file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
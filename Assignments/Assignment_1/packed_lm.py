@@ -0,0 +1,721 @@
+import sys
+import math
+import mmap as mmap_module
+import bisect
+import struct
+import random
+import concurrent.futures
+
+import numpy as np
+
+from ex1 import Ngram_Language_Model, prefix_successor
+
+MAX_KEY_BITS = 62  # packed keys, and the bounds of their ranges, must fit in a signed 64 bit integer
+worker_model = None  # the model evaluated by a worker process, set by init_evaluation_worker()
+
+# the binary model file starts with this header, followed by 8 byte aligned sections: the vocabulary's offsets,
+# the vocabulary's utf-8 encoded tokens, the keys, the counts, the cumulative counts and the unigram counts.
+FILE_MAGIC = b"NGLM"
+FILE_VERSION = 1
+
+FILE_HEADER = struct.Struct("<4sIIIB3xQQQqq4x")  # magic, version, n, bits, chars, vocabulary size, keys number,
+# tokens size, ngram total, unigram total
+
+
+class Vocabulary:
+    """Interns tokens to integer ids.
+        The tokens are kept sorted, so the ids of all the tokens starting with a given prefix form a contiguous range.
+    """
+
+    def __init__(self, tokens=()):
+        """Initializing a vocabulary object.
+        Args:
+            tokens (iterable): the tokens of the vocabulary. Defaults to an empty vocabulary.
+        """
+        self.tokens = sorted(set(tokens))
+        self.token_to_id = {token: i for i, token in enumerate(self.tokens)}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def get_id(self, token):
+        """
+        Returns the id of a token
+            Args:
+                token (str): the token
+            Return:
+                (int): the token's id, or -1 if the token is not in the vocabulary.
+        """
+        return self.token_to_id.get(token, -1)
+
+    def get_ids(self, tokens):
+        """
+        Returns the ids of a sequence of tokens
+            Args:
+                tokens (list): the tokens
+            Return:
+                (np.array): the tokens' ids, -1 for tokens that are not in the vocabulary.
+        """
+        return np.fromiter((self.token_to_id.get(token, -1) for token in tokens), dtype=np.int64, count=len(tokens))
+
+    def prefix_range(self, prefix):
+        """
+        Returns the range of ids of the tokens starting with the given prefix
+            Args:
+                prefix (str): the prefix
+            Return:
+                (tuple): the first id and one past the last id of the range.
+        """
+        start = bisect.bisect_left(self.tokens, prefix)
+        successor = prefix_successor(prefix)
+        end = len(self.tokens) if successor is None else bisect.bisect_left(self.tokens, successor, start)
+        return start, end
+
+    def merge(self, tokens):
+        """
+        Returns a vocabulary holding both the existing tokens and the given ones
+            Args:
+                tokens (iterable): the tokens to add
+            Return:
+                (tuple): the merged vocabulary, and an array mapping the existing ids to the merged ones
+                         (None if no token was added).
+        """
+        new_tokens = set(tokens).difference(self.token_to_id)
+        if not new_tokens:
+            return self, None
+        merged = Vocabulary(self.tokens + list(new_tokens))
+        return merged, merged.get_ids(self.tokens)
+
+
+class Packed_Ngram_Language_Model(Ngram_Language_Model):
+    """A Markov Language Model that stores its counts in compact arrays instead of dictionaries.
+        Tokens are interned to integer ids and every n-gram is packed into a single 64 bit key,
+        the ids of its tokens taking `bits` bits each. The model holds the sorted keys, their counts and
+        their cumulative counts, so any prefix of an n-gram (and in particular a context) matches a
+        contiguous range of keys that is found by a binary search.
+
+        The model supports the same API as Ngram_Language_Model, with the following differences:
+            * get_model_dictionary() materializes a new dictionary on every call.
+            * Texts shorter than n only contribute their unigrams.
+            * prune() recomputes the totals from the remaining counts.
+            * The vocabulary size and n are limited by n * bits <= MAX_KEY_BITS.
+    """
+
+    def __init__(self, n=3, chars=False):
+        """Initializing a packed language model object.
+        Args:
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+                          Defaults to False.
+        """
+        if n < 1:
+            raise ValueError("a packed model requires n >= 1, got %d" % n)
+        super().__init__(n=n, chars=chars)
+        # the counts are held by the arrays below
+        self.model_dict = self.unigram_dict = self.context_dict = self.context_totals = None
+        self.vocabulary = Vocabulary()
+        self.bits = 1
+        self.keys = np.zeros(0, dtype=np.int64)  # sorted packed ngrams
+        self.counts = np.zeros(0, dtype=np.int64)  # the count of each packed ngram
+        self.cumulative_counts = np.zeros(1, dtype=np.int64)  # cumulative counts of the keys, starting with 0
+        self.unigram_counts = np.zeros(0, dtype=np.int64)  # the count of each token id
+        self.path = None  # the file the model was loaded from, if any
+
+    @classmethod
+    def from_model(cls, lm):
+        """
+        Packs the counts of a dictionary based language model
+            Args:
+                lm (Ngram_Language_Model): the model to pack
+            Return:
+                (Packed_Ngram_Language_Model): a packed model holding the same counts.
+        """
+        packed = cls(n=lm.n, chars=lm.chars)
+        packed.set_vocabulary(Vocabulary(lm.unigram_dict.keys()))
+        packed.unigram_counts = np.fromiter(
+            (lm.unigram_dict[token] for token in packed.vocabulary.tokens), dtype=np.int64,
+            count=len(packed.vocabulary))
+
+        n_grams = [tokens for tokens in map(lm.split_to_unigrams, lm.model_dict.keys()) if len(tokens) == lm.n]
+        ids = packed.vocabulary.get_ids([token for tokens in n_grams for token in tokens]).reshape(-1, lm.n)
+        keys = packed.encode(ids)
+        order = np.argsort(keys)
+        packed.keys = keys[order]
+        packed.counts = np.fromiter((lm.model_dict[packed.split_by.join(tokens)] for tokens in n_grams),
+                                    dtype=np.int64, count=len(n_grams))[order]
+        packed.update_totals()
+        return packed
+
+    def set_vocabulary(self, vocabulary):
+        """
+        Sets the model's vocabulary and the number of bits each token id takes in a packed key
+            Args:
+                vocabulary (Vocabulary): the new vocabulary
+        """
+        bits = max(1, (len(vocabulary) - 1).bit_length())
+        if self.n * bits > MAX_KEY_BITS:
+            raise ValueError("%d-grams over a vocabulary of %d tokens do not fit in %d bit keys" %
+                             (self.n, len(vocabulary), MAX_KEY_BITS))
+        self.vocabulary = vocabulary
+        self.bits = bits
+
+    def encode(self, ids):
+        """
+        Packs rows of token ids into keys
+            Args:
+                ids (np.array): a 2d array, each row holding the ids of an n-gram (or of a prefix of one)
+            Return:
+                (np.array): the packed key of each row.
+        """
+        keys = np.zeros(len(ids), dtype=np.int64)
+        for column in range(ids.shape[1]):
+            keys = (keys << self.bits) | ids[:, column]
+        return keys
+
+    def decode(self, keys):
+        """
+        Unpacks keys into rows of token ids
+            Args:
+                keys (np.array): packed n-grams
+            Return:
+                (np.array): a 2d array, each row holding the ids of an n-gram.
+        """
+        mask = (1 << self.bits) - 1
+        shifts = self.bits * np.arange(self.n - 1, -1, -1, dtype=np.int64)
+        return (keys[:, None] >> shifts) & mask
+
+    def decode_ngram(self, key):
+        """
+        Returns the string of a single packed n-gram
+            Args:
+                key (int): the packed n-gram
+            Return:
+                (str): the n-gram.
+        """
+        mask = (1 << self.bits) - 1
+        return self.split_by.join(self.vocabulary.tokens[(key >> (self.bits * i)) & mask]
+                                  for i in range(self.n - 1, -1, -1))
+
+    def window_keys(self, ids):
+        """
+        Packs every n consecutive token ids into a key
+            Args:
+                ids (np.array): the token ids of a text
+            Return:
+                (np.array): the packed n-grams of the text, in order.
+        """
+        windows = len(ids) - self.n + 1
+        keys = np.zeros(max(windows, 0), dtype=np.int64)
+        for i in range(self.n if windows > 0 else 0):
+            keys = (keys << self.bits) | ids[i:i + windows]
+        return keys
+
+    def update_totals(self):
+        """
+        Recomputes the cumulative counts and the totals after the counts have changed
+        """
+        self.cumulative_counts = np.concatenate(([0], np.cumsum(self.counts, dtype=np.int64)))
+        self.ngram_total = int(self.cumulative_counts[-1])
+        self.unigram_total = int(self.unigram_counts.sum())
+        self.on_model_change()
+
+    def build_model(self, text):
+        """populates the packed arrays with the counts of the text.
+
+            Args:
+                text (str): the text to construct the model from.
+        """
+        self.count_tokens(self.split_to_unigrams(text))
+
+    def count_tokens(self, tokens, history=()):
+        """
+        Counts the given tokens and the n-grams ending in them into the packed arrays
+            Args:
+                tokens (list): the tokens to count.
+                history (list): the last n-1 tokens preceding the given ones, if any. Defaults to none.
+            Return:
+                (list): the last n-1 tokens, to be passed as the history of the tokens that follow.
+        """
+        sequence = list(history) + tokens
+        self.intern(tokens)
+        ids = self.vocabulary.get_ids(sequence)
+        # the arrays are replaced rather than updated in place, as they may be read-only views of a saved model
+        self.unigram_counts = self.unigram_counts + np.bincount(ids[len(sequence) - len(tokens):],
+                                                                minlength=len(self.vocabulary))
+        self.add_keys(*np.unique(self.window_keys(ids), return_counts=True))
+        return sequence[len(sequence) - self.n + 1:]
+
+    def merge_counts(self, model_dict, unigram_dict):
+        """
+        Adds partial counts, collected over the same n, into the packed arrays. Entries shorter than n are skipped.
+            Args:
+                model_dict (dict): n-gram counts of the form {ngram:count}. Counts may be negative.
+                unigram_dict (dict): unigram counts of the form {unigram:count}. Counts may be negative.
+        """
+        self.intern(unigram_dict.keys())
+        ids = self.vocabulary.get_ids(list(unigram_dict.keys()))
+        counts = np.fromiter(unigram_dict.values(), dtype=np.int64, count=len(unigram_dict))
+        self.unigram_counts = self.unigram_counts + np.bincount(ids, weights=counts,
+                                                                minlength=len(self.vocabulary)).astype(np.int64)
+
+        n_grams = [(tokens, count) for tokens, count in zip(map(self.split_to_unigrams, model_dict.keys()),
+                                                            model_dict.values()) if len(tokens) == self.n]
+        ids = self.vocabulary.get_ids([token for tokens, _ in n_grams for token in tokens]).reshape(-1, self.n)
+        self.add_keys(self.encode(ids), np.array([count for _, count in n_grams], dtype=np.int64))
+
+    def apply_delta(self, text, sign):
+        """
+        Adds (or subtracts) the counts of a text to the packed arrays
+            Args:
+                text (str): the text.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        delta = Ngram_Language_Model(n=self.n, chars=self.chars)
+        delta.build_model(text)
+        if sign < 0 and (any((self.get_ngram_count(n_gram) or 0) < count for n_gram, count in delta.model_dict.items()
+                             if len(self.split_to_unigrams(n_gram)) == self.n) or
+                         any(self.vocabulary.get_id(unigram) < 0 or
+                             self.unigram_counts[self.vocabulary.get_id(unigram)] < count
+                             for unigram, count in delta.unigram_dict.items())):
+            raise ValueError("the text cannot be retracted, as it was not counted into the model")
+        self.merge_counts({n_gram: sign * count for n_gram, count in delta.model_dict.items()},
+                          {unigram: sign * count for unigram, count in delta.unigram_dict.items()})
+
+    def prune(self, min_counts=None, top_k=None):
+        """Drops rare entries from the packed arrays to reduce their memory, as Ngram_Language_Model.prune() does.
+        Unlike the dictionary based model, the totals are recomputed from the remaining counts (they are derived
+        from the counts), so the probabilities of the remaining ngrams are those of a model holding only them.
+        Dropped unigrams keep their ids, with a count of zero.
+        Text containing dropped entries can no longer be retracted.
+
+            Args:
+                min_counts (int or dict): the minimal count of the entries to keep, either for all orders or in the
+                                          form {order:min count}. The unigrams are of order 1 and the model's ngrams
+                                          of order n. Defaults to None, keeping all counts.
+                top_k (int): the number of the most frequent tokens to keep following each context.
+                             Defaults to None, keeping all tokens.
+            Return:
+                (int): the number of entries dropped.
+        """
+
+        def min_count(order):
+            return min_counts.get(order, 0) if isinstance(min_counts, dict) else min_counts or 0
+
+        keep = self.counts >= min_count(self.n)
+        if top_k is not None:
+            # the keys of a context are contiguous, so the rank of a key among its context's keys is its position
+            # in the context's keys sorted by count, less the position of the context's first key
+            contexts = self.keys >> self.bits if self.n > 1 else np.zeros(len(self.keys), dtype=np.int64)
+            order = np.lexsort((-self.counts, contexts))
+            ranks = np.arange(len(order)) - np.searchsorted(contexts, contexts)[order]
+            keep[order[ranks >= top_k]] = False
+        rare = (self.unigram_counts > 0) & (self.unigram_counts < min_count(1))
+
+        # the arrays are replaced rather than updated in place, as they may be read-only views of a saved model
+        self.keys, self.counts = self.keys[keep], self.counts[keep]
+        self.unigram_counts = np.where(rare, 0, self.unigram_counts)
+        self.update_totals()
+        return int(len(keep) - keep.sum() + rare.sum())
+
+    def intern(self, tokens):
+        """
+        Adds new tokens to the vocabulary, re-packing the existing keys if their ids have changed
+            Args:
+                tokens (iterable): the tokens to add
+        """
+        vocabulary, remap = self.vocabulary.merge(tokens)
+        if remap is None:
+            return
+        ids = remap[self.decode(self.keys)]
+        self.set_vocabulary(vocabulary)
+        self.keys = self.encode(ids)  # the remapping keeps the order of the tokens, so the keys stay sorted
+        unigram_counts = np.zeros(len(vocabulary), dtype=np.int64)
+        unigram_counts[remap] = self.unigram_counts
+        self.unigram_counts = unigram_counts
+
+    def add_keys(self, keys, counts):
+        """
+        Merges counted keys into the packed arrays, dropping the keys whose count reaches zero
+            Args:
+                keys (np.array): packed n-grams.
+                counts (np.array): the count (or the count change) of each key.
+        """
+        keys, inverse = np.unique(np.concatenate((self.keys, keys)), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate((self.counts, counts)),
+                             minlength=len(keys)).astype(np.int64)
+        self.keys, self.counts = keys[counts != 0], counts[counts != 0]
+        self.update_totals()
+
+    def save(self, path):
+        """
+        Saves the model to a binary file, that can be loaded (and memory mapped) by load()
+            Args:
+                path (str): the file's path
+        """
+        with open(path, "wb") as f:
+            for section in self.iter_file_sections():
+                f.write(section)
+
+    def iter_file_sections(self):
+        """
+        Yields the content of the model's binary file, a section at a time: the header, and each section followed
+        by its padding
+            Return:
+                Generator. The sections' bytes.
+        """
+        encoded_tokens = [token.encode("utf-8") for token in self.vocabulary.tokens]
+        token_offsets = np.concatenate(([0], np.cumsum([len(token) for token in encoded_tokens], dtype=np.int64)))
+        tokens_blob = b"".join(encoded_tokens)
+        header = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, self.n, self.bits, self.chars, len(self.vocabulary),
+                                  len(self.keys), len(tokens_blob), self.ngram_total, self.unigram_total)
+
+        yield header
+        for section in (token_offsets.astype("<i8").tobytes(), tokens_blob,
+                        self.keys.astype("<i8").tobytes(), self.counts.astype("<i8").tobytes(),
+                        self.cumulative_counts.astype("<i8").tobytes(),
+                        self.unigram_counts.astype("<i8").tobytes()):
+            yield section
+            yield b"\0" * (-len(section) % 8)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a model saved by save(). The arrays are read-only views of the file's content, so with memory mapping
+        they are not copied, and processes loading the same file share its pages through the page cache.
+        Building on a loaded model copies the arrays it changes.
+            Args:
+                path (str): the file's path
+                mmap (bool): True iff the file should be memory mapped rather than read. Defaults to True.
+            Return:
+                (Packed_Ngram_Language_Model): the loaded model.
+        """
+        with open(path, "rb") as f:
+            buffer = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ) if mmap else f.read()
+        lm = cls.from_buffer(buffer)
+        lm.path = path
+        return lm
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """
+        Returns a model whose arrays are read-only views of a buffer holding a saved model, even if the buffer is
+        writable
+            Args:
+                buffer (buffer): the content of a file written by save()
+            Return:
+                (Packed_Ngram_Language_Model): the model.
+        """
+        (magic, version, n, bits, chars, vocabulary_size, keys_num, tokens_size, ngram_total,
+         unigram_total) = FILE_HEADER.unpack_from(buffer)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError("the buffer does not hold a version %d packed language model" % FILE_VERSION)
+
+        offset = FILE_HEADER.size
+
+        def section(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            array.flags.writeable = False
+            offset += array.nbytes + (-array.nbytes % 8)
+            return array
+
+        token_offsets = section("<i8", vocabulary_size + 1).tolist()
+        tokens_blob = bytes(section(np.uint8, tokens_size))
+        lm = cls(n=n, chars=bool(chars))
+        lm.vocabulary = Vocabulary()
+        lm.vocabulary.tokens = [tokens_blob[start:end].decode("utf-8")
+                                for start, end in zip(token_offsets, token_offsets[1:])]
+        lm.vocabulary.token_to_id = {token: i for i, token in enumerate(lm.vocabulary.tokens)}
+        lm.bits = bits
+        lm.keys = section("<i8", keys_num)
+        lm.counts = section("<i8", keys_num)
+        lm.cumulative_counts = section("<i8", keys_num + 1)
+        lm.unigram_counts = section("<i8", vocabulary_size)
+        lm.ngram_total, lm.unigram_total = ngram_total, unigram_total
+        return lm
+
+    def get_model_dictionary(self):
+        """Returns a dictionary of the form {ngram:count}, materialized from the packed arrays
+        """
+        return {self.decode_ngram(key): count for key, count in zip(self.keys.tolist(), self.counts.tolist())}
+
+    def memory_usage(self):
+        """
+        Returns an estimate of the memory held by the model's tables, in bytes
+            Return:
+                (int): the size of the arrays and of the vocabulary.
+        """
+        arrays = self.keys.nbytes + self.counts.nbytes + self.cumulative_counts.nbytes + self.unigram_counts.nbytes
+        vocabulary = (sys.getsizeof(self.vocabulary.tokens) + sys.getsizeof(self.vocabulary.token_to_id) +
+                      sum(sys.getsizeof(token) + sys.getsizeof(i) for token, i in
+                          self.vocabulary.token_to_id.items()))
+        return arrays + vocabulary
+
+    def prefix_key_range(self, prefix):
+        """
+        Returns the range of the keys whose n-gram string starts with the given prefix.
+        All the tokens of the prefix but the last must match exactly, and the last one may be a prefix of a token.
+            Args:
+                prefix (str): the prefix
+            Return:
+                (tuple): the index of the first key and one past the last key of the range.
+        """
+        tokens = self.split_to_unigrams(prefix)
+        if len(tokens) > self.n:
+            return 0, 0
+        if len(tokens) == 0:
+            return 0, len(self.keys)
+
+        head = 0
+        for token in tokens[:-1]:
+            token_id = self.vocabulary.get_id(token)
+            if token_id < 0:
+                return 0, 0
+            head = (head << self.bits) | token_id
+        first, last = self.vocabulary.prefix_range(tokens[-1])
+        if first == last:
+            return 0, 0
+
+        shift = self.bits * (self.n - len(tokens))
+        low = ((head << self.bits) + first) << shift
+        high = ((head << self.bits) + last) << shift
+        return int(np.searchsorted(self.keys, low)), int(np.searchsorted(self.keys, high))
+
+    def get_ngram_count(self, ngram):
+        """
+        Returns the count of the given ngram
+            Args:
+                ngram (str): the ngram to count
+            Return:
+                (int): the ngram's count, or None if the ngram is not in the model.
+        """
+        tokens = self.split_to_unigrams(ngram)
+        if len(tokens) != self.n:
+            return None
+        key = 0
+        for token in tokens:
+            token_id = self.vocabulary.get_id(token)
+            if token_id < 0:
+                return None
+            key = (key << self.bits) | token_id
+        i = int(np.searchsorted(self.keys, key))
+        return int(self.counts[i]) if i < len(self.keys) and self.keys[i] == key else None
+
+    def count_occure(self, word):
+        """
+        Returns the number of word occurrences in the model, i.e. the total count of the ngrams starting with it.
+            Args:
+                (str) ngram or a part of it
+            Return:
+                (int) num of occurrences
+        """
+        start, end = self.prefix_key_range(word)
+        return int(self.cumulative_counts[end] - self.cumulative_counts[start])
+
+    def get_context_count(self, context):
+        """
+        Returns the total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the number of times the context was followed by a token in the model
+        """
+        if self.is_context_size(context):
+            return self.count_occure(context + self.split_by) if self.n > 1 else self.ngram_total
+        return sum(self.get_markov_n_minus_dict(context).values())
+
+    def get_markov_n_minus_dict(self, ngram):
+        """
+        finds all the ngram's matching keys in the model
+            Args:
+                ngram (str): the ngram to find
+            Return:
+                (dict): all options found in the model, in the form {token:count}.
+
+        """
+        if self.is_context_size(ngram) and self.n > 1:
+            ngram += self.split_by  # a full context must match its tokens exactly
+        start, end = self.prefix_key_range(ngram) if self.n > 1 or self.chars else (0, len(self.keys))
+        last_ids = self.keys[start:end] & ((1 << self.bits) - 1)
+        tokens = self.vocabulary.tokens
+        return {tokens[token_id]: count for token_id, count in zip(last_ids.tolist(), self.counts[start:end].tolist())}
+
+    def sample_context(self):
+        """
+        Samples a new context from the model's distribution
+            Return:
+                (str): a sampled context
+        """
+        i = np.searchsorted(self.cumulative_counts[1:], random.random() * self.ngram_total, side="right")
+        return self.decode_ngram(int(self.keys[i]))
+
+    def is_exhausted_context(self, context):
+        """
+        Checks if the context is exhausted or not
+            Args:
+                (str): the context
+            Return:
+                (bool): True if the context is exhausted, False otherwise.
+        """
+        return self.get_context_count(context) == 0
+
+    def sample_token(self, context):
+        """
+        Samples the token following the given context from the model's distribution.
+        The context's keys are a contiguous range, so the sample is a binary search in the cumulative counts.
+            Args:
+                context (str): the context, which must not be exhausted.
+            Return:
+                (str): a sampled token
+        """
+        if not self.is_context_size(context) or self.n == 1:
+            return super().sample_token(context)
+        start, end = self.prefix_key_range(context + self.split_by)
+        first, last = self.cumulative_counts[start], self.cumulative_counts[end]
+        i = np.searchsorted(self.cumulative_counts[start + 1:end + 1], first + random.random() * (last - first),
+                            side="right")
+        key = int(self.keys[start + min(i, end - start - 1)])
+        return self.vocabulary.tokens[key & ((1 << self.bits) - 1)]
+
+    def evaluate_many(self, texts, workers=None):
+        """Returns the log-likelihood of each of the specified texts, equal to evaluate() of the text.
+        The texts are tokenized in bulk, and the counts of all their n-grams and contexts are gathered with
+        array lookups.
+
+            Args:
+                texts (list): the texts to evaluate.
+                workers (int): the number of processes to split the texts between. Defaults to None, evaluating
+                               the texts in this process. A model loaded from a file is memory mapped by the
+                               workers, otherwise the model is handed to them.
+
+            Returns:
+                np.array. The log-likelihood of each text.
+        """
+        if workers is not None and workers > 1 and len(texts) > 1:
+            chunk_size = -(-len(texts) // workers)
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_evaluation_worker,
+                                                        initargs=(self.path or self,)) as executor:
+                return np.concatenate(list(executor.map(evaluate_in_worker, chunks)))
+
+        tokenized = [self.split_to_unigrams(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.int64)
+        ids = self.vocabulary.get_ids([token for tokens in tokenized for token in tokens])
+
+        # the n-grams of each text start at its tokens' offset, and there are length - n + 1 of them
+        windows = np.maximum(lengths - self.n + 1, 0)
+        window_ends = np.cumsum(windows)
+        token_offsets = np.cumsum(lengths) - lengths
+        starts = np.arange(windows.sum()) + np.repeat(token_offsets - (window_ends - windows), windows)
+        keys = np.zeros(len(starts), dtype=np.int64)
+        unknown = np.zeros(len(starts), dtype=bool)
+        for i in range(self.n):
+            keys = (keys << self.bits) | np.maximum(ids[starts + i], 0)
+            unknown |= ids[starts + i] < 0
+
+        # gather the counts of the n-grams and of their contexts
+        positions = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        found = ~unknown & (self.keys[positions] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        if self.n > 1:
+            contexts = keys >> self.bits
+            context_counts = (self.cumulative_counts[np.searchsorted(self.keys, (contexts + 1) << self.bits)] -
+                              self.cumulative_counts[np.searchsorted(self.keys, contexts << self.bits)])
+        else:
+            context_counts = np.full(len(keys), self.ngram_total, dtype=np.int64)
+        ngram_probs = np.where(found, self.counts[positions] / np.maximum(context_counts, 1), self.smooth(None))
+        ngram_log_probs = list(map(math.log, ngram_probs.tolist()))
+        leading_log_probs = self.evaluate_leading_many(tokenized, ids, token_offsets, np.flatnonzero(windows))
+
+        log_likelihoods = np.zeros(len(texts))
+        for i, text in enumerate(texts):
+            if windows[i] == 0:
+                log_likelihoods[i] = self.evaluate(text)  # texts shorter than n are scored as unigrams
+                continue
+            probs = next(leading_log_probs)
+            probs.extend(ngram_log_probs[window_ends[i] - windows[i]:window_ends[i]])
+            log_likelihoods[i] = sum(probs)
+        return log_likelihoods
+
+    def evaluate_leading_many(self, tokenized, ids, token_offsets, indices):
+        """
+        Returns the log probabilities of evaluate_leading() for many texts, gathering the counts of the
+        leading parts of their first ngrams with array lookups
+            Args:
+                tokenized (list): the tokens of each text.
+                ids (np.array): the token ids of all the texts, -1 for unknown tokens.
+                token_offsets (np.array): the offset of each text's first token in ids.
+                indices (np.array): the indices of the texts to evaluate, all of them at least n tokens long.
+            Return:
+                (generator): the list of log probabilities of each of the texts, in order.
+        """
+        prefix_ranges = {}
+        heads = np.zeros(len(indices), dtype=np.int64)
+        unknown = np.zeros(len(indices), dtype=bool)
+        counts = []
+        for k in range(1, self.n):
+            # count_occure() of the first k tokens, the last of which is matched as a prefix of a token
+            last_tokens = [tokenized[i][k - 1] for i in indices]
+            for token in set(last_tokens).difference(prefix_ranges):
+                prefix_ranges[token] = self.vocabulary.prefix_range(token)
+            bounds = np.array([prefix_ranges[token] for token in last_tokens], dtype=np.int64).reshape(-1, 2)
+            first, last = bounds[:, 0], bounds[:, 1]
+            shift = self.bits * (self.n - k)
+            low = self.cumulative_counts[np.searchsorted(self.keys, ((heads << self.bits) + first) << shift)]
+            high = self.cumulative_counts[np.searchsorted(self.keys, ((heads << self.bits) + last) << shift)]
+            counts.append(np.where(unknown, 0, high - low))
+
+            last_ids = ids[token_offsets[indices] + k - 1]
+            heads = (heads << self.bits) | np.maximum(last_ids, 0)
+            unknown |= last_ids < 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probs = [counts[0] / self.ngram_total] if counts else []
+            probs.extend(counts[k] / counts[k - 1] for k in range(1, len(counts)))
+        probs = [prob.tolist() for prob in probs]
+        for j in range(len(indices)):
+            yield [math.log(prob[j]) for prob in probs]
+
+
+def save_model(lm, path):
+    """
+    Saves a language model to a binary file, packing it first if needed
+        Args:
+            lm (Ngram_Language_Model): the model to save
+            path (str): the file's path
+    """
+    if not isinstance(lm, Packed_Ngram_Language_Model):
+        lm = Packed_Ngram_Language_Model.from_model(lm)
+    lm.save(path)
+
+
+def load_model(path, mmap=True):
+    """
+    Loads a language model saved by save_model()
+        Args:
+            path (str): the file's path
+            mmap (bool): True iff the file should be memory mapped rather than read. Defaults to True.
+        Return:
+            (Packed_Ngram_Language_Model): the loaded model.
+    """
+    return Packed_Ngram_Language_Model.load(path, mmap=mmap)
+
+
+def init_evaluation_worker(lm):
+    """
+    Sets the model evaluated by a worker process (this is not a class method, so it can be sent to the worker)
+        Args:
+            lm (Packed_Ngram_Language_Model or str): the model, or the path of a saved model to memory map.
+    """
+    global worker_model
+    worker_model = Packed_Ngram_Language_Model.load(lm) if isinstance(lm, str) else lm
+
+
+def evaluate_in_worker(texts):
+    """
+    Evaluates texts with the worker process' model
+        Args:
+            texts (list): the texts to evaluate.
+        Return:
+            (np.array): the log-likelihood of each text.
+    """
+    return worker_model.evaluate_many(texts)
@@ -0,0 +1,331 @@
+import json
+import math
+
+import numpy as np
+
+from sketch import fingerprint
+
+CODE_TYPES = {8: np.uint8, 16: np.uint16}  # the arrays holding the quantized log probabilities, by their bits
+
+
+class Quantized_Table:
+    """Log probabilities keyed by the fingerprints of their strings, each quantized to one of 2^bits levels evenly
+    spaced between the smallest and the largest of them. A dequantized log probability is at most half a level's
+    step from the true one. Two keys sharing a fingerprint are told apart by neither, so an unseen key may be
+    looked up as seen, with a probability of about len(table) / 2^64.
+    """
+
+    def __init__(self, fingerprints, codes, minimum, step):
+        """Initializing a table of quantized log probabilities.
+        Args:
+            fingerprints (np.array): the sorted fingerprints of the keys.
+            codes (np.array): the quantized log probability of each key.
+            minimum (float): the log probability of code 0.
+            step (float): the difference between the log probabilities of consecutive codes.
+        """
+        self.fingerprints = fingerprints
+        self.codes = codes
+        self.minimum = minimum
+        self.step = step
+
+    @classmethod
+    def from_log_probs(cls, log_probs, bits=8):
+        """
+        Quantizes log probabilities
+            Args:
+                log_probs (dict): log probabilities of the form {key:log_prob}.
+                bits (int): the bits of each quantized log probability, 8 or 16. Defaults to 8.
+            Return:
+                (Quantized_Table): the table.
+        """
+        fingerprints = fingerprint(list(log_probs.keys()))
+        values = np.fromiter(log_probs.values(), dtype=np.float64, count=len(log_probs))
+        minimum = float(values.min()) if len(values) else 0.0
+        step = (float(values.max()) - minimum) / ((1 << bits) - 1) if len(values) else 0.0
+        codes = np.rint((values - minimum) / step) if step > 0 else np.zeros(len(values))
+
+        # a collision keeps one of the colliding keys, as the other one could not be looked up anyway
+        fingerprints, first = np.unique(fingerprints, return_index=True)
+        return cls(fingerprints, codes[first].astype(CODE_TYPES[bits]), minimum, step)
+
+    def lookup(self, keys):
+        """
+        Returns the dequantized log probabilities of the keys
+            Args:
+                keys (list): the keys (strings).
+            Return:
+                (tuple): the log probabilities (np.array), and a boolean array marking the keys in the table,
+                         the log probabilities of the other keys being meaningless.
+        """
+        fingerprints = fingerprint(keys)
+        positions = np.minimum(np.searchsorted(self.fingerprints, fingerprints), max(len(self.fingerprints) - 1, 0))
+        found = self.fingerprints[positions] == fingerprints if len(self.fingerprints) else np.zeros(len(keys), bool)
+        return self.minimum + self.codes[positions].astype(np.float64) * self.step, found
+
+    def error_bound(self):
+        """
+        Returns the largest difference between a dequantized log probability and the true one
+            Return:
+                (float): half a step.
+        """
+        return self.step / 2
+
+    def memory_usage(self):
+        """
+        Returns the memory held by the table, in bytes
+            Return:
+                (int): the size of the arrays.
+        """
+        return self.fingerprints.nbytes + self.codes.nbytes
+
+
+class Quantized_Scoring_Model:
+    """A compact scoring-only language model, exported from a language model by from_model(). Rather than counts
+    it keeps the log probabilities the exported model's evaluate() computes, quantized to 8 or 16 bits and keyed by
+    64 bit fingerprints of the ngrams: a table of the ngrams' conditional log probabilities, and a table of the log
+    probabilities of the leading parts of a text (see evaluate_leading()). Unseen ngrams are Laplace smoothed by the
+    exported model's totals, so a text scores within score_error_bound() of the exported model's score.
+    The model only scores texts, by the evaluate() of the language models.
+    """
+
+    def __init__(self, n=3, chars=False):
+        """Initializing an empty model, filled by from_model() or load().
+        Args:
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+                          Defaults to False.
+        """
+        self.n = n
+        self.chars = chars
+        self.split_by = "" if chars else " "
+        self.bits = None
+        self.ngram_table = None  # the conditional log probabilities of the ngrams
+        self.leading_table = None  # the log probabilities of the leading parts, by their strings
+        self.counted_orders = False  # True iff the exported model counted all the orders (all_orders=True)
+        self.smoothed_log_prob = None  # the log probability of an unseen ngram
+        self.export_report = None
+
+    @classmethod
+    def from_model(cls, lm, bits=8):
+        """
+        Exports the log probabilities evaluate() computes for a language model, which is not finalized, and reports
+        the bound on the score error and the memory saved in export_report:
+            "bits": the bits of each quantized log probability.
+            "ngrams", "leading": the number of entries in the ngram and the leading parts tables.
+            "log_prob_error_bound": the largest error of a token's log probability.
+            "max_log_prob_error": the largest error of the exported log probabilities, measured.
+            "collision_probability": the probability of an unseen ngram to be looked up as seen.
+            "memory", "full_memory", "memory_saved": the memory_usage() of both models and their difference.
+        The ngrams of the texts shorter than n are not exported (the exported model cannot score them either), so
+        they are scored as unseen.
+            Args:
+                lm (Ngram_Language_Model): the model to export, of any kind that lists its ngrams.
+                bits (int): the bits of each quantized log probability, 8 or 16. Defaults to 8.
+            Return:
+                (Quantized_Scoring_Model): the compact model.
+        """
+        if bits not in CODE_TYPES:
+            raise ValueError("log probabilities are quantized to 8 or 16 bits, got %r" % (bits,))
+        if lm.smoothing is not None:
+            raise ValueError("only Laplace smoothed scores can be exported, the model was finalized with %s"
+                             % lm.smoothing[0])
+
+        quantized = cls(n=lm.n, chars=lm.chars)
+        quantized.bits = bits
+        quantized.counted_orders = lm.order_dicts is not None
+        quantized.smoothed_log_prob = math.log(lm.smooth(""))
+
+        ngram_log_probs = {}
+        for ngram in lm.get_model_dictionary():
+            if len(lm.split_to_unigrams(ngram)) == lm.n:
+                ngram_log_probs[ngram] = lm.get_ngram_log_prob(ngram)
+        quantized.ngram_table = Quantized_Table.from_log_probs(ngram_log_probs, bits)
+        leading_log_probs = get_leading_log_probs(lm)
+        quantized.leading_table = Quantized_Table.from_log_probs(leading_log_probs, bits)
+
+        max_error = 0.0
+        for table, log_probs in ((quantized.ngram_table, ngram_log_probs),
+                                 (quantized.leading_table, leading_log_probs)):
+            if log_probs:
+                dequantized, _ = table.lookup(list(log_probs.keys()))
+                true = np.fromiter(log_probs.values(), dtype=np.float64, count=len(log_probs))
+                max_error = max(max_error, float(np.abs(dequantized - true).max()))
+
+        full_memory = lm.memory_usage()
+        quantized.export_report = {
+            "bits": bits,
+            "ngrams": len(quantized.ngram_table.fingerprints),
+            "leading": len(quantized.leading_table.fingerprints),
+            "log_prob_error_bound": quantized.log_prob_error_bound(),
+            "max_log_prob_error": max_error,
+            "collision_probability": len(quantized.ngram_table.fingerprints) / 2 ** 64,
+            "memory": quantized.memory_usage(),
+            "full_memory": full_memory,
+            "memory_saved": full_memory - quantized.memory_usage()}
+        return quantized
+
+    def split_to_unigrams(self, text):
+        """
+        Splits a text into a list of tokens, as the exported model does
+            Args:
+                text (str): the text to split.
+            Return:
+                (list): the tokens.
+        """
+        return list(text) if self.chars else text.split(" ")
+
+    def split_to_n_grams(self, text):
+        """
+        Splits the input text into n-grams, as the exported model does
+            Args:
+                text (str): the text to split.
+            Return:
+                (list): n-grams list, or the tokens of a text shorter than n.
+        """
+        tokens = self.split_to_unigrams(text)
+        if len(tokens) < self.n:
+            return tokens
+        return [self.split_by.join(tokens[i:i + self.n]) for i in range(len(tokens) - self.n + 1)]
+
+    def log_prob_error_bound(self):
+        """
+        Returns the largest difference between the log probability of a token scored by the model and by the
+        exported model
+            Return:
+                (float): the bound.
+        """
+        return max(self.ngram_table.error_bound(), self.leading_table.error_bound())
+
+    def score_error_bound(self, text):
+        """
+        Returns the largest difference between the text's score by evaluate() and its score by the exported model,
+        barring fingerprint collisions
+            Args:
+                text (str): the text.
+            Return:
+                (float): the bound, the per token bound times the number of log probabilities summed.
+        """
+        return (len(self.split_to_n_grams(text)) + self.n - 1) * self.log_prob_error_bound()
+
+    def evaluate(self, text):
+        """Returns the log-likelihood of the specified text to be a product of the exported model, within
+           score_error_bound() of its score. The ngrams of the text are looked up together.
+
+           Args:
+               text (str): Text to evaluate.
+
+           Returns:
+               Float. The float should reflect the (log) probability.
+        """
+        n_grams_list = self.split_to_n_grams(text)
+        probs = self.evaluate_leading(n_grams_list[0])
+        log_probs, found = self.ngram_table.lookup(n_grams_list)
+        probs.extend(np.where(found, log_probs, self.smoothed_log_prob).tolist())
+        return sum(probs)
+
+    def get_ngram_log_prob(self, ngram):
+        """
+        Returns the quantized log probability of the last token of an ngram given its context
+            Args:
+                ngram (str): the ngram.
+            Return:
+                (float): the log probability, Laplace smoothed if the ngram is not in the model.
+        """
+        log_probs, found = self.ngram_table.lookup([ngram])
+        return float(log_probs[0]) if found[0] else self.smoothed_log_prob
+
+    def evaluate_leading(self, first_ngram):
+        """
+        Returns the quantized log probabilities of the leading parts of the text's first ngram, as the exported
+        model's evaluate_leading() computes them.
+            Args:
+                first_ngram (str): the first ngram of the evaluated text.
+            Return:
+                (list): the log probabilities, in order.
+        """
+        tokens = self.split_to_unigrams(first_ngram)
+        parts = [self.split_by.join(tokens[0:i]) for i in range(1, self.n)]
+        log_probs, found = self.leading_table.lookup(parts)
+        if not found.all():
+            raise ValueError("the leading tokens of the text are not in the model")
+
+        # the parts of a text shorter than the context repeat the whole text, given the whole text (as the exported
+        # model counts them) unless the model counted all the orders or the text is a single token
+        probs = log_probs.tolist()
+        if not self.counted_orders and len(tokens) > 1:
+            probs[len(tokens):] = [0.0] * len(probs[len(tokens):])
+        return probs
+
+    def save(self, path):
+        """
+        Saves the model to a NumPy .npz file, that can be loaded by load()
+            Args:
+                path (str): the file's path
+        """
+        header = {"n": self.n, "chars": self.chars, "bits": self.bits, "counted_orders": self.counted_orders,
+                  "smoothed_log_prob": self.smoothed_log_prob, "export_report": self.export_report,
+                  "scales": [[table.minimum, table.step] for table in (self.ngram_table, self.leading_table)]}
+        with open(path, "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)),
+                     ngram_fingerprints=self.ngram_table.fingerprints, ngram_codes=self.ngram_table.codes,
+                     leading_fingerprints=self.leading_table.fingerprints, leading_codes=self.leading_table.codes)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a model saved by save()
+            Args:
+                path (str): the file's path
+            Return:
+                (Quantized_Scoring_Model): the loaded model.
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            header = json.loads(str(arrays["header"]))
+            lm = cls(n=header["n"], chars=header["chars"])
+            (ngram_minimum, ngram_step), (leading_minimum, leading_step) = header["scales"]
+            lm.ngram_table = Quantized_Table(arrays["ngram_fingerprints"], arrays["ngram_codes"], ngram_minimum,
+                                             ngram_step)
+            lm.leading_table = Quantized_Table(arrays["leading_fingerprints"], arrays["leading_codes"],
+                                               leading_minimum, leading_step)
+        lm.bits, lm.counted_orders = header["bits"], header["counted_orders"]
+        lm.smoothed_log_prob, lm.export_report = header["smoothed_log_prob"], header["export_report"]
+        return lm
+
+    def memory_usage(self):
+        """
+        Returns the memory held by the model's tables, in bytes
+            Return:
+                (int): the size of the fingerprints and the quantized log probabilities.
+        """
+        return self.ngram_table.memory_usage() + self.leading_table.memory_usage()
+
+
+def get_leading_log_probs(lm):
+    """
+    Returns the log probabilities of all the leading parts of texts that a language model's evaluate_leading()
+    computes. If all the orders are counted the parts are the ngrams of the orders below n. Otherwise the parts are
+    counted as strings, so they are the prefixes of the model's ngrams of up to n-1 tokens, the last of which may be
+    a prefix of a token.
+        Args:
+            lm (Ngram_Language_Model): the model.
+        Return:
+            (dict): log probabilities of the form {leading part:log prob}.
+    """
+    leading_log_probs = {}
+    if lm.order_dicts is not None:
+        for order in range(1, lm.n):
+            for ngram, count in lm.order_dicts[order].items():
+                if count:
+                    leading_log_probs[ngram] = lm.evaluate_leading(ngram)[order - 1]
+        return leading_log_probs
+
+    for ngram in lm.get_model_dictionary():
+        tokens = lm.split_to_unigrams(ngram)
+        for i in range(1, min(len(tokens), lm.n - 1) + 1):
+            prefix = lm.split_by.join(tokens[:i])
+            if prefix in leading_log_probs:
+                continue
+            for end in range(len(prefix) - len(tokens[i - 1]) + 1, len(prefix) + 1):
+                if prefix[:end] not in leading_log_probs:
+                    leading_log_probs[prefix[:end]] = lm.evaluate_leading(prefix[:end])[i - 1]
+    return leading_log_probs
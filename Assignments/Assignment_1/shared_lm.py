@@ -0,0 +1,115 @@
+import os
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+from packed_lm import Packed_Ngram_Language_Model
+
+published_names = set()  # the names of the blocks published by this process
+
+
+class Shared_Model:
+    """A frozen language model published in a block of shared memory, in the format of packed_lm's model files.
+    Processes attach read-only views of the block rather than copies of the model, so N workers take about the
+    model's memory once. The publishing process owns the block and frees it by unlink() (or by leaving a with
+    block), once the views are no longer used.
+    """
+
+    def __init__(self, lm, name=None):
+        """Publishing a model.
+        Args:
+            lm (Ngram_Language_Model): the model, a dictionary based model being packed first. Later changes to
+                                       the model are not published.
+            name (str): the shared memory block's name. Defaults to a unique name.
+        """
+        if not isinstance(lm, Packed_Ngram_Language_Model):
+            lm = Packed_Ngram_Language_Model.from_model(lm)
+        sections = list(lm.iter_file_sections())
+        self.size = sum(len(section) for section in sections)
+        self.shared_memory = shared_memory.SharedMemory(name=name, create=True, size=self.size)
+        offset = 0
+        for section in sections:
+            self.shared_memory.buf[offset:offset + len(section)] = section
+            offset += len(section)
+        self.name = self.shared_memory.name
+        published_names.add(self.name)
+
+    def attach(self):
+        """
+        Returns a read-only view of the published model in this process
+            Return:
+                (Shared_Ngram_Language_Model): the view.
+        """
+        return attach_model(self.name)
+
+    def unlink(self):
+        """
+        Frees the shared memory block. Views attached in other processes stay valid until they are dropped, while
+        the views in this process must be dropped first.
+        """
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+        published_names.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
+
+
+class Shared_Ngram_Language_Model(Packed_Ngram_Language_Model):
+    """A packed language model whose arrays are read-only views of a shared memory block published by Shared_Model.
+    The model is pickled as the block's name, so a view handed to a worker process (e.g. by evaluate_many() or by
+    lm_server's workers) attaches to the block rather than copying the model. Changing the model copies the arrays
+    it changes into the process' own memory, as with a memory mapped model file, and a changed view can no longer
+    be pickled, as the block does not hold its changes: publish it again by Shared_Model instead.
+    """
+
+    def __init__(self, n=3, chars=False):
+        """Initializing an empty view, attached by attach_model().
+        Args:
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+                          Defaults to False.
+        """
+        super().__init__(n=n, chars=chars)
+        self.shared_memory = None  # the attached block, kept open while the view's arrays refer to it
+        self.modified = False  # True once the view's counts differ from the block's
+
+    def on_model_change(self, contexts=None):
+        """
+        Invalidates the tables derived from the counts, and marks an attached view as no longer matching its block
+            Args:
+                contexts (iterable): the contexts whose counts have changed, passed to the packed model.
+        """
+        super().on_model_change(contexts)
+        if self.shared_memory is not None:
+            self.modified = True
+
+    def __reduce__(self):
+        if self.shared_memory is None or self.modified:
+            raise ValueError("only an unchanged view of a shared model can be pickled, publish the changed model "
+                             "by Shared_Model instead")
+        return attach_model, (self.shared_memory.name,)
+
+
+def attach_model(name):
+    """
+    Attaches a read-only view of a model published by Shared_Model
+        Args:
+            name (str): the shared memory block's name.
+        Return:
+            (Shared_Ngram_Language_Model): the view.
+    """
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 attaching registers the block with the resource tracker, which frees the block when
+        # the processes using the tracker exit. The publisher's children share its tracker, where the block is
+        # registered already, while an unrelated process would free the publisher's block.
+        block = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and multiprocessing.parent_process() is None and name not in published_names:
+            resource_tracker.unregister(block._name, "shared_memory")
+    lm = Shared_Ngram_Language_Model.from_buffer(block.buf)
+    lm.shared_memory = block
+    return lm
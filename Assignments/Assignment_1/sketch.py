@@ -0,0 +1,297 @@
+import math
+import hashlib
+import collections
+
+import numpy as np
+
+BATCH_SIZE = 1 << 16  # the number of ngrams counted in a dictionary before they are added to the sketches
+
+
+def fingerprint(keys):
+    """
+    Returns the 64 bit hashes of the keys, which, unlike hash() of a string, do not depend on the process
+        Args:
+            keys (list): the keys (strings).
+        Return:
+            (np.array): the hashes, as unsigned 64 bit integers.
+    """
+    return np.fromiter((int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+                        for key in keys), dtype=np.uint64, count=len(keys))
+
+
+class Count_Min_Sketch:
+    """A table of approximate counts of a fixed size. The count of a key is added to one cell in each row, chosen
+    by a different hash, and is estimated by the smallest of these cells. For non negative counts the estimate is
+    never below the true count.
+    """
+
+    def __init__(self, width=1 << 20, depth=4):
+        """Initializing an empty sketch.
+        Args:
+            width (int): the number of cells in a row. Defaults to 1M.
+            depth (int): the number of rows. Defaults to 4.
+        """
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def hash_rows(self, keys):
+        """
+        Returns the cells of the keys, derived from the fingerprint of each key by double hashing.
+            Args:
+                keys (list): the keys (strings).
+            Return:
+                (np.array): a 2d array, each row holding the cells of the keys in a row of the table.
+        """
+        hashes = fingerprint(keys)
+        first, second = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((first + rows * second) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, counts):
+        """
+        Adds counts to the sketch
+            Args:
+                counts (dict): counts of the form {key:count}. Counts may be negative.
+        """
+        if not counts:
+            return
+        cells = self.hash_rows(list(counts.keys()))
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        for row in range(self.depth):
+            np.add.at(self.table[row], cells[row], values)
+
+    def estimate(self, keys):
+        """
+        Returns the estimated counts of the keys
+            Args:
+                keys (list): the keys (strings).
+            Return:
+                (np.array): the estimated count of each key.
+        """
+        cells = self.hash_rows(keys)
+        return self.table[np.arange(self.depth)[:, None], cells].min(axis=0)
+
+
+class Sketch_Scoring_Model:
+    """A scoring-only language model that counts its ngrams in Count-Min sketches rather than in dictionaries, so
+    its memory is fixed regardless of the text. The counts are estimates that may exceed the true ones (unseen
+    ngrams may be counted as seen), while the totals are exact.
+    Only counts are kept, so the model scores texts by the evaluate() of the language models (Laplace smoothed),
+    but does not list its ngrams or generate text.
+    """
+
+    def __init__(self, n=3, chars=False, width=1 << 20, depth=4):
+        """Initializing an empty sketch based model.
+        Args:
+            n (int): the length of the markov unit (the n of the n-gram). Defaults to 3.
+            chars (bool): True iff the model consists of ngrams of characters rather then word tokens.
+                          Defaults to False.
+            width (int): the number of cells in a row of each sketch. Defaults to 1M.
+            depth (int): the number of rows of each sketch. Defaults to 4.
+        """
+        if n < 1:
+            raise ValueError("a sketch model requires n >= 1, got %d" % n)
+        self.n = n
+        self.chars = chars
+        self.split_by = "" if chars else " "
+        self.ngram_total = 0
+        self.unigram_total = 0
+        self.ngram_sketch = Count_Min_Sketch(width, depth)  # the counts of the ngrams
+        self.prefix_sketch = Count_Min_Sketch(width, depth)  # the total counts of the ngrams starting with a string
+
+    def split_to_unigrams(self, text):
+        """
+        Splits a text into a list of tokens, as the language models do
+            Args:
+                text (str): the text to split.
+            Return:
+                (list): the tokens.
+        """
+        return list(text) if self.chars else text.split(" ")
+
+    def split_to_n_grams(self, text):
+        """
+        Splits the input text into n-grams, as the language models do
+            Args:
+                text (str): the text to split.
+            Return:
+                (list): n-grams list, or the tokens of a text shorter than n.
+        """
+        tokens = self.split_to_unigrams(text)
+        if len(tokens) < self.n:
+            return tokens
+        return [self.split_by.join(tokens[i:i + self.n]) for i in range(len(tokens) - self.n + 1)]
+
+    def build_model(self, text):
+        """populates the sketches with the counts of the text.
+
+            Args:
+                text (str): the text to construct the model from.
+        """
+        unigrams = self.split_to_unigrams(text)
+
+        # texts shorter than n are split to unigrams, as in the dictionary based model
+        if len(unigrams) < self.n:
+            self.add_counts(collections.Counter(self.split_to_n_grams(text)))
+
+        self.count_tokens(unigrams)
+
+    def update(self, text):
+        """Adds the counts of the text to the sketches, like build_model().
+
+            Args:
+                text (str): the text to add.
+        """
+        self.apply_delta(text, 1)
+
+    def retract(self, text):
+        """Removes the counts of a text previously added by build_model() or update(). A text that was not counted
+        may not be detected, as its ngrams may be estimated as seen.
+
+            Args:
+                text (str): the text to remove.
+        """
+        self.apply_delta(text, -1)
+
+    def count_tokens(self, tokens, history=()):
+        """
+        Counts the given tokens and the n-grams ending in them into the sketches, a batch of ngrams at a time
+            Args:
+                tokens (list): the tokens to count.
+                history (list): the last n-1 tokens preceding the given ones, if any. Defaults to none.
+            Return:
+                (list): the last n-1 tokens, to be passed as the history of the tokens that follow.
+        """
+        sequence = list(history) + tokens
+        for start in range(0, max(len(sequence) - self.n + 1, 0), BATCH_SIZE):
+            window = sequence[start:start + BATCH_SIZE + self.n - 1]
+            self.add_counts(collections.Counter(self.split_by.join(window[i:i + self.n])
+                                                for i in range(len(window) - self.n + 1)))
+        self.unigram_total += len(tokens)
+        return sequence[len(sequence) - self.n + 1:] if self.n > 1 else []
+
+    def add_counts(self, model_dict):
+        """
+        Adds ngram counts, and the counts of every prefix of the ngrams' strings, to the sketches
+            Args:
+                model_dict (dict): n-gram counts of the form {ngram:count}. Counts may be negative.
+        """
+        prefixes = collections.defaultdict(int)
+        for n_gram, count in model_dict.items():
+            for i in range(1, len(n_gram) + 1):
+                prefixes[n_gram[:i]] += count
+        self.ngram_sketch.add(model_dict)
+        self.prefix_sketch.add(prefixes)
+        self.ngram_total += sum(model_dict.values())
+
+    def apply_delta(self, text, sign):
+        """
+        Adds (or subtracts) the counts of a text to the sketches
+            Args:
+                text (str): the text.
+                sign (int): 1 to add the counts, -1 to subtract them.
+        """
+        tokens = self.split_to_unigrams(text)
+        counts = collections.Counter(self.split_to_n_grams(text)) if len(tokens) < self.n else collections.Counter(
+            self.split_by.join(tokens[i:i + self.n]) for i in range(len(tokens) - self.n + 1))
+        if sign < 0 and any((self.get_ngram_count(n_gram) or 0) < count for n_gram, count in counts.items()):
+            raise ValueError("the text cannot be retracted, as it was not counted into the model")
+        self.add_counts({n_gram: sign * count for n_gram, count in counts.items()})
+        self.unigram_total += sign * len(tokens)
+
+    def memory_usage(self):
+        """
+        Returns the memory held by the model's tables, in bytes
+            Return:
+                (int): the size of the sketches, which does not depend on the text.
+        """
+        return self.ngram_sketch.table.nbytes + self.prefix_sketch.table.nbytes
+
+    def get_ngram_count(self, ngram):
+        """
+        Returns the estimated count of the given ngram
+            Args:
+                ngram (str): the ngram to count
+            Return:
+                (int): the ngram's estimated count, or None if it is estimated as unseen.
+        """
+        count = min(int(self.ngram_sketch.estimate([ngram])[0]), self.count_occure(ngram))
+        return count if count > 0 else None
+
+    def count_occure(self, word):
+        """
+        Returns the estimated total count of the ngrams starting with the given string. As the count of a string
+        does not exceed the counts of its prefixes, the estimate is the smallest of the estimates of its prefixes.
+            Args:
+                (str) ngram or a part of it
+            Return:
+                (int) num of occurrences
+        """
+        if word == "":
+            return self.ngram_total
+        return min(int(self.prefix_sketch.estimate([word[:i] for i in range(1, len(word) + 1)]).min()),
+                   self.ngram_total)
+
+    def get_context_count(self, context):
+        """
+        Returns the estimated total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the estimated number of times the context was followed by a token in the model
+        """
+        # the ngrams following a full context start with the context and a separator
+        if self.n > 1 and len(self.split_to_unigrams(context)) == self.n - 1:
+            return self.count_occure(context + self.split_by)
+        return self.count_occure(context)
+
+    def evaluate(self, text):
+        """Returns the log-likelihood of the specified text to be a product of the model, by the estimated counts.
+           Laplace smoothing is applied to the ngrams estimated as unseen.
+
+           Args:
+               text (str): Text to evaluate.
+
+           Returns:
+               Float. The float should reflect the (log) probability.
+        """
+        n_grams_list = self.split_to_n_grams(text)
+        probs = self.evaluate_leading(n_grams_list[0])
+        for ngram in n_grams_list:
+            probs.append(self.get_ngram_log_prob(ngram))
+        return sum(probs)
+
+    def get_ngram_log_prob(self, ngram):
+        """
+        Returns the log probability of the last token of an ngram given its context, as evaluate() scores it
+            Args:
+                ngram (str): the ngram.
+            Return:
+                (float): the log probability, Laplace smoothed if the ngram is estimated as unseen.
+        """
+        n_gram_count = self.get_ngram_count(ngram)
+        if n_gram_count is None:
+            return math.log(1 / (self.ngram_total + self.unigram_total))
+        if self.chars:
+            context = ngram[:self.n - 1]
+        else:
+            context = ngram.rpartition(self.split_by)[0]
+        return math.log(n_gram_count / self.get_context_count(context))
+
+    def evaluate_leading(self, first_ngram):
+        """
+        Returns the log probabilities of the leading parts of the text's first ngram (its first token, its first
+        two tokens and so on), by the estimated counts of the ngrams starting with the leading parts' strings.
+            Args:
+                first_ngram (str): the first ngram of the evaluated text.
+            Return:
+                (list): the log probabilities, in order.
+        """
+        tokens = self.split_to_unigrams(first_ngram)
+        probs = []
+        for i in range(1, self.n):
+            denominator = self.ngram_total if len(tokens[:i]) == 1 else self.count_occure(
+                self.split_by.join(tokens[:i - 1]))
+            probs.append(math.log(self.count_occure(self.split_by.join(tokens[:i])) / denominator))
+        return probs
@@ -0,0 +1,76 @@
+import copy
+import unittest
+
+import numpy as np
+
+import ex1
+import char_lm
+import benchmark
+
+
+class Test_Dense_Char_Language_Model(unittest.TestCase):
+    """Checks the dense character model against the dictionary based one.
+    """
+
+    def setUp(self):
+        self.text = benchmark.synthetic_prose(20000)
+
+    def build(self, n):
+        """Builds a dictionary based model and a dense model of the text"""
+        reference = ex1.Ngram_Language_Model(n=n, chars=True)
+        reference.build_model(self.text)
+        lm = char_lm.Dense_Char_Language_Model(n=n)
+        lm.build_model(self.text)
+        return reference, lm
+
+    def test_updates(self):
+        reference, lm = self.build(4)
+        for text in ("the cat sat", "a new text: qzx", "the cat sat"):
+            reference.update(text)
+            lm.update(text)
+        reference.retract("the cat sat")
+        lm.retract("the cat sat")
+        self.assertEqual(lm.get_model_dictionary(), {key: count for key, count in reference.model_dict.items()
+                                                     if count})
+        self.assertEqual((lm.ngram_total, lm.unigram_total), (reference.ngram_total, reference.unigram_total))
+        self.assertRaises(ValueError, lm.retract, "qzxqzx")
+        self.assertRaises(ValueError, lm.retract, "\u2603")
+
+    def test_evaluate(self):
+        reference, lm = self.build(3)
+        texts = [self.text[i:i + 40] for i in range(0, 4000, 97)] + ["ab", "a", self.text[:5] + "\u2603"]
+        self.assertRaises(ValueError, lm.evaluate, "\u2603" + self.text[:5])
+        scores = lm.evaluate_many(texts)
+        self.assertIsInstance(scores, np.ndarray)
+        for text, score in zip(texts, scores):
+            self.assertAlmostEqual(score, reference.evaluate(text), places=9, msg=text)
+            self.assertAlmostEqual(lm.evaluate(text), reference.evaluate(text), places=9, msg=text)
+
+    def test_evaluate_is_cached(self):
+        _, lm = self.build(3)
+        lm.set_cache(texts=16)
+        text = self.text[:40]
+        score = lm.evaluate(text)
+        self.assertEqual(lm.evaluate(text), score)
+        self.assertEqual(lm.get_cache_stats()["texts"]["hits"], 1)
+        lm.update(text * 20)
+        self.assertGreater(lm.evaluate(text), score)
+        self.assertEqual(lm.get_cache_stats()["texts"]["hits"], 1)
+
+    def test_prune(self):
+        for n in (1, 3):
+            reference, lm = self.build(n)
+            for min_counts, top_k in ((2, None), ({1: 5, n: 3}, None), (None, 2)):
+                pruned, dense = copy.deepcopy(reference), copy.deepcopy(lm)
+                self.assertEqual(dense.prune(min_counts=min_counts, top_k=top_k),
+                                 pruned.prune(min_counts=min_counts, top_k=top_k))
+                kept = {key: count for key, count in pruned.model_dict.items() if count}
+                if top_k is None:
+                    self.assertEqual(dense.get_model_dictionary(), kept)
+                self.assertEqual((dense.ngram_total, dense.unigram_total),
+                                 (sum(kept.values()), sum(pruned.unigram_dict.values())))
+                self.assertEqual(dense.memory_usage(), lm.memory_usage())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+import ex1
+import benchmark
+
+
+class Test_Decoding(unittest.TestCase):
+    """Checks the decoding strategies of generate() and beam_search(), and the memory they keep.
+    """
+
+    def setUp(self):
+        self.lm = ex1.Ngram_Language_Model(n=2)
+        self.lm.build_model(benchmark.synthetic_corpus(50000))
+
+    def test_tempered_weights_are_bounded(self):
+        rng = random.Random(0)
+        for _ in range(3 * ex1.TEMPERED_WEIGHTS_SIZE):
+            self.lm.generate("w1", 3, temperature=0.5 + rng.random())
+        self.assertLessEqual(len(self.lm.tempered_weights.entries), ex1.TEMPERED_WEIGHTS_SIZE)
+
+    def test_greedy_decoding_agrees(self):
+        greedy = self.lm.generate("w1", 10, temperature=0)
+        self.assertEqual(self.lm.generate("w1", 10, top_k=1), greedy)
+        self.assertEqual(self.lm.beam_search("w1", 10, beam_width=1), greedy)
+
+    def test_temperature_sharpens_the_distribution(self):
+        tokens, counts, _ = self.lm.get_continuations("w1")
+        random.seed(0)
+        draws = [self.lm.sample_truncated("w1", temperature=0.25) for _ in range(2000)]
+        expected = counts[0] ** 4 / sum(count ** 4 for count in counts)
+        self.assertAlmostEqual(draws.count(tokens[0]) / len(draws), expected, delta=0.05)
+
+    def test_update_invalidates_continuations(self):
+        self.lm.generate("w1", 3, temperature=0.5)
+        self.lm.update(" ".join(["w1 zzz"] * 1000))
+        self.assertEqual(self.lm.generate("w1", 2, temperature=0.01), "w1 zzz")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import ex1
+import disk_lm
+import benchmark
+
+
+class Test_Disk_Language_Model(unittest.TestCase):
+    """Checks the disk based model against the dictionary based one, with spills and merges of many runs.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def build(self, text, n=3, chars=False, **kwargs):
+        """Builds a dictionary based model and a disk based model of a text"""
+        reference = ex1.Ngram_Language_Model(n=n, chars=chars)
+        reference.build_model(text)
+        lm = disk_lm.Disk_Ngram_Language_Model(os.path.join(self.path, "model"), n=n, chars=chars, **kwargs)
+        lm.build_model(text)
+        return reference, lm
+
+    def assert_equivalent(self, reference, lm, texts):
+        self.assertEqual(lm.get_model_dictionary(), {key: count for key, count in reference.model_dict.items()
+                                                     if count})
+        self.assertEqual((lm.ngram_total, lm.unigram_total), (reference.ngram_total, reference.unigram_total))
+        for text in texts:
+            try:
+                expected = reference.evaluate(text)
+            except ValueError:
+                self.assertRaises(ValueError, lm.evaluate, text)
+                continue
+            self.assertEqual(lm.evaluate(text), expected, text)
+
+    def test_multi_level_merge(self):
+        text = benchmark.synthetic_corpus(100000)
+        for fan_in in (2, 3):
+            shutil.rmtree(os.path.join(self.path, "model"), ignore_errors=True)
+            reference, lm = self.build(text, max_entries=500, block_size=32, fan_in=fan_in)
+            self.assert_equivalent(reference, lm, benchmark.held_out_texts(5000, seed=1))
+            self.assertEqual(lm.runs, [])
+            self.assertFalse([name for name in os.listdir(lm.path) if name.startswith("run")])
+
+    def test_merge_fan_in_is_bounded(self):
+        merged = []
+        merge_files = disk_lm.merge_files
+
+        def recording_merge_files(sources, path):
+            merged.append(len(sources))
+            merge_files(sources, path)
+
+        disk_lm.merge_files = recording_merge_files
+        try:
+            lm = disk_lm.Disk_Ngram_Language_Model(self.path, n=2, max_entries=50, fan_in=4)
+            lm.build_model(benchmark.synthetic_corpus(50000))
+        finally:
+            disk_lm.merge_files = merge_files
+        self.assertTrue(merged)
+        self.assertLessEqual(max(merged), 4)
+
+    def test_short_texts_and_updates(self):
+        reference, lm = self.build("a cat sat on the mat", max_entries=4, fan_in=2)
+        for text in ("a dog", "the cat sat on a mat", "x"):
+            reference.update(text)
+            lm.update(text)
+        reference.retract("a dog")
+        lm.retract("a dog")
+        self.assert_equivalent(reference, lm, ["a cat sat", "the cat", "a", "dog sat on"])
+
+    def test_deferred_merge(self):
+        text = benchmark.synthetic_corpus(20000)
+        reference, lm = self.build(text, max_entries=100, fan_in=2)
+        merges = []
+        merge_runs = lm.merge_runs
+        lm.merge_runs = lambda: merges.append(1) or merge_runs()
+        updates = benchmark.held_out_texts(2000, seed=2)
+        with lm.deferred_merge():
+            for update in updates:
+                lm.update(update)
+                reference.update(update)
+        self.assertEqual(len(merges), 1)
+        self.assert_equivalent(reference, lm, updates[:20])
+
+    def test_prune(self):
+        text = benchmark.synthetic_corpus(30000)
+        # the disk model does not keep the unigrams, so the ones of the reference are not pruned
+        for min_counts, top_k in (({3: 2}, None), ({2: 2, 3: 3}, None), (None, 2)):
+            shutil.rmtree(os.path.join(self.path, "model"), ignore_errors=True)
+            reference, lm = self.build(text, max_entries=500, fan_in=3)
+            reference.build_model("a b")
+            lm.build_model("a b")
+            dropped = reference.prune(min_counts=min_counts, top_k=top_k)
+            self.assertEqual(lm.prune(min_counts=min_counts, top_k=top_k), dropped)
+            kept = {key: count for key, count in reference.model_dict.items() if count}
+            if top_k is None:
+                self.assertEqual(lm.get_model_dictionary(), kept)
+            self.assertEqual(lm.ngram_total, sum(kept.values()))
+            reopened = disk_lm.Disk_Ngram_Language_Model.open(lm.path)
+            self.assertEqual((reopened.get_model_dictionary(), reopened.ngram_total),
+                             (lm.get_model_dictionary(), lm.ngram_total))
+
+    def test_reopen_and_pickle(self):
+        reference, lm = self.build(benchmark.synthetic_corpus(20000), max_entries=300, fan_in=2)
+        reopened = disk_lm.Disk_Ngram_Language_Model.open(lm.path)
+        self.assertEqual(reopened.fan_in, 2)
+        self.assertEqual(reopened.get_model_dictionary(), lm.get_model_dictionary())
+        self.assertEqual(pickle.loads(pickle.dumps(lm)).get_model_dictionary(), lm.get_model_dictionary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import pickle
+import unittest
+
+import ex1
+
+TEXT = "a cat sat on the mat . a cat sat on a mat"
+
+
+class Test_Instrumentation(unittest.TestCase):
+    """Checks the counters of Model_Instrumentation, and that an instrumented model is restored when it stops.
+    """
+
+    def setUp(self):
+        self.lm = ex1.Ngram_Language_Model(n=3)
+        self.lm.build_model(TEXT)
+        self.lm.set_cache(texts=4)
+
+    def test_counters(self):
+        self.lm.enable_instrumentation()
+        self.lm.evaluate("a cat sat on")
+        self.lm.evaluate("a cat sat on")
+        stats = self.lm.get_instrumentation_stats()
+        evaluate = stats["evaluate"]
+        self.assertEqual(evaluate["calls"], 2)
+        self.assertGreater(evaluate["seconds"], 0.0)
+        # the leading parts take 3 prefix counts, and each of the 2 ngrams a count and a context count
+        self.assertEqual(evaluate["lookups"], 7)
+        self.assertEqual((stats["count_occure"]["calls"], stats["get_ngram_count"]["calls"],
+                          stats["get_context_count"]["calls"]), (3, 2, 2))
+        # the prefix index is built by the first count, and the second call is answered by the text cache
+        self.assertEqual(evaluate["scans"], 1)
+        self.assertEqual((evaluate["cache_hits"], evaluate["cache_misses"]), (1, 3))
+        self.assertEqual(evaluate["cache_hit_rate"], 0.25)
+
+    def test_instrumented_block(self):
+        self.lm.evaluate("a cat sat on")
+        with self.lm.instrumented() as stats:
+            self.lm.update("the cat sat")
+            self.lm.generate("a cat", 3)
+        self.assertEqual(set(stats) & set(ex1.INSTRUMENTED_METHODS), {"update", "generate"})
+        self.assertEqual(stats["update"]["calls"], 1)
+        self.assertIsNone(self.lm.instrumentation)
+        self.assertFalse(set(ex1.INSTRUMENTED_METHODS + ex1.LOOKUP_METHODS) & set(vars(self.lm)))
+
+    def test_disable_and_pickle(self):
+        self.lm.enable_instrumentation()
+        self.lm.evaluate("a cat sat on")
+        copied = pickle.loads(pickle.dumps(self.lm))
+        self.assertIsNone(copied.instrumentation)
+        self.assertEqual(copied.evaluate("a cat sat on"), self.lm.evaluate("a cat sat on"))
+        self.assertEqual(self.lm.disable_instrumentation()["evaluate"]["calls"], 2)
+        self.assertIsNone(self.lm.get_instrumentation_stats())
+        self.assertFalse(set(ex1.INSTRUMENTED_METHODS + ex1.LOOKUP_METHODS) & set(vars(self.lm)))
+
+
+if __name__ == "__main__":
+    unittest.main()
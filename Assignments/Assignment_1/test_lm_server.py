@@ -0,0 +1,123 @@
+import json
+import asyncio
+import unittest
+
+import ex1
+import lm_server
+
+TEXT = "a cat sat on the mat . a fat cat sat on the mat . a rat sat on the cat . the rat sat on the mat ."
+
+
+class Test_LM_Server(unittest.TestCase):
+    """Runs a server with its model in a single thread, and checks its responses to valid and invalid requests.
+    """
+
+    def setUp(self):
+        self.lm = ex1.Ngram_Language_Model(n=3)
+        self.lm.build_model(TEXT)
+
+    def serve(self, scenario):
+        """Runs a coroutine function of the server's host and port against a started server"""
+
+        async def run():
+            server = lm_server.LM_Server(self.lm, workers=0)
+            await server.start(port=0)
+            try:
+                return await scenario(*server.get_address())
+            finally:
+                await server.stop()
+
+        return asyncio.run(run())
+
+    def raw_request(self, head, body=b""):
+        """Sends raw request bytes, and returns the response's status and JSON object"""
+
+        async def scenario(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(head.encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            headers = await lm_server.read_headers(reader)
+            response = await reader.readexactly(int(headers["content-length"]))
+            writer.close()
+            return int(status_line.split()[1]), json.loads(response)
+
+        return self.serve(scenario)
+
+    def request(self, method, path, payload=None):
+        """Sends a request by LM_Client, and returns the response's status and JSON object"""
+
+        async def scenario(host, port):
+            client = lm_server.LM_Client(host, port)
+            try:
+                return await client.request(method, path, payload)
+            finally:
+                await client.close()
+
+        return self.serve(scenario)
+
+    def test_evaluate(self):
+        status, response = self.request("POST", "/evaluate", {"text": "a cat sat on the mat"})
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(response["score"], self.lm.evaluate("a cat sat on the mat"))
+
+    def test_invalid_content_length(self):
+        for length in ("abc", "-1", "1.5", "\xb2"):
+            status, response = self.raw_request("POST /evaluate HTTP/1.1\r\nContent-Length: %s\r\n\r\n" % length)
+            self.assertEqual(status, 400, length)
+
+    def test_oversized_body(self):
+        status, _ = self.raw_request("POST /evaluate HTTP/1.1\r\nContent-Length: %d\r\n\r\n"
+                                     % (lm_server.MAX_BODY_SIZE + 1))
+        self.assertEqual(status, 413)
+
+    def test_malformed_request_line(self):
+        status, _ = self.raw_request("GARBAGE\r\n\r\n")
+        self.assertEqual(status, 400)
+
+    def test_oversized_head(self):
+        for head in ("GET /health%s HTTP/1.1\r\n\r\n" % ("x" * (1 << 17)),
+                     "GET /health HTTP/1.1\r\nX-Padding: %s\r\n\r\n" % ("x" * (1 << 17)),
+                     "GET /health HTTP/1.1\r\n%s\r\n" % ("X-Header: x\r\n" * (lm_server.MAX_HEADERS + 1))):
+            status, _ = self.raw_request(head)
+            self.assertEqual(status, 431)
+        status, _ = self.raw_request("GET /health HTTP/1.1\r\n%s\r\n" % ("X-Header: x\r\n" * lm_server.MAX_HEADERS))
+        self.assertEqual(status, 200)
+
+    def test_batches_in_flight_are_bounded(self):
+        scoring = []
+
+        async def score(texts):
+            scoring.append(scoring[-1] + 1 if scoring else 1)
+            await asyncio.sleep(0.01)
+            scoring.append(scoring[-1] - 1)
+            return [[len(text), None] for text in texts]
+
+        async def scenario():
+            batcher = lm_server.Score_Batcher(score, max_batch=2, max_delay=0, max_scoring=3)
+            batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.submit(["x" * i]) for i in range(40)))
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results, [[[i, None]] for i in range(40)])
+        self.assertEqual(max(scoring), 3)
+
+    def test_generate_validation(self):
+        for payload in ({"n": lm_server.MAX_GENERATE_LENGTH + 1}, {"n": -1}, {"n": True}, {"n": 2.5},
+                        {"temperature": float("nan")}, {"temperature": float("inf")}, {"temperature": -1},
+                        {"temperature": lm_server.MAX_TEMPERATURE * 2}, {"top_p": 0}, {"top_k": 0},
+                        {"beam_width": lm_server.MAX_BEAM_WIDTH + 1}, {"beam_width": 1.5}):
+            status, _ = self.request("POST", "/generate", dict(payload, context="a cat"))
+            self.assertEqual(status, 400, payload)
+
+    def test_generate(self):
+        status, response = self.request("POST", "/generate", {"context": "a cat", "n": 5, "temperature": 0})
+        self.assertEqual(status, 200)
+        self.assertEqual(response["text"], self.lm.generate("a cat", 5, temperature=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
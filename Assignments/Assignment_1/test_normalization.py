@@ -0,0 +1,48 @@
+import time
+import random
+import unittest
+
+import ex1
+import benchmark
+
+
+class Test_Normalization(unittest.TestCase):
+    """Checks normalize_text() against the normalization it replaced, and its time on adversarial input.
+    """
+
+    def test_matches_legacy_normalization(self):
+        rng = random.Random(0)
+        characters = "abcdeilmnorstuvwy' .,!?-AIY\n"
+        contractions = list(ex1.CONTRACTIONS.keys())
+        for _ in range(5000):
+            text = "".join(rng.choice(characters) for _ in range(rng.randint(0, 40)))
+            if rng.random() < 0.5:
+                text += " %s%s x" % (rng.choice(contractions), rng.choice(["", "s", "'"]))
+            self.assertEqual(ex1.normalize_text(text), benchmark.legacy_normalize_text(text), text)
+
+    def test_normalize_stream_matches_normalize_text(self):
+        lines = benchmark.synthetic_prose(20000).splitlines(keepends=True)
+        expected = list(map(ex1.normalize_text, lines))
+        self.assertEqual(list(ex1.TEXT_NORMALIZER.normalize_stream(lines)), expected)
+        self.assertEqual(list(ex1.TEXT_NORMALIZER.normalize_stream(lines, workers=2, batch_size=64)), expected)
+
+    def test_long_run_without_contraction_is_linear(self):
+        # a run of the contractions' characters must not be rescanned from each of its positions. The time of a
+        # run 4 times as long is compared rather than an absolute time, so a slow machine does not fail the test:
+        # a linear normalization takes about 4 times as long, a quadratic one about 16 times.
+        def best_time(text):
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                ex1.normalize_text(text)
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        for make_run in (lambda size: "a" * size + " '", lambda size: "'" + " a" * (size // 2),
+                         lambda size: "ain" * (size // 3)):
+            text = make_run(40000)
+            self.assertEqual(ex1.normalize_text(text), benchmark.legacy_normalize_text(text))
+            self.assertLess(best_time(make_run(160000)) / best_time(text), 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import math
+import unittest
+
+import ex1
+import benchmark
+
+
+class Test_All_Orders(unittest.TestCase):
+    """Checks the counts of the lower orders kept by a model built with all_orders=True, and the denominators of
+    the leading parts of a text, which are taken from the order below each part.
+    """
+
+    def setUp(self):
+        self.texts = [benchmark.synthetic_corpus(20000), benchmark.synthetic_corpus(5000, seed=1)]
+
+    def build(self, n, all_orders=True):
+        lm = ex1.Ngram_Language_Model(n=n, all_orders=all_orders)
+        for text in self.texts:
+            lm.build_model(text)
+        return lm
+
+    def test_order_counts(self):
+        lm = self.build(4)
+        for order in (1, 2, 3, 4):
+            self.assertEqual(dict(lm.order_dicts[order]), dict(self.build(order, all_orders=False).model_dict))
+
+    def test_leading_denominators(self):
+        lm = self.build(4)
+        orders = {order: self.build(order, all_orders=False).model_dict for order in (1, 2, 3)}
+        corpus = self.texts[0].split(" ")
+        for start in range(0, len(corpus) - 4, len(corpus) // 50):
+            tokens = corpus[start:start + 4]
+            expected = [math.log(orders[1][tokens[0]] / lm.unigram_total)]
+            expected += [math.log(orders[order][" ".join(tokens[:order])] / orders[order - 1][" ".join(
+                tokens[:order - 1])]) for order in (2, 3)]
+            self.assertEqual(lm.evaluate_leading(" ".join(tokens[:4])), expected)
+
+    def test_updates_keep_the_orders(self):
+        lm = self.build(3)
+        update = benchmark.held_out_texts(1000, seed=3)[0]
+        lm.update(update)
+        lm.retract(self.texts[1])
+        self.texts = [self.texts[0], update]
+        for order in (1, 2, 3):
+            expected = self.build(order, all_orders=False).model_dict
+            self.assertEqual({key: count for key, count in lm.order_dicts[order].items() if count}, dict(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import copy
+import shutil
+import tempfile
+import unittest
+
+import ex1
+import packed_lm
+import benchmark
+
+
+class Test_Packed_Language_Model(unittest.TestCase):
+    """Checks the packed model against the dictionary based one, built, updated, saved and loaded.
+    """
+
+    def setUp(self):
+        self.text = benchmark.synthetic_corpus(50000)
+        self.texts = benchmark.held_out_texts(5000, seed=3) + ["w1", "w1 w2", "w", "zzz w1 w2"]
+
+    def assert_equivalent(self, reference, lm):
+        self.assertEqual(lm.get_model_dictionary(), {key: count for key, count in reference.model_dict.items()
+                                                     if count and len(reference.split_to_unigrams(key)) == lm.n})
+        self.assertEqual((lm.ngram_total, lm.unigram_total), (reference.ngram_total, reference.unigram_total))
+        for text in self.texts:
+            try:
+                expected = reference.evaluate(text)
+            except ValueError:
+                self.assertRaises(ValueError, lm.evaluate, text)
+                continue
+            self.assertAlmostEqual(lm.evaluate(text), expected, places=9, msg=text)
+        for prefix in ("", "w1", "w1 ", "w1 w2", "w12 w7", "zzz"):
+            self.assertEqual(lm.count_occure(prefix), reference.count_occure(prefix), prefix)
+        for context in list(reference.context_dict)[:50]:
+            self.assertEqual(lm.get_markov_n_minus_dict(context), dict(reference.get_markov_n_minus_dict(context)))
+
+    def test_from_model_and_build(self):
+        for n in (1, 2, 3, 4):
+            reference = ex1.Ngram_Language_Model(n=n)
+            reference.build_model(self.text)
+            self.assert_equivalent(reference, packed_lm.Packed_Ngram_Language_Model.from_model(reference))
+            built = packed_lm.Packed_Ngram_Language_Model(n=n)
+            built.build_model(self.text)
+            self.assert_equivalent(reference, built)
+
+    def test_evaluate_many(self):
+        reference = ex1.Ngram_Language_Model(n=3)
+        reference.build_model(self.text)
+        lm = packed_lm.Packed_Ngram_Language_Model.from_model(reference)
+        texts, expected = [], []
+        for text in self.texts[:300]:
+            try:
+                expected.append(reference.evaluate(text))
+                texts.append(text)
+            except ValueError:
+                pass
+        for score, reference_score in zip(lm.evaluate_many(texts), expected):
+            self.assertAlmostEqual(score, reference_score, places=9)
+
+    def test_updates(self):
+        reference = ex1.Ngram_Language_Model(n=3)
+        reference.build_model(self.text)
+        lm = packed_lm.Packed_Ngram_Language_Model.from_model(reference)
+        for text in ("w1 w2 w3 w4", "new tokens here w1", "w5 w6 w7"):
+            reference.update(text)
+            lm.update(text)
+        reference.retract("w1 w2 w3 w4")
+        lm.retract("w1 w2 w3 w4")
+        self.assert_equivalent(reference, lm)
+
+    def test_prune(self):
+        reference = ex1.Ngram_Language_Model(n=3)
+        reference.build_model(self.text)
+        for min_counts, top_k in ((2, None), ({1: 2, 3: 3}, None), (None, 2)):
+            pruned = copy.deepcopy(reference)
+            lm = packed_lm.Packed_Ngram_Language_Model.from_model(reference)
+            self.assertEqual(lm.prune(min_counts=min_counts, top_k=top_k),
+                             pruned.prune(min_counts=min_counts, top_k=top_k))
+            kept = {key: count for key, count in pruned.model_dict.items() if count}
+            if top_k is None:
+                self.assertEqual(lm.get_model_dictionary(), kept)
+            self.assertEqual(lm.ngram_total, sum(kept.values()))
+            self.assertEqual(lm.unigram_total, sum(pruned.unigram_dict.values()))
+            for context in list(pruned.context_dict)[:50]:
+                self.assertLessEqual(len(lm.get_markov_n_minus_dict(context)), top_k or len(lm.keys))
+
+    def test_save_and_load(self):
+        reference = ex1.Ngram_Language_Model(n=3)
+        reference.build_model(self.text)
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "model.bin")
+            packed_lm.save_model(reference, path)
+            for mmap in (True, False):
+                lm = packed_lm.load_model(path, mmap=mmap)
+                self.assert_equivalent(reference, lm)
+                del lm
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
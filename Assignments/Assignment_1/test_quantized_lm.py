@@ -0,0 +1,113 @@
+import os
+import random
+import pickle
+import tempfile
+import unittest
+
+import ex1
+import packed_lm
+import quantized_lm
+
+TEXT = "a cat sat on the mat . a fat cat sat on the mat . a rat sat on the mat . the rat sat on the cat . a bat " \
+       "spat on the rat that sat on the cat on the mat ."
+
+
+def random_texts(tokens, number, seed=0):
+    """Returns random texts of 1 to 8 tokens, of the tokens and of some prefixes of the tokens"""
+    rng = random.Random(seed)
+    tokens = sorted(tokens) + sorted({token[:-1] for token in tokens if len(token) > 1}) + ["zzz"]
+    return [" ".join(rng.choice(tokens) for _ in range(rng.randint(1, 8))) for _ in range(number)]
+
+
+class Test_Quantized_Scoring_Model(unittest.TestCase):
+    """Checks that the quantized model scores texts within its error bound of the exported model, and fails to
+    score the same texts.
+    """
+
+    def assert_scores_within_bound(self, lm, quantized, texts):
+        for text in texts:
+            try:
+                expected = lm.evaluate(text)
+            except (ValueError, IndexError):
+                # the exported model cannot score the texts shorter than n whose ngrams were counted as unigrams
+                continue
+            self.assertLessEqual(abs(quantized.evaluate(text) - expected), quantized.score_error_bound(text) + 1e-9,
+                                 text)
+
+    def assert_same_failures(self, lm, quantized, texts):
+        for text in texts:
+            try:
+                lm.evaluate(text)
+            except ValueError:
+                self.assertRaises(ValueError, quantized.evaluate, text)
+
+    def test_dictionary_models(self):
+        texts = random_texts(TEXT.split(" "), 500)
+        for n in (1, 2, 3, 4):
+            for all_orders in (False, True):
+                lm = ex1.Ngram_Language_Model(n=n, all_orders=all_orders)
+                lm.build_model(TEXT)
+                for bits in (8, 16):
+                    quantized = quantized_lm.Quantized_Scoring_Model.from_model(lm, bits)
+                    report = quantized.export_report
+                    self.assertLessEqual(report["max_log_prob_error"], report["log_prob_error_bound"] + 1e-12)
+                    self.assertEqual(report["memory_saved"], lm.memory_usage() - quantized.memory_usage())
+                    self.assert_scores_within_bound(lm, quantized, texts)
+                    self.assert_same_failures(lm, quantized, texts)
+
+    def test_lower_orders_of_all_orders_models(self):
+        # the last tokens of the text are counted among the lower orders only, as no ngram starts with them
+        for n, text in ((2, "end zzz"), (3, "end zzz"), (3, ". end zzz"), (4, "mat . end"), (4, ". end zzz")):
+            lm = ex1.Ngram_Language_Model(n=n, all_orders=True)
+            lm.build_model(TEXT + " end")
+            quantized = quantized_lm.Quantized_Scoring_Model.from_model(lm, 16)
+            self.assertLessEqual(abs(quantized.evaluate(text) - lm.evaluate(text)), quantized.score_error_bound(text))
+
+    def test_models_built_from_short_texts(self):
+        lm = ex1.Ngram_Language_Model(n=3)
+        lm.build_model("a cat sat on the mat")
+        lm.build_model("a dog")
+        quantized = quantized_lm.Quantized_Scoring_Model.from_model(lm)
+        self.assertEqual(quantized.export_report["ngrams"], 4)
+        self.assert_scores_within_bound(lm, quantized, random_texts(["a", "cat", "sat", "on", "the", "mat", "dog"],
+                                                                    300))
+
+    def test_character_models(self):
+        lm = ex1.Ngram_Language_Model(n=4, chars=True)
+        lm.build_model(TEXT)
+        quantized = quantized_lm.Quantized_Scoring_Model.from_model(lm, 16)
+        texts = [text for text in random_texts(TEXT.split(" "), 300) if len(text) >= 4]
+        self.assert_scores_within_bound(lm, quantized, texts)
+        self.assert_same_failures(lm, quantized, texts)
+
+    def test_packed_models(self):
+        lm = ex1.Ngram_Language_Model(n=3)
+        lm.build_model(TEXT)
+        packed = packed_lm.Packed_Ngram_Language_Model.from_model(lm)
+        quantized = quantized_lm.Quantized_Scoring_Model.from_model(packed, 16)
+        self.assert_scores_within_bound(lm, quantized, random_texts(TEXT.split(" "), 300))
+
+    def test_save_load_and_pickle(self):
+        lm = ex1.Ngram_Language_Model(n=3)
+        lm.build_model(TEXT)
+        quantized = quantized_lm.Quantized_Scoring_Model.from_model(lm)
+        path = os.path.join(tempfile.mkdtemp(), "model.npz")
+        quantized.save(path)
+        loaded = quantized_lm.Quantized_Scoring_Model.load(path)
+        os.remove(path)
+        copied = pickle.loads(pickle.dumps(quantized))
+        for text in ("a cat sat on the mat", "the rat", "a cat zzz"):
+            self.assertEqual(loaded.evaluate(text), quantized.evaluate(text))
+            self.assertEqual(copied.evaluate(text), quantized.evaluate(text))
+        self.assertEqual(loaded.export_report, quantized.export_report)
+
+    def test_invalid_exports(self):
+        lm = ex1.Ngram_Language_Model(n=3, all_orders=True)
+        lm.build_model(TEXT)
+        self.assertRaises(ValueError, quantized_lm.Quantized_Scoring_Model.from_model, lm, 4)
+        lm.finalize()
+        self.assertRaises(ValueError, quantized_lm.Quantized_Scoring_Model.from_model, lm)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import pickle
+import unittest
+
+import ex1
+import shared_lm
+import benchmark
+
+
+class Test_Shared_Model(unittest.TestCase):
+    """Checks that views of a published model score as the model does, in this process and in workers, that only
+    unchanged views are pickled, and that the block is freed by unlink().
+    """
+
+    def setUp(self):
+        self.lm = ex1.Ngram_Language_Model(n=3)
+        text = benchmark.synthetic_corpus(20000)
+        self.lm.build_model(text)
+        tokens = text.split(" ")
+        self.texts = [" ".join(tokens[start:start + 10]) for start in range(0, len(tokens) - 10, 50)]
+
+    def test_attach_and_unlink(self):
+        with shared_lm.Shared_Model(self.lm) as shared:
+            name = shared.name
+            self.assertIn(name, shared_lm.published_names)
+            view = shared.attach()
+            self.assertFalse(view.keys.flags.writeable)
+            self.assertEqual(view.get_model_dictionary(), {key: count for key, count in self.lm.model_dict.items()
+                                                           if count})
+            for text in self.texts:
+                self.assertAlmostEqual(view.evaluate(text), self.lm.evaluate(text), places=9)
+            del view
+        self.assertNotIn(name, shared_lm.published_names)
+        self.assertRaises(FileNotFoundError, shared_lm.attach_model, name)
+
+    def test_pickle_attaches(self):
+        with shared_lm.Shared_Model(self.lm) as shared:
+            view = shared.attach()
+            data = pickle.dumps(view)
+            self.assertLess(len(data), 200)  # the block's name rather than the model
+            copied = pickle.loads(data)
+            self.assertEqual(copied.shared_memory.name, shared.name)
+            self.assertEqual(list(copied.evaluate_many(self.texts)), list(view.evaluate_many(self.texts)))
+            # the workers receive the pickled view
+            self.assertEqual(list(view.evaluate_many(self.texts, workers=2)), list(view.evaluate_many(self.texts)))
+            del view, copied
+
+    def test_changed_view_is_not_pickled(self):
+        with shared_lm.Shared_Model(self.lm) as shared:
+            view = shared.attach()
+            view.update("w1 w2 w3 new")
+            self.assertRaises(ValueError, pickle.dumps, view)
+            # the block is unchanged, and so are the other views
+            other = shared.attach()
+            self.assertEqual(other.get_ngram_count("w2 w3 new"), None)
+            self.assertEqual(view.get_ngram_count("w2 w3 new"), 1)
+            pickle.dumps(other)
+            del view, other
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import ex1
+import sketch
+import benchmark
+
+
+class Test_Sketch_Scoring_Model(unittest.TestCase):
+    """Checks that sketches wide enough to avoid collisions score texts as the dictionary based model does.
+    """
+
+    def setUp(self):
+        self.text = benchmark.synthetic_corpus(30000)
+        self.texts = benchmark.held_out_texts(3000, seed=4) + ["w1", "w1 w2"]
+
+    def assert_same_scores(self, reference, lm):
+        for text in self.texts:
+            try:
+                expected = reference.evaluate(text)
+            except ValueError:
+                self.assertRaises(ValueError, lm.evaluate, text)
+                continue
+            self.assertAlmostEqual(lm.evaluate(text), expected, places=9, msg=text)
+
+    def test_scores(self):
+        for n in (1, 2, 3):
+            for chars in (False, True):
+                reference = ex1.Ngram_Language_Model(n=n, chars=chars)
+                reference.build_model(self.text)
+                lm = sketch.Sketch_Scoring_Model(n=n, chars=chars)
+                lm.build_model(self.text)
+                self.assert_same_scores(reference, lm)
+
+    def test_updates(self):
+        reference = ex1.Ngram_Language_Model(n=3)
+        reference.build_model(self.text)
+        lm = sketch.Sketch_Scoring_Model(n=3)
+        lm.build_model(self.text)
+        for text in ("w1 w2 w3 w4", "new tokens here w1"):
+            reference.update(text)
+            lm.update(text)
+        reference.retract("w1 w2 w3 w4")
+        lm.retract("w1 w2 w3 w4")
+        self.assertEqual((lm.ngram_total, lm.unigram_total), (reference.ngram_total, reference.unigram_total))
+        self.assert_same_scores(reference, lm)
+        self.assertRaises(ValueError, lm.retract, "new tokens here w1 new tokens")
+
+    def test_memory_is_fixed(self):
+        lm = sketch.Sketch_Scoring_Model(n=3, width=1 << 10, depth=2)
+        memory = lm.memory_usage()
+        lm.build_model(self.text)
+        self.assertEqual(lm.memory_usage(), memory)
+
+
+if __name__ == "__main__":
+    unittest.main()
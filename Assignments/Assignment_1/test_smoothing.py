@@ -0,0 +1,56 @@
+import math
+import unittest
+
+import ex1
+import benchmark
+
+
+class Test_Smoothing(unittest.TestCase):
+    """Checks the tables computed by finalize(): Kneser-Ney probabilities are distributions over the vocabulary
+    and an unknown token, and stupid backoff falls back to the lower orders with a fixed weight.
+    """
+
+    def setUp(self):
+        self.lm = ex1.Ngram_Language_Model(n=3, all_orders=True)
+        self.lm.build_model(benchmark.synthetic_corpus(20000, vocabulary_size=300))
+        self.vocabulary = list(self.lm.unigram_dict.keys()) + ["<unknown>"]
+
+    def total_probability(self, context):
+        return sum(math.exp(self.lm.get_tokens_log_prob(context + [token])) for token in self.vocabulary)
+
+    def test_kneser_ney_sums_to_one(self):
+        for discount in (None, 0.5):
+            self.lm.finalize("kneser_ney", discount=discount)
+            self.assertAlmostEqual(self.total_probability([]), 1.0, places=9)
+            for order in (2, 3):
+                for n_gram in list(self.lm.order_dicts[order])[:20]:
+                    context = n_gram.split(" ")[:-1]
+                    self.assertAlmostEqual(self.total_probability(context), 1.0, places=9, msg=n_gram)
+            # an unseen context backs off to the distribution of its last tokens
+            self.assertAlmostEqual(self.total_probability(["<unknown>", "w1"]), 1.0, places=9)
+
+    def test_stupid_backoff_falls_back(self):
+        self.lm.finalize("stupid_backoff", alpha=0.4)
+        counts = self.lm.order_dicts
+        trigram = next(iter(counts[3]))
+        first, second, third = trigram.split(" ")
+        self.assertAlmostEqual(self.lm.get_backoff_log_prob(trigram),
+                               math.log(counts[3][trigram] / counts[2][first + " " + second]))
+
+        unseen = next(token for token in self.lm.unigram_dict if second + " " + token not in counts[2])
+        bigram = next(n_gram for n_gram in counts[2] if n_gram.startswith(second + " "))
+        self.assertAlmostEqual(self.lm.get_backoff_log_prob("<unknown> " + bigram),
+                               math.log(0.4) + math.log(counts[2][bigram] / counts[1][second]))
+        self.assertAlmostEqual(self.lm.get_backoff_log_prob(first + " " + second + " " + unseen),
+                               2 * math.log(0.4) + math.log(counts[1][unseen] / self.lm.unigram_total))
+        # an unknown token backs off past the unigrams
+        self.assertAlmostEqual(self.lm.get_backoff_log_prob(first + " " + second + " <unknown>"),
+                               3 * math.log(0.4) + math.log(self.lm.smooth("")))
+
+        text = first + " " + second + " " + unseen
+        self.assertAlmostEqual(self.lm.evaluate(text), sum(
+            self.lm.get_backoff_log_prob(ngram) for ngram in (first, first + " " + second, text)))
+
+
+if __name__ == "__main__":
+    unittest.main()
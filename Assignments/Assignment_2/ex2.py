@@ -1,5 +1,8 @@
 import re
+import sys
 import math
+import bisect
+import itertools
 import collections
 import nltk
 
@@ -409,7 +412,7 @@ class Spell_Checker:
         Return:
             (float): the prior probability
         """
-        vocabulary_size = sum(self.lm.unigram_dict.values())
+        vocabulary_size = self.lm.unigram_total
         occur_num = self.lm.count_occure(word)
         return occur_num / vocabulary_size
 
@@ -433,6 +436,11 @@ class Ngram_Language_Model:
             int)  # a dictionary of the form {ngram:count}, holding counts of all ngrams in the specified text.
         self.chars = chars
         self.unigram_dict = collections.defaultdict(int)
+        self.sorted_keys = None  # the model's keys in sorted order, None until the prefix index is (re)built.
+        self.cumulative_counts = None  # cumulative counts of the sorted keys, starting with 0.
+        self.context_totals = collections.defaultdict(int)  # a dictionary of the form {context:count}
+        self.ngram_total = 0  # running total of the ngram counts
+        self.unigram_total = 0  # running total of the unigram counts
         self.split_by = "" if self.chars else " "
 
     def split_to_unigrams(self, text):
@@ -469,6 +477,7 @@ class Ngram_Language_Model:
             Args:
                 text (str): the text to construct the model from.
         """
+        self.sorted_keys = None  # invalidate the prefix index
         n_grams_list = nltk.ngrams(nltk.word_tokenize(text), self.n)
         unigrams = nltk.ngrams(nltk.word_tokenize(text), 1)
 
@@ -477,12 +486,15 @@ class Ngram_Language_Model:
             n_gram_str = self.split_by.join(n_gram)
             occur_num = self.model_dict.setdefault(n_gram_str, 0)
             self.model_dict.update({n_gram_str: occur_num + 1})
+            self.context_totals[self.split_by.join(n_gram[:-1])] += 1
+            self.ngram_total += 1
 
         # build the unigram dictionary
         for unigram in unigrams:
             u_gram_str = self.split_by.join(unigram)
             occur_num = self.unigram_dict.setdefault(u_gram_str, 0)
             self.unigram_dict.update({u_gram_str: occur_num + 1})
+            self.unigram_total += 1
 
     def get_model_dictionary(self):
         """Returns the dictionary class object
@@ -515,6 +527,18 @@ class Ngram_Language_Model:
                 markov_options[mo_key] = self.model_dict.get(key)
         return markov_options
 
+    def get_context_count(self, context):
+        """
+        Returns the total count of the ngrams following the given context
+            Args:
+                context (str): the context
+            Return:
+                (int): the number of times the context was followed by a token in the model
+        """
+        if context in self.context_totals:
+            return self.context_totals[context]
+        return sum(self.get_markov_n_minus_dict(context).values())
+
     # def sample_context(self):
     #     """
     #     Samples a new context from the model's distribution
@@ -535,17 +559,28 @@ class Ngram_Language_Model:
 
     def count_occure(self, word):
         """
-        Returns the number of word occurrences in the model
+        Returns the number of word occurrences in the model, i.e. the total count of the ngrams starting with it.
+        The prefix index is (re)built lazily after the model changes.
             Args:
                 (str) ngram or a part of it
             Return:
                 (int) num of occurrences
         """
-        counter = 0
-        for key in self.model_dict.keys():
-            if word in key:
-                counter += self.model_dict.get(key, 0)
-        return counter
+        if self.sorted_keys is None:
+            self.build_prefix_index()
+        start = bisect.bisect_left(self.sorted_keys, word)
+        successor = prefix_successor(word)
+        end = len(self.sorted_keys) if successor is None else bisect.bisect_left(self.sorted_keys, successor, start)
+        return self.cumulative_counts[end] - self.cumulative_counts[start]
+
+    def build_prefix_index(self):
+        """
+        Sorts the model's keys and accumulates their counts, so the keys starting with a prefix form a
+        contiguous range and their total count is the difference of two cumulative counts.
+        """
+        self.sorted_keys = sorted(self.model_dict.keys())
+        self.cumulative_counts = list(itertools.accumulate((self.model_dict[key] for key in self.sorted_keys),
+                                                           initial=0))
 
     def evaluate(self, text):
         """Returns the log-likelihood of the specified text to be a product of the model.
@@ -559,8 +594,6 @@ class Ngram_Language_Model:
         """
         probs = []
         n_grams_list = self.split_to_n_grams(text)
-        unigrams_size = sum(self.unigram_dict.values())  # number of unigrams in total
-        ngram_size = sum(self.model_dict.values())
 
         first_ngram = n_grams_list[0]
         first_unigrams = [self.split_by.join(self.split_to_unigrams(first_ngram)[0:i]) for i in range(1, self.n)]
@@ -569,7 +602,7 @@ class Ngram_Language_Model:
             _ngram = ""
             _occur = self.count_occure(ngram)
             ngram_split = ngram.split(self.split_by)
-            denominator = ngram_size if len(ngram_split) == 1 else self.count_occure(
+            denominator = self.ngram_total if len(ngram_split) == 1 else self.count_occure(
                 self.split_by.join(ngram_split[:i]))
             _prob = _occur / denominator if _occur > 0 else self.smooth(ngram)
             log_prob = math.log(_prob)
@@ -578,7 +611,7 @@ class Ngram_Language_Model:
         for ngram in n_grams_list:
             n_gram_count = self.model_dict.get(ngram)
             partition = ngram[:self.n - 1] if self.chars else ngram.rpartition(self.split_by)[0]
-            n_minus_count = sum(self.get_markov_n_minus_dict(partition).values())
+            n_minus_count = self.get_context_count(partition)
             ngram_prob = self.smooth(ngram) if n_gram_count is None else n_gram_count / n_minus_count
             log_prob = math.log(ngram_prob)
             probs.append(log_prob)
@@ -592,10 +625,7 @@ class Ngram_Language_Model:
             Returns:
                 float. The smoothed probability.
         """
-
-        n_grams_size = sum(self.model_dict.values())  # total num of tokens in the dictionary
-        v = sum(self.unigram_dict.values())  # all words in corpus
-        return 1 / (n_grams_size + v)
+        return 1 / (self.ngram_total + self.unigram_total)
 
     def normalize_text(self, text):
         """Returns a normalized version of the specified string.
@@ -610,148 +640,232 @@ class Ngram_Language_Model:
           Returns:
             string. the normalized text.
         """
+        return normalize_text(text)
+
+
+def prefix_successor(prefix):
+    """
+    Returns the smallest string that is greater than all the strings starting with the given prefix
+        Args:
+            prefix (str): the prefix
+        Return:
+            (str): the successor of the prefix, or None if there is no such string.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if prefix == "":
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# The normalization below is a deliberate copy of Assignment_1's (ex1.py), like the language model above: each
+# assignment is submitted as a single self-contained file and cannot import the other. Changes to either copy must
+# be made to both, so the two assignments normalize texts identically.
+CONTRACTIONS = {
+        "ain't": "am not",
+        "aren't": "are not",
+        "can't": "cannot",
+        "can't've": "cannot have",
+        "'cause": "because",
+        "could've": "could have",
+        "couldn't": "could not",
+        "couldn't've": "could not have",
+        "didn't": "did not",
+        "doesn't": "does not",
+        "don't": "do not",
+        "hadn't": "had not",
+        "hadn't've": "had not have",
+        "hasn't": "has not",
+        "haven't": "have not",
+        "he'd": "he would",
+        "he'd've": "he would have",
+        "he'll": "he will",
+        "he'll've": "he will have",
+        "he's": "he is",
+        "how'd": "how did",
+        "how'd'y": "how do you",
+        "how'll": "how will",
+        "how's": "how is",
+        "I'd": "I would",
+        "I'd've": "I would have",
+        "I'll": "I will",
+        "I'll've": "I will have",
+        "I'm": "I am",
+        "I've": "I have",
+        "isn't": "is not",
+        "it'd": "it had",
+        "it'd've": "it would have",
+        "it'll": "it will",
+        "it'll've": "it will have",
+        "it's": "it is",
+        "let's": "let us",
+        "ma'am": "madam",
+        "mayn't": "may not",
+        "might've": "might have",
+        "mightn't": "might not",
+        "mightn't've": "might not have",
+        "must've": "must have",
+        "mustn't": "must not",
+        "mustn't've": "must not have",
+        "needn't": "need not",
+        "needn't've": "need not have",
+        "o'clock": "of the clock",
+        "oughtn't": "ought not",
+        "oughtn't've": "ought not have",
+        "shan't": "shall not",
+        "sha'n't": "shall not",
+        "shan't've": "shall not have",
+        "she'd": "she would",
+        "she'd've": "she would have",
+        "she'll": "she will",
+        "she'll've": "she will have",
+        "she's": "she is",
+        "should've": "should have",
+        "shouldn't": "should not",
+        "shouldn't've": "should not have",
+        "so've": "so have",
+        "so's": "so is",
+        "that'd": "that would",
+        "that'd've": "that would have",
+        "that's": "that is",
+        "there'd": "there had",
+        "there'd've": "there would have",
+        "there's": "there is",
+        "they'd": "they would",
+        "they'd've": "they would have",
+        "they'll": "they will",
+        "they'll've": "they will have",
+        "they're": "they are",
+        "they've": "they have",
+        "to've": "to have",
+        "wasn't": "was not",
+        "we'd": "we had",
+        "we'd've": "we would have",
+        "we'll": "we will",
+        "we'll've": "we will have",
+        "we're": "we are",
+        "we've": "we have",
+        "weren't": "were not",
+        "what'll": "what will",
+        "what'll've": "what will have",
+        "what're": "what are",
+        "what's": "what is",
+        "what've": "what have",
+        "when's": "when is",
+        "when've": "when have",
+        "where'd": "where did",
+        "where's": "where is",
+        "where've": "where have",
+        "who'll": "who will",
+        "who'll've": "who will have",
+        "who's": "who is",
+        "who've": "who have",
+        "why's": "why is",
+        "why've": "why have",
+        "will've": "will have",
+        "won't": "will not",
+        "won't've": "will not have",
+        "would've": "would have",
+        "wouldn't": "would not",
+        "wouldn't've": "would not have",
+        "y'all": "you all",
+        "y'alls": "you alls",
+        "y'all'd": "you all would",
+        "y'all'd've": "you all would have",
+        "y'all're": "you all are",
+        "y'all've": "you all have",
+        "you'd": "you had",
+        "you'd've": "you would have",
+        "you'll": "you you will",
+        "you'll've": "you you will have",
+        "you're": "you are",
+        "you've": "you have"
+}  # the contractions and their expansions. The first listed contraction matching at a position is expanded.
+
+CHARACTERS_TO_PAD = r"([\w/'+$\s-]+|[^\w/'+$\s-]+)\s*"  # runs of (non) word characters, padded with a space
+
+
+class Text_Normalizer:
+    """Normalizes texts as normalize_text() does, with its patterns compiled once.
+        Contractions contain an apostrophe, so they are only looked for in the runs of the contractions' characters
+        that contain one, and the expansion of each such run is memoized.
+    """
+
+    def __init__(self, contractions=None, memo_size=1 << 16):
+        """Initializing a normalizer.
+        Args:
+            contractions (dict): the contractions and their expansions. Defaults to CONTRACTIONS.
+            memo_size (int): the number of expanded runs to memoize. Defaults to 64K.
+        """
+        self.contractions = CONTRACTIONS if contractions is None else contractions
+        self.contractions_re = re.compile('(%s)' % '|'.join(self.contractions.keys()))
+        self.padding_re = re.compile(CHARACTERS_TO_PAD)
+        self.runs_re = None  # the runs of the contractions' characters containing an apostrophe
+        if all("'" in contraction for contraction in self.contractions.keys()):
+            characters = "".join(sorted(set("".join(self.contractions.keys()))))
+            # a run is matched from its start only, as a match attempted within a run would scan the rest of the
+            # run for an apostrophe again, taking quadratic time on a long run with none
+            self.runs_re = re.compile("(?<![{0}])[{0}]*'[{0}]*".format(re.escape(characters)))
+        self.memo_size = memo_size
+        self.memo = {}  # a dictionary of the form {run:expanded run}
+
+    def normalize(self, text):
+        """Returns a normalized version of the specified string, identical to the one normalize_text() returns.
+
+          Args:
+            text (str): the text to normalize
 
-        def expand_contractions(s):
-            contractions_dict = {
-                "ain't": "am not",
-                "aren't": "are not",
-                "can't": "cannot",
-                "can't've": "cannot have",
-                "'cause": "because",
-                "could've": "could have",
-                "couldn't": "could not",
-                "couldn't've": "could not have",
-                "didn't": "did not",
-                "doesn't": "does not",
-                "don't": "do not",
-                "hadn't": "had not",
-                "hadn't've": "had not have",
-                "hasn't": "has not",
-                "haven't": "have not",
-                "he'd": "he would",
-                "he'd've": "he would have",
-                "he'll": "he will",
-                "he'll've": "he will have",
-                "he's": "he is",
-                "how'd": "how did",
-                "how'd'y": "how do you",
-                "how'll": "how will",
-                "how's": "how is",
-                "I'd": "I would",
-                "I'd've": "I would have",
-                "I'll": "I will",
-                "I'll've": "I will have",
-                "I'm": "I am",
-                "I've": "I have",
-                "isn't": "is not",
-                "it'd": "it had",
-                "it'd've": "it would have",
-                "it'll": "it will",
-                "it'll've": "it will have",
-                "it's": "it is",
-                "let's": "let us",
-                "ma'am": "madam",
-                "mayn't": "may not",
-                "might've": "might have",
-                "mightn't": "might not",
-                "mightn't've": "might not have",
-                "must've": "must have",
-                "mustn't": "must not",
-                "mustn't've": "must not have",
-                "needn't": "need not",
-                "needn't've": "need not have",
-                "o'clock": "of the clock",
-                "oughtn't": "ought not",
-                "oughtn't've": "ought not have",
-                "shan't": "shall not",
-                "sha'n't": "shall not",
-                "shan't've": "shall not have",
-                "she'd": "she would",
-                "she'd've": "she would have",
-                "she'll": "she will",
-                "she'll've": "she will have",
-                "she's": "she is",
-                "should've": "should have",
-                "shouldn't": "should not",
-                "shouldn't've": "should not have",
-                "so've": "so have",
-                "so's": "so is",
-                "that'd": "that would",
-                "that'd've": "that would have",
-                "that's": "that is",
-                "there'd": "there had",
-                "there'd've": "there would have",
-                "there's": "there is",
-                "they'd": "they would",
-                "they'd've": "they would have",
-                "they'll": "they will",
-                "they'll've": "they will have",
-                "they're": "they are",
-                "they've": "they have",
-                "to've": "to have",
-                "wasn't": "was not",
-                "we'd": "we had",
-                "we'd've": "we would have",
-                "we'll": "we will",
-                "we'll've": "we will have",
-                "we're": "we are",
-                "we've": "we have",
-                "weren't": "were not",
-                "what'll": "what will",
-                "what'll've": "what will have",
-                "what're": "what are",
-                "what's": "what is",
-                "what've": "what have",
-                "when's": "when is",
-                "when've": "when have",
-                "where'd": "where did",
-                "where's": "where is",
-                "where've": "where have",
-                "who'll": "who will",
-                "who'll've": "who will have",
-                "who's": "who is",
-                "who've": "who have",
-                "why's": "why is",
-                "why've": "why have",
-                "will've": "will have",
-                "won't": "will not",
-                "won't've": "will not have",
-                "would've": "would have",
-                "wouldn't": "would not",
-                "wouldn't've": "would not have",
-                "y'all": "you all",
-                "y'alls": "you alls",
-                "y'all'd": "you all would",
-                "y'all'd've": "you all would have",
-                "y'all're": "you all are",
-                "y'all've": "you all have",
-                "you'd": "you had",
-                "you'd've": "you would have",
-                "you'll": "you you will",
-                "you'll've": "you you will have",
-                "you're": "you are",
-                "you've": "you have"
-            }
-            contractions_re = re.compile('(%s)' % '|'.join(contractions_dict.keys()))
-
-            def replace(match):
-                return contractions_dict[match.group(0)]
-
-            return contractions_re.sub(replace, s)
-
-        characters_to_pad = r"([\w/'+$\s-]+|[^\w/'+$\s-]+)\s*"
-
-        # case conversion
+          Returns:
+            string. the normalized text.
+        """
         lower_case_txt = text.lower()
+        if self.runs_re is None:
+            extended_txt = self.contractions_re.sub(self.replace_contraction, lower_case_txt)
+        elif "'" in lower_case_txt:
+            extended_txt = self.runs_re.sub(self.expand_run, lower_case_txt)
+        else:
+            extended_txt = lower_case_txt
+        return self.padding_re.sub(pad_run, extended_txt).rstrip()
 
-        # extend contractions
-        extended_txt = expand_contractions(lower_case_txt)
+    def replace_contraction(self, match):
+        """
+        Returns the expansion of a matched contraction
+            Args:
+                match (re.Match): the match of the contractions' pattern.
+            Return:
+                (str): the expansion.
+        """
+        return self.contractions[match.group(0)]
+
+    def expand_run(self, match):
+        """
+        Returns a matched run with its contractions expanded. No contraction crosses the run's bounds, so the
+        run is expanded as it is within the whole text.
+            Args:
+                match (re.Match): the match of a run of the contractions' characters.
+            Return:
+                (str): the expanded run.
+        """
+        run = match.group(0)
+        expanded = self.memo.get(run)
+        if expanded is None:
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            expanded = self.memo[run] = self.contractions_re.sub(self.replace_contraction, run)
+        return expanded
+
+
+TEXT_NORMALIZER = Text_Normalizer()  # the normalizer of normalize_text()
 
-        # pad punctuation
-        padded_txt = re.sub(characters_to_pad, r"\1 ", extended_txt)
-        trimmed_padded = padded_txt.rstrip()
 
-        return trimmed_padded
+def pad_run(match):
+    """
+    Returns a matched run of word characters, or of other characters, followed by a single space
+        Args:
+            match (re.Match): the match of CHARACTERS_TO_PAD.
+        Return:
+            (str): the padded run.
+    """
+    return match.group(1) + " "
 
 
 def normalize_text(text):
@@ -767,148 +881,7 @@ def normalize_text(text):
       Returns:
         string. the normalized text.
     """
-
-    def expand_contractions(s):
-        contractions_dict = {
-            "ain't": "am not",
-            "aren't": "are not",
-            "can't": "cannot",
-            "can't've": "cannot have",
-            "'cause": "because",
-            "could've": "could have",
-            "couldn't": "could not",
-            "couldn't've": "could not have",
-            "didn't": "did not",
-            "doesn't": "does not",
-            "don't": "do not",
-            "hadn't": "had not",
-            "hadn't've": "had not have",
-            "hasn't": "has not",
-            "haven't": "have not",
-            "he'd": "he would",
-            "he'd've": "he would have",
-            "he'll": "he will",
-            "he'll've": "he will have",
-            "he's": "he is",
-            "how'd": "how did",
-            "how'd'y": "how do you",
-            "how'll": "how will",
-            "how's": "how is",
-            "I'd": "I would",
-            "I'd've": "I would have",
-            "I'll": "I will",
-            "I'll've": "I will have",
-            "I'm": "I am",
-            "I've": "I have",
-            "isn't": "is not",
-            "it'd": "it had",
-            "it'd've": "it would have",
-            "it'll": "it will",
-            "it'll've": "it will have",
-            "it's": "it is",
-            "let's": "let us",
-            "ma'am": "madam",
-            "mayn't": "may not",
-            "might've": "might have",
-            "mightn't": "might not",
-            "mightn't've": "might not have",
-            "must've": "must have",
-            "mustn't": "must not",
-            "mustn't've": "must not have",
-            "needn't": "need not",
-            "needn't've": "need not have",
-            "o'clock": "of the clock",
-            "oughtn't": "ought not",
-            "oughtn't've": "ought not have",
-            "shan't": "shall not",
-            "sha'n't": "shall not",
-            "shan't've": "shall not have",
-            "she'd": "she would",
-            "she'd've": "she would have",
-            "she'll": "she will",
-            "she'll've": "she will have",
-            "she's": "she is",
-            "should've": "should have",
-            "shouldn't": "should not",
-            "shouldn't've": "should not have",
-            "so've": "so have",
-            "so's": "so is",
-            "that'd": "that would",
-            "that'd've": "that would have",
-            "that's": "that is",
-            "there'd": "there had",
-            "there'd've": "there would have",
-            "there's": "there is",
-            "they'd": "they would",
-            "they'd've": "they would have",
-            "they'll": "they will",
-            "they'll've": "they will have",
-            "they're": "they are",
-            "they've": "they have",
-            "to've": "to have",
-            "wasn't": "was not",
-            "we'd": "we had",
-            "we'd've": "we would have",
-            "we'll": "we will",
-            "we'll've": "we will have",
-            "we're": "we are",
-            "we've": "we have",
-            "weren't": "were not",
-            "what'll": "what will",
-            "what'll've": "what will have",
-            "what're": "what are",
-            "what's": "what is",
-            "what've": "what have",
-            "when's": "when is",
-            "when've": "when have",
-            "where'd": "where did",
-            "where's": "where is",
-            "where've": "where have",
-            "who'll": "who will",
-            "who'll've": "who will have",
-            "who's": "who is",
-            "who've": "who have",
-            "why's": "why is",
-            "why've": "why have",
-            "will've": "will have",
-            "won't": "will not",
-            "won't've": "will not have",
-            "would've": "would have",
-            "wouldn't": "would not",
-            "wouldn't've": "would not have",
-            "y'all": "you all",
-            "y'alls": "you alls",
-            "y'all'd": "you all would",
-            "y'all'd've": "you all would have",
-            "y'all're": "you all are",
-            "y'all've": "you all have",
-            "you'd": "you had",
-            "you'd've": "you would have",
-            "you'll": "you you will",
-            "you'll've": "you you will have",
-            "you're": "you are",
-            "you've": "you have"
-        }
-        contractions_re = re.compile('(%s)' % '|'.join(contractions_dict.keys()))
-
-        def replace(match):
-            return contractions_dict[match.group(0)]
-
-        return contractions_re.sub(replace, s)
-
-    characters_to_pad = r"([\w/'+$\s-]+|[^\w/'+$\s-]+)\s*"
-
-    # case conversion
-    lower_case_txt = text.lower()
-
-    # extend contractions
-    extended_txt = expand_contractions(lower_case_txt)
-
-    # pad punctuation
-    padded_txt = re.sub(characters_to_pad, r"\1 ", extended_txt)
-    trimmed_padded = padded_txt.rstrip()
-
-    return trimmed_padded
+    return TEXT_NORMALIZER.normalize(text)
 
 
 def who_am_i():  # this is not a class method